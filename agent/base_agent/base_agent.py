@@ -20,9 +20,23 @@ import sys
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, project_root)
 
-from tools.general_tools import extract_conversation, extract_tool_messages, get_config_value, write_config_value
+from tools.general_tools import (
+    extract_conversation,
+    extract_tool_messages,
+    get_runtime_env_path,
+    get_session,
+    session_context,
+    session_headers,
+    write_config_value,
+)
 from tools.price_tools import add_no_trade_record
-from prompts.agent_prompt import get_agent_system_prompt, STOP_SIGNAL
+from tools.position_ledger import get_position_ledger
+from tools.trading_calendar import get_trading_calendar
+from tools.context_compaction import TokenMeter, ToolOutputDeduplicator, compact_messages, count_message_tokens, count_tokens, usage_from_response
+from tools.retry_policy import RetryBudget, RetryPolicy, classify_error
+from tools.session_checkpoint import clear_checkpoint, load_checkpoint, pending_checkpoint_dates, save_checkpoint
+from tools.tracing import TRACE_FILE_NAME, Tracer, payload_size, trace_span, use_tracer
+from prompts.agent_prompt import agent_static_prompt, get_agent_day_context, STOP_SIGNAL
 
 # Load environment variables
 load_dotenv()
@@ -68,7 +82,11 @@ class BaseAgent:
         openai_base_url: Optional[str] = None,
         openai_api_key: Optional[str] = None,
         initial_cash: float = 10000.0,
-        init_date: str = "2025-10-13"
+        init_date: str = "2025-10-13",
+        runtime_env_path: Optional[str] = None,
+        max_context_tokens: Optional[int] = 32000,
+        keep_recent_steps: int = 3,
+        retry_budget: Optional[int] = 20
     ):
         """
         Initialize BaseAgent
@@ -80,12 +98,18 @@ class BaseAgent:
             mcp_config: MCP tool configuration, including port and URL information
             log_path: Log path, defaults to ./data/agent_data
             max_steps: Maximum reasoning steps
-            max_retries: Maximum retry attempts
-            base_delay: Base delay time for retries
+            max_retries: Maximum attempts per trading day; each retry resumes at the failed step
+            base_delay: Base delay for the exponential, jittered retry backoff
             openai_base_url: OpenAI API base URL
             openai_api_key: OpenAI API key
             initial_cash: Initial cash amount
             init_date: Initialization date
+            runtime_env_path: Optional per-agent file the session config (SIGNATURE/TODAY_DATE/IF_TRADE)
+                is mirrored to; defaults to the shared RUNTIME_ENV_PATH
+            max_context_tokens: Token budget for the conversation sent at each step; older tool
+                results are shrunk once it is exceeded (None disables compaction)
+            keep_recent_steps: Number of most recent steps never compacted
+            retry_budget: Total retries allowed over the whole run (None for no limit)
         """
         self.signature = signature
         self.basemodel = basemodel
@@ -95,6 +119,15 @@ class BaseAgent:
         self.base_delay = base_delay
         self.initial_cash = initial_cash
         self.init_date = init_date
+        self.runtime_env_path = os.path.abspath(runtime_env_path) if runtime_env_path else None
+        self.max_context_tokens = max_context_tokens
+        self.keep_recent_steps = keep_recent_steps
+        # Retries happen per trading day (resuming the failed step); the budget is shared by all dates
+        self.retry_policy = RetryPolicy(max_retries, base_delay, budget=RetryBudget(retry_budget))
+        self._day_retries = 0
+        # Conversation of the day in progress, kept so a retry resumes at the failed step;
+        # mirrored to a checkpoint file after every step so a restarted process resumes too
+        self._session_state: Optional[Dict[str, Any]] = None
         
         # Set MCP configuration
         self.mcp_config = mcp_config or self._get_default_mcp_config()
@@ -124,6 +157,14 @@ class BaseAgent:
         
     def _get_default_mcp_config(self) -> Dict[str, Dict[str, Any]]:
         """Get default MCP configuration"""
+        if os.getenv("MCP_MODE", "multi") == "single":
+            # One multiplexed server (agent_tools/tool_combined.py) serves every toolset
+            return {
+                "tools": {
+                    "transport": "streamable_http",
+                    "url": f"http://localhost:{os.getenv('COMBINED_HTTP_PORT', '8010')}/mcp",
+                },
+            }
         return {
             "math": {
                 "transport": "streamable_http",
@@ -143,6 +184,34 @@ class BaseAgent:
             },
         }
     
+    @staticmethod
+    async def _attach_session(request, handler):
+        """MCP tool interceptor: send the active session (SIGNATURE, TODAY_DATE, ...) with each tool call"""
+        headers = session_headers()
+        if headers:
+            request = request.override(headers={**(request.headers or {}), **headers})
+        return await handler(request)
+    
+    @staticmethod
+    async def _trace_tool_call(request, handler):
+        """MCP tool interceptor: record a span with latency and payload sizes for each tool call"""
+        with trace_span(f"tool.{request.name}", "tool", **{
+            "tool.name": request.name,
+            "tool.server": request.server_name,
+            "payload.request_bytes": payload_size(request.args),
+        }) as span:
+            result = await handler(request)
+            if span is not None:
+                content = getattr(result, "content", None)
+                if isinstance(content, list):
+                    response_bytes = sum(payload_size(getattr(block, "text", None) or "") for block in content)
+                else:
+                    response_bytes = payload_size(result)
+                span.set(**{"payload.response_bytes": response_bytes})
+                if getattr(result, "isError", False):
+                    span.status = "ERROR"
+            return result
+    
     async def initialize(self) -> None:
         """Initialize MCP client and AI model"""
         print(f"🚀 Initializing agent: {self.signature}")
@@ -155,7 +224,7 @@ class BaseAgent:
         
         try:
             # Create MCP client
-            self.client = MultiServerMCPClient(self.mcp_config)
+            self.client = MultiServerMCPClient(self.mcp_config, tool_interceptors=[self._trace_tool_call, self._attach_session])
             
             # Get tools
             self.tools = await self.client.get_tools()
@@ -177,14 +246,20 @@ class BaseAgent:
                 model=self.basemodel,
                 base_url=self.openai_base_url,
                 api_key=self.openai_api_key,
-                max_retries=3,
+                # Retries are handled by self.retry_policy, so they don't multiply
+                max_retries=0,
                 timeout=30
             )
         except Exception as e:
             raise RuntimeError(f"❌ Failed to initialize AI model: {e}")
         
-        # Note: agent will be created in run_trading_session() based on specific date
-        # because system_prompt needs the current date and price information
+        # One agent graph for every trading day: the system prompt is static and
+        # the date, positions and prices arrive as the first user message
+        self.agent = create_agent(
+            self.model,
+            tools=self.tools,
+            system_prompt=agent_static_prompt,
+        )
         
         print(f"✅ Agent {self.signature} initialization completed")
     
@@ -205,20 +280,28 @@ class BaseAgent:
         with open(log_file, "a", encoding="utf-8") as f:
             f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
     
-    async def _ainvoke_with_retry(self, message: List[Dict[str, str]]) -> Any:
-        """Agent invocation with retry"""
-        for attempt in range(1, self.max_retries + 1):
-            try:
-                return await self.agent.ainvoke(
-                    {"messages": message}, 
-                    {"recursion_limit": 100}
-                )
-            except Exception as e:
-                if attempt == self.max_retries:
-                    raise e
-                print(f"⚠️ Attempt {attempt} failed, retrying after {self.base_delay * attempt} seconds...")
-                print(f"Error details: {e}")
-                await asyncio.sleep(self.base_delay * attempt)
+    async def _ainvoke(self, message: List[Dict[str, str]], step: Optional[int] = None) -> Any:
+        """
+        One agent invocation, traced as one llm span per step
+        
+        Not retried here: the graph may already have run trade tools when it
+        fails, so retries go through run_with_retry, which resumes the step
+        after checking the ledger.
+        """
+        with trace_span("llm.invoke", "llm", step=step, **{
+            "llm.model": self.basemodel,
+            "llm.messages": len(message),
+            "payload.request_bytes": payload_size(message),
+            "retry.count": self._day_retries,
+        }) as span:
+            response = await self.agent.ainvoke({"messages": message}, {"recursion_limit": 100})
+            if span is not None:
+                usage = usage_from_response(response)
+                span.set(**{
+                    "llm.input_tokens": usage.get("input_tokens"),
+                    "llm.output_tokens": usage.get("output_tokens"),
+                })
+            return response
     
     async def run_trading_session(self, today_date: str) -> None:
         """
@@ -232,43 +315,139 @@ class BaseAgent:
         # Set up logging
         log_file = self._setup_logging(today_date)
         
-        # Update system prompt
-        self.agent = create_agent(
-            self.model,
-            tools=self.tools,
-            system_prompt=get_agent_system_prompt(today_date, self.signature),
-        )
+        # Spans for the session, each step's model call and each tool call go next to log.jsonl
+        tracer = Tracer(os.path.join(os.path.dirname(log_file), TRACE_FILE_NAME), signature=self.signature, date=today_date)
+        with use_tracer(tracer), tracer.span("session") as session_span:
+            steps = await self._run_steps(today_date, log_file)
+            session_span.set(steps=steps)
+        
+        # Handle trading results
+        await self._handle_trading_result(today_date)
+        self._session_state = None
+        clear_checkpoint(self.data_path, today_date)
+    
+    def _save_session_state(self, state: Dict[str, Any]) -> None:
+        """Write the session state of the day in progress to its checkpoint file"""
+        save_checkpoint(self.data_path, state["date"], {
+            "step": state["step"],
+            "message": state["message"],
+            "ledger_offset": state["ledger_offset"],
+            "ledger_ids": state["ledger_ids"],
+            "meter": state["meter"].steps,
+            "uncompacted_tokens": state["uncompacted_tokens"],
+            "seen_outputs": state["deduplicator"].seen,
+            "stopped": state.get("stopped", False),
+        })
+    
+    def _load_session_state(self, today_date: str) -> Optional[Dict[str, Any]]:
+        """Rebuild the session state from the day's checkpoint file, if a previous run left one"""
+        checkpoint = load_checkpoint(self.data_path, today_date)
+        if checkpoint is None:
+            return None
+        return {
+            "date": today_date,
+            "message": checkpoint["message"],
+            "step": checkpoint["step"],
+            "ledger_offset": checkpoint["ledger_offset"],
+            "ledger_ids": checkpoint["ledger_ids"],
+            "meter": TokenMeter(checkpoint.get("meter")),
+            "uncompacted_tokens": checkpoint.get("uncompacted_tokens", count_message_tokens(checkpoint["message"])),
+            "deduplicator": ToolOutputDeduplicator(seen=checkpoint.get("seen_outputs")),
+            "stopped": checkpoint.get("stopped", False),
+        }
+    
+    def _session_ledger_records(self, state: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Ledger records of the session's date written since the session started"""
+        ledger = get_position_ledger(self.position_file)
+        return [r for r in ledger.records_from(state["ledger_offset"]) if r.get("date") == state["date"]]
+    
+    async def _run_steps(self, today_date: str, log_file: str) -> int:
+        """
+        Run the step loop of one trading session
         
-        # Initial user query
-        user_query = [{"role": "user", "content": f"Please analyze and update today's ({today_date}) positions."}]
-        message = user_query.copy()
+        If an earlier attempt at the same date failed, in this process or in one
+        that crashed (see the checkpoint file), the loop resumes after its last
+        completed step instead of starting the day over. A session that already
+        received the stop signal is not resumed at all.
         
-        # Log initial message
-        self._log_message(log_file, user_query)
+        Returns:
+            Number of steps taken
+        """
+        state = self._session_state
+        if state is None or state["date"] != today_date:
+            state = self._load_session_state(today_date)
+        if state is None:
+            # Initial user query carries the day's context; the compiled agent is reused
+            user_query = [{"role": "user", "content": get_agent_day_context(today_date, self.signature)}]
+            
+            # Log initial message
+            self._log_message(log_file, user_query)
+            
+            # Token meter and repeated-output filter for this session
+            state = {
+                "date": today_date,
+                "message": user_query.copy(),
+                "step": 0,
+                "ledger_offset": get_position_ledger(self.position_file).end_offset() if os.path.exists(self.position_file) else 0,
+                "ledger_ids": [],
+                "meter": TokenMeter(),
+                # Size of the history had it never been compacted (state["message"] holds the compacted one)
+                "uncompacted_tokens": count_message_tokens(user_query),
+                "deduplicator": ToolOutputDeduplicator(),
+            }
+            self._save_session_state(state)
+        elif state.get("stopped"):
+            print(f"♻️ {today_date} already finished at step {state['step']}, only recording its result")
+        else:
+            print(f"♻️ Resuming {today_date} after step {state['step']}")
+            # Trades recorded by the interrupted step are not in the conversation yet
+            unseen = [r for r in self._session_ledger_records(state) if r.get("id") not in state["ledger_ids"]]
+            if unseen:
+                actions = [r.get("this_action") for r in unseen]
+                note = f"\nNote: the session was interrupted; these trades were already executed since your last step: {actions}. Current positions: {unseen[-1].get('positions')}"
+                state["message"][-1] = {**state["message"][-1], "content": state["message"][-1]["content"] + note}
+                state["uncompacted_tokens"] += count_tokens(note)
+                state["ledger_ids"] = state["ledger_ids"] + [r.get("id") for r in unseen]
+                self._save_session_state(state)
+        self._session_state = state
+        message = state["message"]
+        meter = state["meter"]
+        deduplicator = state["deduplicator"]
         
         # Trading loop
-        current_step = 0
-        while current_step < self.max_steps:
+        current_step = state["step"]
+        while current_step < self.max_steps and not state.get("stopped"):
             current_step += 1
             print(f"🔄 Step {current_step}/{self.max_steps}")
             
             try:
+                # Keep the resent history within the token budget (the log file keeps the full text)
+                if self.max_context_tokens and count_message_tokens(message) > self.max_context_tokens:
+                    message = compact_messages(message, self.max_context_tokens, keep_recent=2 * self.keep_recent_steps)
+                
                 # Call agent
-                response = await self._ainvoke_with_retry(message)
+                response = await self._ainvoke(message, current_step)
+                usage = meter.record(current_step, count_message_tokens(message), state["uncompacted_tokens"], response)
+                print(f"🧮 Context ~{usage['prompt_tokens_est']} tokens (uncompacted ~{usage['compacted_from_est']}), "
+                      f"reported in/out: {usage['input_tokens']}/{usage['output_tokens']}")
                 
-                # Extract agent response
-                agent_response = extract_conversation(response, "final")
+                # Extract agent response (None when the model replied with tool calls only)
+                agent_response = extract_conversation(response, "final") or ""
                 
                 # Check stop signal
                 if STOP_SIGNAL in agent_response:
                     print("✅ Received stop signal, trading session ended")
                     print(agent_response)
                     self._log_message(log_file, [{"role": "assistant", "content": agent_response}])
+                    # A crash before the result is recorded must not call the model again
+                    state["step"] = current_step
+                    state["stopped"] = True
+                    self._save_session_state(state)
                     break
                 
                 # Extract tool messages
                 tool_msgs = extract_tool_messages(response)
-                tool_response = '\n'.join([msg.content for msg in tool_msgs])
+                tool_response = '\n'.join(deduplicator.dedupe([msg.content for msg in tool_msgs], current_step))
                 
                 # Prepare new messages
                 new_messages = [
@@ -278,23 +457,33 @@ class BaseAgent:
                 
                 # Add new messages
                 message.extend(new_messages)
+                state["uncompacted_tokens"] += count_message_tokens(new_messages)
                 
                 # Log messages
                 self._log_message(log_file, new_messages[0])
                 self._log_message(log_file, new_messages[1])
                 
+                # Step completed: a retry or a restarted process resumes after it
+                state["message"] = message
+                state["step"] = current_step
+                state["ledger_ids"] = [r.get("id") for r in self._session_ledger_records(state)]
+                self._save_session_state(state)
+                
             except Exception as e:
                 print(f"❌ Trading session error: {str(e)}")
                 print(f"Error details: {e}")
                 raise
         
-        # Handle trading results
-        await self._handle_trading_result(today_date)
+        totals = meter.totals()
+        print(f"🧮 Session tokens: ~{totals['prompt_tokens_est']} sent over {totals['steps']} steps "
+              f"(~{totals['saved_tokens_est']} saved by compaction), reported in/out: {totals['input_tokens']}/{totals['output_tokens']}")
+        return current_step
     
     async def _handle_trading_result(self, today_date: str) -> None:
         """Handle trading results"""
-        if_trade = get_config_value("IF_TRADE")
-        if if_trade:
+        # The trade tools run in another process, so ask the ledger whether anything was recorded today
+        _, today_action_id = get_position_ledger(self.position_file).latest(today_date)
+        if today_action_id >= 0:
             write_config_value("IF_TRADE", False)
             print("✅ Trading completed")
         else:
@@ -346,61 +535,65 @@ class BaseAgent:
         Returns:
             List of trading dates
         """
-        dates = []
         max_date = None
         
         if not os.path.exists(self.position_file):
             self.register_agent()
             max_date = init_date
         else:
-            # Read existing position file, find latest date
-            with open(self.position_file, "r") as f:
-                for line in f:
-                    doc = json.loads(line)
-                    current_date = doc['date']
-                    if max_date is None:
-                        max_date = current_date
-                    else:
-                        current_date_obj = datetime.strptime(current_date, "%Y-%m-%d")
-                        max_date_obj = datetime.strptime(max_date, "%Y-%m-%d")
-                        if current_date_obj > max_date_obj:
-                            max_date = current_date
+            # Latest date comes from the incremental ledger index, no full rescan
+            max_date = get_position_ledger(self.position_file).max_date or init_date
         
         # Check if new dates need to be processed
         max_date_obj = datetime.strptime(max_date, "%Y-%m-%d")
         end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
         
-        if end_date_obj <= max_date_obj:
-            return []
-        
-        # Generate trading date list
-        trading_dates = []
-        current_date = max_date_obj + timedelta(days=1)
+        # Days whose session started but never finished are redone from their checkpoint,
+        # even when the ledger already has trades on them; a checkpoint older than the
+        # ledger's last date is stale, since resuming it would append records out of date order
+        pending = []
+        for d in pending_checkpoint_dates(self.data_path):
+            if not init_date <= d <= end_date:
+                continue
+            if d < max_date:
+                print(f"⚠️ Ignoring stale checkpoint for {d}: the position file already has records up to {max_date}")
+                continue
+            pending.append(d)
         
-        while current_date <= end_date_obj:
-            if current_date.weekday() < 5:  # Weekdays
-                trading_dates.append(current_date.strftime("%Y-%m-%d"))
-            current_date += timedelta(days=1)
+        if end_date_obj <= max_date_obj:
+            return pending
         
-        return trading_dates
+        # Generate trading date list from the trading calendar, so exchange
+        # holidays are skipped before any model call is made
+        start_date = (max_date_obj + timedelta(days=1)).strftime("%Y-%m-%d")
+        return sorted(set(pending) | set(get_trading_calendar().sessions_between(start_date, end_date)))
     
     async def run_with_retry(self, today_date: str) -> None:
-        """Run method with retry"""
-        for attempt in range(1, self.max_retries + 1):
+        """
+        Run one trading day, resuming at the failed step on retryable errors
+        
+        Fatal errors (bad requests, auth, programming errors) are raised at once;
+        retries draw on the run-wide retry budget.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            self._day_retries = attempt - 1
             try:
                 print(f"🔄 Attempting to run {self.signature} - {today_date} (Attempt {attempt})")
                 await self.run_trading_session(today_date)
                 print(f"✅ {self.signature} - {today_date} run successful")
                 return
             except Exception as e:
-                print(f"❌ Attempt {attempt} failed: {str(e)}")
-                if attempt == self.max_retries:
-                    print(f"💥 {self.signature} - {today_date} all retries failed")
+                print(f"❌ Attempt {attempt} failed ({classify_error(e)}): {str(e)}")
+                if not self.retry_policy.should_retry(attempt, e):
+                    self._session_state = None
+                    print(f"💥 {self.signature} - {today_date} failed, not retrying "
+                          f"(retry budget left: {self.retry_policy.budget.remaining})")
                     raise
-                else:
-                    wait_time = self.base_delay * attempt
-                    print(f"⏳ Waiting {wait_time} seconds before retry...")
-                    await asyncio.sleep(wait_time)
+                wait_time = self.retry_policy.delay(attempt, e)
+                print(f"⏳ Waiting {wait_time:.1f} seconds before resuming...")
+                await asyncio.sleep(wait_time)
     
     async def run_date_range(self, init_date: str, end_date: str) -> None:
         """
@@ -412,6 +605,13 @@ class BaseAgent:
         """
         print(f"📅 Running date range: {init_date} to {end_date}")
         
+        # Runtime config lives in this agent's session; the file is only a write-behind mirror
+        persist_path = self.runtime_env_path or get_runtime_env_path()
+        with session_context(persist_path=persist_path, SIGNATURE=self.signature):
+            await self._run_dates(init_date, end_date)
+    
+    async def _run_dates(self, init_date: str, end_date: str) -> None:
+        """Process every pending trading day between init_date and end_date"""
         # Get trading date list
         trading_dates = self.get_trading_dates(init_date, end_date)
         
@@ -435,6 +635,8 @@ class BaseAgent:
                 print(f"❌ Error processing {self.signature} - Date: {date}")
                 print(e)
                 raise
+            finally:
+                get_session().flush()
         
         print(f"✅ {self.signature} processing completed")
     
@@ -443,20 +645,17 @@ class BaseAgent:
         if not os.path.exists(self.position_file):
             return {"error": "Position file does not exist"}
         
-        positions = []
-        with open(self.position_file, "r") as f:
-            for line in f:
-                positions.append(json.loads(line))
+        ledger = get_position_ledger(self.position_file)
+        latest_position = ledger.last_record()
         
-        if not positions:
+        if latest_position is None:
             return {"error": "No position records"}
         
-        latest_position = positions[-1]
         return {
             "signature": self.signature,
             "latest_date": latest_position.get("date"),
             "positions": latest_position.get("positions", {}),
-            "total_records": len(positions)
+            "total_records": ledger.record_count
         }
     
     def __str__(self) -> str:
@@ -2,29 +2,100 @@
 """
 MCP Service Startup Script (Python Version)
 Start all four MCP services: Math, Search, TradeTools, LocalPrices
+
+MCP_MODE=multi (default) runs one process per service; MCP_MODE=single (or
+--single) serves all four toolsets from one process on COMBINED_HTTP_PORT.
+
+Services are started together and each is ready once an MCP list_tools
+round-trip succeeds. A service that exits is restarted with exponential
+backoff until it crashes MCP_MAX_RESTARTS times within MCP_RESTART_WINDOW
+seconds; the other services keep running.
+
+`python start_mcp_services.py wait` blocks until every service answers
+list_tools (exit code 0) or MCP_READY_TIMEOUT expires (exit code 1).
 """
 
 import os
 import sys
 import time
 import signal
+import asyncio
 import subprocess
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 load_dotenv()
 
+# Seconds to wait for a service to answer list_tools after (re)start
+READY_TIMEOUT = float(os.getenv('MCP_READY_TIMEOUT', '60'))
+# Crash-loop limit: give up on a service after this many restarts within the window (seconds)
+MAX_RESTARTS = int(os.getenv('MCP_MAX_RESTARTS', '5'))
+RESTART_WINDOW = float(os.getenv('MCP_RESTART_WINDOW', '600'))
+RESTART_MAX_DELAY = 30.0
+
+
+def probe_mcp(port, timeout=5.0):
+    """
+    MCP-level health probe: open a session and list the tools
+
+    Args:
+        port: Port of a streamable-http MCP server on localhost
+        timeout: Seconds allowed for the whole round-trip
+
+    Returns:
+        Number of tools served, or None if the server is not ready
+    """
+    from fastmcp import Client
+
+    async def _list_tools():
+        async with Client(f"http://localhost:{port}/mcp", timeout=timeout, init_timeout=timeout) as client:
+            return len(await client.list_tools())
+
+    try:
+        return asyncio.run(asyncio.wait_for(_list_tools(), timeout))
+    except Exception:
+        return None
+
+
+def wait_until_ready(port, timeout=READY_TIMEOUT, is_alive=None):
+    """
+    Probe ``port`` with exponential backoff (0.1s doubling up to 2s) until it answers
+
+    Args:
+        port: MCP server port
+        timeout: Give up after this many seconds
+        is_alive: Optional callable; waiting stops early once it returns False
+
+    Returns:
+        Number of tools served, or None on timeout / process exit
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.1
+    while time.monotonic() < deadline:
+        if is_alive is not None and not is_alive():
+            return None
+        tools = probe_mcp(port, timeout=min(5.0, max(0.5, deadline - time.monotonic())))
+        if tools is not None:
+            return tools
+        time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+        delay = min(delay * 2, 2.0)
+    return None
+
 class MCPServiceManager:
-    def __init__(self):
+    def __init__(self, mode=None):
         self.services = {}
         self.running = True
+        self.mode = mode or os.getenv('MCP_MODE', 'multi')
         
         # Set default ports
         self.ports = {
             'math': int(os.getenv('MATH_HTTP_PORT', '8000')),
             'search': int(os.getenv('SEARCH_HTTP_PORT', '8001')),
             'trade': int(os.getenv('TRADE_HTTP_PORT', '8002')),
-            'price': int(os.getenv('GETPRICE_HTTP_PORT', '8003'))
+            'price': int(os.getenv('GETPRICE_HTTP_PORT', '8003')),
+            'combined': int(os.getenv('COMBINED_HTTP_PORT', '8010'))
         }
         
         # Service configurations
@@ -50,6 +121,15 @@ class MCPServiceManager:
                 'port': self.ports['price']
             }
         }
+        if self.mode == 'single':
+            # All toolsets mounted on one FastMCP app, sharing one process and its caches
+            self.service_configs = {
+                'combined': {
+                    'script': 'tool_combined.py',
+                    'name': 'AITraderTools',
+                    'port': self.ports['combined']
+                }
+            }
         
         # Create logs directory
         self.log_dir = Path('../logs')
@@ -65,8 +145,8 @@ class MCPServiceManager:
         self.stop_all_services()
         sys.exit(0)
     
-    def start_service(self, service_id, config):
-        """Start a single service"""
+    def start_service(self, service_id, config, restart=False):
+        """Start a single service (appending to its log when restarting)"""
         script_path = config['script']
         service_name = config['name']
         port = config['port']
@@ -78,7 +158,7 @@ class MCPServiceManager:
         try:
             # Start service process
             log_file = self.log_dir / f"{service_id}.log"
-            with open(log_file, 'w') as f:
+            with open(log_file, 'a' if restart else 'w') as f:
                 process = subprocess.Popen(
                     [sys.executable, script_path],
                     stdout=f,
@@ -86,11 +166,15 @@ class MCPServiceManager:
                     cwd=os.getcwd()
                 )
             
+            previous = self.services.get(service_id, {})
             self.services[service_id] = {
                 'process': process,
                 'name': service_name,
                 'port': port,
-                'log_file': log_file
+                'log_file': log_file,
+                'restarts': previous.get('restarts', deque()),
+                'restart_at': None,
+                'failed': False
             }
             
             print(f"✅ {service_name} service started (PID: {process.pid}, Port: {port})")
@@ -113,16 +197,8 @@ class MCPServiceManager:
         if process.poll() is not None:
             return False
         
-        # Check if port is responding (simple check)
-        try:
-            import socket
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)
-            result = sock.connect_ex(('localhost', port))
-            sock.close()
-            return result == 0
-        except:
-            return False
+        # Check that the server answers an MCP list_tools round-trip
+        return probe_mcp(port) is not None
     
     def start_all_services(self):
         """Start all services"""
@@ -135,24 +211,71 @@ class MCPServiceManager:
         
         print("\n🔄 Starting services...")
         
-        # Start all services
+        # Start all services; the processes boot concurrently
         for service_id, config in self.service_configs.items():
             self.start_service(service_id, config)
         
-        # Wait for services to start
-        print("\n⏳ Waiting for services to start...")
-        time.sleep(3)
-        
-        # Check service status
-        print("\n🔍 Checking service status...")
-        self.check_all_services()
-        
-        print("\n🎉 All MCP services started!")
+        # Wait for every service to answer list_tools, probing them in parallel
+        print("\n⏳ Waiting for services to become ready...")
+        if self.wait_all_ready():
+            print("\n🎉 All MCP services started!")
+        else:
+            print("\n⚠️  Some MCP services are not ready; they will be restarted if they exit")
         self.print_service_info()
         
         # Keep running
         self.keep_alive()
     
+    def wait_ready(self, service_id, timeout=READY_TIMEOUT):
+        """Wait until a started service answers list_tools; returns True when ready"""
+        service = self.services[service_id]
+        started = time.monotonic()
+        tools = wait_until_ready(service['port'], timeout, lambda: service['process'].poll() is None)
+        if tools is None:
+            print(f"❌ {service['name']} service not ready after {time.monotonic() - started:.1f}s")
+            print(f"   Please check logs: {service['log_file']}")
+            return False
+        print(f"✅ {service['name']} service ready in {time.monotonic() - started:.1f}s ({tools} tools)")
+        return True
+
+    def wait_all_ready(self, timeout=READY_TIMEOUT):
+        """Wait for all started services in parallel; returns True if every one is ready"""
+        if not self.services:
+            return False
+        with ThreadPoolExecutor(max_workers=len(self.services)) as executor:
+            results = list(executor.map(lambda service_id: self.wait_ready(service_id, timeout), list(self.services)))
+        return all(results)
+
+    def schedule_restart(self, service_id):
+        """
+        Schedule a restart of a service that exited, unless it is crash-looping
+
+        Restarts are delayed 1, 2, 4, ... seconds (up to RESTART_MAX_DELAY) by the
+        number of recent crashes; keep_alive performs them when due.
+        """
+        service = self.services[service_id]
+        restarts = service['restarts']
+        now = time.monotonic()
+        while restarts and now - restarts[0] > RESTART_WINDOW:
+            restarts.popleft()
+        if len(restarts) >= MAX_RESTARTS:
+            service['failed'] = True
+            print(f"❌ {service['name']} service crashed {len(restarts)} times in {RESTART_WINDOW:.0f}s, giving up on it")
+            print(f"   Please check logs: {service['log_file']}")
+            return
+
+        delay = min(RESTART_MAX_DELAY, 2 ** len(restarts))
+        print(f"🔄 Restarting {service['name']} service in {delay:.0f}s (restart {len(restarts) + 1}/{MAX_RESTARTS})")
+        restarts.append(now)
+        service['restart_at'] = now + delay
+
+    def restart_service(self, service_id):
+        """Start a service again and wait for its readiness in the background"""
+        if self.start_service(service_id, self.service_configs[service_id], restart=True):
+            threading.Thread(target=self.wait_ready, args=(service_id,), daemon=True).start()
+        else:
+            self.services[service_id]['failed'] = True
+
     def check_all_services(self):
         """Check all service status"""
         for service_id, service in self.services.items():
@@ -172,17 +295,24 @@ class MCPServiceManager:
         print("\n🛑 Press Ctrl+C to stop all services")
     
     def keep_alive(self):
-        """Keep services running"""
+        """Keep services running, restarting any service that exits"""
         try:
             while self.running:
                 time.sleep(1)
                 
-                # Check service status
-                for service_id, service in self.services.items():
-                    if service['process'].poll() is not None:
-                        print(f"\n⚠️  {service['name']} service stopped unexpectedly")
-                        self.running = False
-                        break
+                # Restart crashed services; the others keep serving meanwhile
+                for service_id, service in list(self.services.items()):
+                    if service['failed'] or service['process'].poll() is None:
+                        continue
+                    if service.get('restart_at') is None:
+                        print(f"\n⚠️  {service['name']} service stopped unexpectedly (exit code {service['process'].returncode})")
+                        self.schedule_restart(service_id)
+                    elif time.monotonic() >= service['restart_at']:
+                        self.restart_service(service_id)
+                
+                if all(service['failed'] for service in self.services.values()):
+                    print("\n❌ All services failed")
+                    self.running = False
                         
         except KeyboardInterrupt:
             pass
@@ -194,6 +324,8 @@ class MCPServiceManager:
         print("\n🛑 Stopping all services...")
         
         for service_id, service in self.services.items():
+            if service['process'].poll() is not None:
+                continue
             try:
                 service['process'].terminate()
                 service['process'].wait(timeout=5)
@@ -207,29 +339,44 @@ class MCPServiceManager:
         print("✅ All services stopped")
     
     def status(self):
-        """Display service status"""
+        """Display service status (probes the ports, so it also works from a separate process)"""
         print("📊 MCP Service Status Check")
         print("=" * 30)
         
         for service_id, config in self.service_configs.items():
-            if service_id in self.services:
-                service = self.services[service_id]
-                if self.check_service_health(service_id):
-                    print(f"✅ {config['name']} service running normally (Port: {config['port']})")
-                else:
-                    print(f"❌ {config['name']} service abnormal (Port: {config['port']})")
+            tools = probe_mcp(config['port'])
+            if tools is not None:
+                print(f"✅ {config['name']} service running normally (Port: {config['port']}, {tools} tools)")
+            else:
+                print(f"❌ {config['name']} service not responding (Port: {config['port']})")
+
+    def wait(self, timeout=READY_TIMEOUT):
+        """Block until every service answers list_tools; returns True if all are ready in time"""
+        print("⏳ Waiting for MCP services to become ready...")
+        with ThreadPoolExecutor(max_workers=len(self.service_configs)) as executor:
+            results = list(executor.map(lambda config: wait_until_ready(config['port'], timeout), self.service_configs.values()))
+        for config, tools in zip(self.service_configs.values(), results):
+            if tools is None:
+                print(f"❌ {config['name']} service not ready (Port: {config['port']})")
             else:
-                print(f"❌ {config['name']} service not started (Port: {config['port']})")
+                print(f"✅ {config['name']} service ready ({tools} tools)")
+        return all(tools is not None for tools in results)
 
 def main():
     """Main function"""
-    if len(sys.argv) > 1 and sys.argv[1] == 'status':
+    mode = 'single' if '--single' in sys.argv else None
+    args = [arg for arg in sys.argv[1:] if arg != '--single']
+    if args and args[0] == 'status':
         # Status check mode
-        manager = MCPServiceManager()
+        manager = MCPServiceManager(mode)
         manager.status()
+    elif args and args[0] == 'wait':
+        # Readiness mode: exit 0 once every service answers list_tools
+        manager = MCPServiceManager(mode)
+        sys.exit(0 if manager.wait() else 1)
     else:
         # Startup mode
-        manager = MCPServiceManager()
+        manager = MCPServiceManager(mode)
         manager.start_all_services()
 
 if __name__ == "__main__":
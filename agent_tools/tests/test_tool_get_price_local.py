@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pandas as pd
+
+# Tool servers import the project helpers from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_tools import tool_get_price_local
+from tools.general_tools import session_context
+
+
+def test_technical_indicators_clamp_future_dates(monkeypatch, tmp_path):
+    merged = tmp_path / "merged.jsonl"
+    merged.write_text("")
+    requested = []
+
+    def fake_indicators(date, window, path):
+        requested.append(date)
+        table = pd.DataFrame({"sma": [101.5]}, index=["AAPL"])
+        table.attrs["as_of"] = "2025-10-20"
+        return table
+
+    monkeypatch.setattr(tool_get_price_local, "_workspace_data_path", lambda filename: merged)
+    monkeypatch.setattr(tool_get_price_local, "get_indicators", fake_indicators)
+    tool = getattr(tool_get_price_local.get_technical_indicators, "fn", tool_get_price_local.get_technical_indicators)
+
+    with session_context(TODAY_DATE="2025-10-21"):
+        result = tool("2025-12-31", ["AAPL"])
+        assert tool("2025-10-01", ["AAPL"])["date"] == "2025-10-01"
+
+    assert requested == ["2025-10-21", "2025-10-01"]
+    assert result["date"] == "2025-10-21"
+    assert result["data"] == {"AAPL": [101.5]}
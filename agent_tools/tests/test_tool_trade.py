@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pytest
+
+# Tool servers import the project helpers from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from agent_tools import tool_trade
+from tools.general_tools import session_context
+
+TODAY = "2025-10-21"
+OPEN_PRICES = {"AAPL_price": 100.0, "MSFT_price": 50.0}
+
+
+@pytest.fixture
+def trade_env(monkeypatch, tmp_path):
+    """Fixed position and prices, ledger in tmp_path; records every symbol list passed to get_open_prices."""
+    lookups = []
+
+    def fake_open_prices(today_date, symbols, merged_path=None):
+        lookups.append(list(symbols))
+        return {f"{symbol}_price": OPEN_PRICES[f"{symbol}_price"] for symbol in symbols if f"{symbol}_price" in OPEN_PRICES}
+
+    monkeypatch.setattr(tool_trade, "get_open_prices", fake_open_prices)
+    monkeypatch.setattr(tool_trade, "get_latest_position", lambda today_date, signature: ({"AAPL": 0, "MSFT": 10, "CASH": 100.0}, 0))
+    monkeypatch.setattr(tool_trade, "default_position_file", lambda signature: tmp_path / "position.jsonl")
+    with session_context(SIGNATURE="test-model", TODAY_DATE=TODAY):
+        yield lookups
+
+
+def call(tool, *args):
+    return getattr(tool, "fn", tool)(*args)
+
+
+@pytest.mark.parametrize("orders", [
+    ["AAPL"],
+    [{"symbol": ["AAPL"], "side": "buy", "amount": 1}],
+    [{"symbol": "AAPL", "side": "hold", "amount": 1}],
+    [{"symbol": "AAPL", "side": "buy", "amount": "ten"}],
+])
+def test_execute_orders_rejects_malformed_orders_before_price_lookup(trade_env, orders):
+    result = call(tool_trade.execute_orders, orders)
+    assert "No orders were executed" in result["error"]
+    assert result["date"] == TODAY
+    assert trade_env == []
+
+
+def test_execute_orders_runs_sells_before_buys(trade_env, tmp_path):
+    orders = [{"symbol": "AAPL", "side": "BUY", "amount": 5.0}, {"symbol": "MSFT", "side": "sell", "amount": 10}]
+    result = call(tool_trade.execute_orders, orders)
+    assert result == {"AAPL": 5, "MSFT": 0, "CASH": 100.0}
+    assert trade_env == [["AAPL", "MSFT"]]
+    assert len((tmp_path / "position.jsonl").read_text().splitlines()) == 2
+
+
+@pytest.mark.parametrize("weights", [
+    {"AAPL": "half"},
+    {"AAPL": None},
+    {"AAPL": [0.5]},
+    {"AAPL": float("nan")},
+    {"AAPL": 0.8, "MSFT": 0.5},
+])
+def test_rebalance_rejects_bad_weights(trade_env, weights):
+    result = call(tool_trade.rebalance, weights)
+    assert "Target weights" in result["error"]
+    assert trade_env == []
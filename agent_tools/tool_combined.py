@@ -0,0 +1,31 @@
+"""
+Single-process MCP server: Math, Search, TradeTools and LocalPrices on one port
+
+All four toolsets are mounted without a prefix, so tool names are the same as
+in the multi-process layout. Running them in one process shares one import of
+fastmcp and the tools modules, one PriceStore and one position ledger cache.
+"""
+
+from fastmcp import FastMCP
+import os
+import sys
+from dotenv import load_dotenv
+load_dotenv()
+
+# Add project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import tool_math
+import tool_jina_search
+import tool_trade
+import tool_get_price_local
+
+mcp = FastMCP("AITraderTools")
+for toolset in (tool_math, tool_jina_search, tool_trade, tool_get_price_local):
+    mcp.mount(toolset.mcp)
+
+
+if __name__ == "__main__":
+    port = int(os.getenv("COMBINED_HTTP_PORT", "8010"))
+    mcp.run(transport="streamable-http", port=port)
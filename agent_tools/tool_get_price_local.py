@@ -1,14 +1,21 @@
 from pathlib import Path
-import json
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from fastmcp import FastMCP
+import numpy as np
 import os
+import sys
 from dotenv import load_dotenv
 load_dotenv()
 
+# Add project root directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 mcp = FastMCP("LocalPrices")
 from tools.general_tools import get_config_value
+from tools.price_store import get_price_store
+from tools.price_indicators import get_indicators
+from tools.intraday_store import INTRADAY_FIELDS, get_intraday_store, parse_timestamp
 
 def _workspace_data_path(filename: str) -> Path:
     base_dir = Path(__file__).resolve().parents[1]
@@ -43,36 +50,208 @@ def get_price_local(symbol: str, date: str) -> Dict[str, Any]:
     if not data_path.exists():
         return {"error": f"Data file not found: {data_path}", "symbol": symbol, "date": date}
 
-    with data_path.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            doc = json.loads(line)
-            meta = doc.get("Meta Data", {})
-            if meta.get("2. Symbol") != symbol:
-                continue
-            series = doc.get("Time Series (Daily)", {})
-            day = series.get(date)
-            if day is None:
-                sample_dates = sorted(series.keys(), reverse=True)[:5]
-                return {
-                    "error": f"Data not found for date {date}. Please verify the date exists in data. Sample available dates: {sample_dates}",
-                    "symbol": symbol,
-                    "date": date
-                }
-            return {
-                "symbol": symbol,
-                "date": date,
-                "ohlcv": {
-                    "open": day.get("1. buy price"),
-                    "high": day.get("2. high"),
-                    "low": day.get("3. low"), 
-                    "close": day.get("4. sell price"),
-                    "volume": day.get("5. volume"),
-                },
-            }
-
-    return {"error": f"No records found for stock {symbol} in local data", "symbol": symbol, "date": date}
+    store = get_price_store(str(data_path)).snapshot
+    if symbol not in store:
+        return {"error": f"No records found for stock {symbol} in local data", "symbol": symbol, "date": date}
+
+    day = store.get_bar(symbol, date)
+    if day is None:
+        sample_dates = store.symbol_dates(symbol)[::-1][:5]
+        return {
+            "error": f"Data not found for date {date}. Please verify the date exists in data. Sample available dates: {sample_dates}",
+            "symbol": symbol,
+            "date": date
+        }
+    return {
+        "symbol": symbol,
+        "date": date,
+        "ohlcv": {
+            "open": day["buy_price"],
+            "high": day["high"],
+            "low": day["low"],
+            "close": day["sell_price"],
+            "volume": int(day["volume"]) if day["volume"] is not None else None,
+        },
+    }
+
+
+# Upper bounds on one range query's result, so a single call cannot flood the context
+MAX_RANGE_SYMBOLS = 120
+MAX_RANGE_ROWS = 5000
+MAX_INTRADAY_BARS = 2000
+
+
+def _clamp_to_today(end: str) -> str:
+    """Clamp a date or range end to the session's TODAY_DATE, so backtests never read future bars."""
+    today_date = get_config_value("TODAY_DATE")
+    if today_date and end[:10] > today_date:
+        return today_date
+    return end
+
+
+# Field names accepted by get_prices_range, mapped to PriceStore columns
+RANGE_FIELDS = {
+    "open": "buy_price",
+    "high": "high",
+    "low": "low",
+    "close": "sell_price",
+    "volume": "volume",
+}
+
+
+@mcp.tool()
+def get_prices_range(symbols: List[str], start: str, end: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Read daily OHLCV data for several stocks over a date range in one call.
+
+    Args:
+        symbols: Stock symbols, e.g. ['AAPL', 'MSFT'].
+        start: First date in 'YYYY-MM-DD' format (inclusive).
+        end: Last date in 'YYYY-MM-DD' format (inclusive).
+        fields: Columns to return, any of 'open', 'high', 'low', 'close', 'volume'. Defaults to all five.
+
+    Returns:
+        Dictionary with the column names and, per symbol, one row
+        [date, value, ...] for every trading day in the range. The range ends at the
+        current trading date at the latest; large results are cut to the most recent
+        rows and flagged with "truncated".
+    """
+    fields = list(fields) if fields else list(RANGE_FIELDS)
+    try:
+        _validate_date(start)
+        _validate_date(end)
+        end = _clamp_to_today(end)
+        if start > end:
+            raise ValueError(f"start must not be after end (end is capped at the current trading date {end})")
+        unknown = [f for f in fields if f not in RANGE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields {unknown}; choose from {list(RANGE_FIELDS)}")
+    except ValueError as e:
+        return {"error": str(e), "symbols": symbols, "start": start, "end": end}
+
+    data_path = _workspace_data_path("merged.jsonl")
+    if not data_path.exists():
+        return {"error": f"Data file not found: {data_path}", "symbols": symbols, "start": start, "end": end}
+
+    truncated = []
+    if len(symbols) > MAX_RANGE_SYMBOLS:
+        truncated.append(f"only the first {MAX_RANGE_SYMBOLS} of {len(symbols)} symbols were read")
+        symbols = symbols[:MAX_RANGE_SYMBOLS]
+
+    store = get_price_store(str(data_path)).snapshot
+    table = store.get_table(symbols, start, end, [RANGE_FIELDS[f] for f in fields])
+    per_symbol = MAX_RANGE_ROWS // max(1, len(table))
+    if any(len(rows) > per_symbol for rows in table.values()):
+        truncated.append(f"only the last {per_symbol} rows per symbol are returned")
+        table = {sym: rows[-per_symbol:] for sym, rows in table.items()}
+    if "volume" in fields:
+        vol = 1 + fields.index("volume")
+        for rows in table.values():
+            for row in rows:
+                if row[vol] is not None:
+                    row[vol] = int(row[vol])
+
+    result: Dict[str, Any] = {"start": start, "end": end, "columns": ["date", *fields], "data": table}
+    missing = [sym for sym in symbols if sym not in store]
+    if missing:
+        result["missing_symbols"] = missing
+    if truncated:
+        result["truncated"] = "; ".join(truncated) + "; narrow the range or request fewer symbols"
+    return result
+
+
+@mcp.tool()
+def get_technical_indicators(date: str, symbols: Optional[List[str]] = None, window: int = 14) -> Dict[str, Any]:
+    """Read technical indicators (SMA, EMA, RSI, MACD, ATR, returns) for many stocks at once.
+
+    Indicators are computed from daily bars before `date`, i.e. as of the previous
+    trading day's close, so they can be used when trading at `date`'s open.
+    Dates after the current trading day are clamped to it.
+
+    Args:
+        date: Trading date in 'YYYY-MM-DD' format.
+        symbols: Stock symbols, e.g. ['AAPL', 'MSFT']. Defaults to every symbol in local data.
+        window: Look-back in trading days for SMA, EMA, RSI, ATR and the N-day return (default 14).
+
+    Returns:
+        Dictionary with the as-of date, the column names and one row of values per symbol.
+    """
+    try:
+        _validate_date(date)
+        window = int(window)
+        if window < 1:
+            raise ValueError("window must be a positive integer")
+    except (TypeError, ValueError) as e:
+        return {"error": str(e), "date": date}
+    date = _clamp_to_today(date)
+
+    data_path = _workspace_data_path("merged.jsonl")
+    if not data_path.exists():
+        return {"error": f"Data file not found: {data_path}", "date": date}
+
+    table = get_indicators(date, window, str(data_path))
+    if table.attrs["as_of"] is None:
+        return {"error": f"No price data before {date}", "date": date}
+
+    wanted = list(table.index) if not symbols else [sym for sym in symbols if sym in table.index]
+    rows = table.loc[wanted].round(4).astype(object).where(table.loc[wanted].notna(), None)
+    result: Dict[str, Any] = {
+        "date": date,
+        "as_of": table.attrs["as_of"],
+        "window": window,
+        "columns": list(table.columns),
+        "data": {sym: list(values) for sym, values in zip(rows.index, rows.values.tolist())},
+    }
+    missing = [sym for sym in (symbols or []) if sym not in table.index]
+    if missing:
+        result["missing_symbols"] = missing
+    return result
+
+
+@mcp.tool()
+def get_intraday_prices(symbol: str, start: str, end: str) -> Dict[str, Any]:
+    """Read intraday (60min) OHLCV bars for a stock over a time range.
+
+    Args:
+        symbol: Stock symbol, e.g. 'AAPL'.
+        start: Range start, 'YYYY-MM-DD HH:MM' (or 'YYYY-MM-DD' for the start of the day).
+        end: Range end, inclusive, 'YYYY-MM-DD HH:MM' (or 'YYYY-MM-DD' for the whole day).
+
+    Returns:
+        Dictionary containing symbol, interval, column names and the bars as rows
+        of [timestamp, open, high, low, close, volume]. The range ends at the current
+        bar time (or the current trading date) at the latest; at most
+        MAX_INTRADAY_BARS of the most recent bars are returned.
+    """
+    try:
+        end_ts = parse_timestamp(end)
+        if len(end.strip()) == 10:
+            end_ts = end_ts + np.timedelta64(1, "D") - np.timedelta64(1, "s")
+        # CURRENT_TIME ('YYYY-MM-DD HH:MM') is set when the session trades intraday
+        current_time = get_config_value("CURRENT_TIME")
+        if current_time and parse_timestamp(current_time) < end_ts:
+            end = current_time
+        else:
+            end = _clamp_to_today(end)
+        if parse_timestamp(start) > parse_timestamp(end):
+            raise ValueError(f"start must not be after end (end is capped at the current time {end})")
+    except ValueError as e:
+        return {"error": str(e), "symbol": symbol, "start": start, "end": end}
+
+    store = get_intraday_store()
+    if symbol not in store:
+        return {"error": f"No intraday records found for stock {symbol} in local data", "symbol": symbol, "start": start, "end": end}
+
+    bars = store.query(symbol, start, end)
+    result: Dict[str, Any] = {
+        "symbol": symbol,
+        "interval": store.interval,
+        "end": end,
+        "columns": ["timestamp", *INTRADAY_FIELDS],
+        "bars": bars[-MAX_INTRADAY_BARS:],
+    }
+    if len(bars) > MAX_INTRADAY_BARS:
+        result["truncated"] = f"only the last {MAX_INTRADAY_BARS} of {len(bars)} bars are returned; narrow the range"
+    return result
 
 
 if __name__ == "__main__":
@@ -1,5 +1,9 @@
 from fastmcp import FastMCP
+import ast
+import math
+import operator
 import os
+from typing import Dict, List, Optional, Union
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -15,6 +19,142 @@ def multiply(a: float, b: float) -> float:
     """Multiply two numbers (supports int and float)"""
     return float(a) * float(b)
 
+
+_VECTOR_OPS = {
+    "add": operator.add,
+    "subtract": operator.sub,
+    "multiply": operator.mul,
+    "divide": operator.truediv,
+}
+
+
+@mcp.tool()
+def vector_op(op: str, a: List[float], b: Union[float, List[float]]) -> List[float]:
+    """Apply an elementwise operation to a list of numbers in one call.
+
+    Args:
+        op: One of 'add', 'subtract', 'multiply', 'divide'.
+        a: First operand, a list of numbers.
+        b: Second operand, a list of the same length or a single number applied to every element.
+
+    Returns:
+        List with op(a[i], b[i]) for every i, e.g. vector_op('multiply', [10, 5], [100.5, 20]) -> [1005.0, 100.0].
+    """
+    if op not in _VECTOR_OPS:
+        raise ValueError(f"Unknown op '{op}'; choose from {list(_VECTOR_OPS)}")
+    fn = _VECTOR_OPS[op]
+    if isinstance(b, (int, float)):
+        return [fn(float(x), float(b)) for x in a]
+    if len(a) != len(b):
+        raise ValueError(f"Length mismatch: {len(a)} vs {len(b)}")
+    return [fn(float(x), float(y)) for x, y in zip(a, b)]
+
+
+@mcp.tool()
+def dot(a: List[float], b: List[float]) -> float:
+    """Dot product of two equal-length lists, e.g. shares x prices -> total value.
+
+    Args:
+        a: First list of numbers.
+        b: Second list of numbers.
+
+    Returns:
+        sum(a[i] * b[i]).
+    """
+    if len(a) != len(b):
+        raise ValueError(f"Length mismatch: {len(a)} vs {len(b)}")
+    return math.fsum(float(x) * float(y) for x, y in zip(a, b))
+
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+_FUNCTIONS = {
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "round": round,
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "sqrt": math.sqrt,
+    "log": math.log,
+    "exp": math.exp,
+    "sum": lambda *args: math.fsum(args[0] if len(args) == 1 and isinstance(args[0], list) else args),
+}
+# Largest exponent accepted by '**'
+_MAX_EXPONENT = 1000
+_MAX_EXPRESSION_LENGTH = 2000
+
+
+def _eval_node(node: ast.AST, variables: Dict[str, float]):
+    if isinstance(node, ast.Expression):
+        return _eval_node(node.body, variables)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        # Floats overflow with an error instead of growing into huge integers
+        return float(node.value)
+    if isinstance(node, ast.Name):
+        if node.id in variables:
+            return variables[node.id]
+        if node.id in ("pi", "e"):
+            return getattr(math, node.id)
+        raise ValueError(f"Unknown name '{node.id}'")
+    if isinstance(node, ast.List):
+        return [_eval_node(item, variables) for item in node.elts]
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        return _UNARY_OPS[type(node.op)](_eval_node(node.operand, variables))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        left = _eval_node(node.left, variables)
+        right = _eval_node(node.right, variables)
+        if isinstance(node.op, ast.Pow) and abs(right) > _MAX_EXPONENT:
+            raise ValueError(f"Exponent {right} is too large")
+        return _BINARY_OPS[type(node.op)](left, right)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS and not node.keywords:
+        return _FUNCTIONS[node.func.id](*[_eval_node(arg, variables) for arg in node.args])
+    raise ValueError(f"Unsupported expression element: {ast.dump(node)[:80]}")
+
+
+def evaluate_expression(expression: str, variables: Optional[Dict[str, float]] = None) -> float:
+    """Evaluate an arithmetic expression by walking its AST; no eval, attributes or imports."""
+    if len(expression) > _MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Expression longer than {_MAX_EXPRESSION_LENGTH} characters")
+    tree = ast.parse(expression.strip(), mode="eval")
+    result = _eval_node(tree, {name: float(value) for name, value in (variables or {}).items()})
+    if isinstance(result, list):
+        raise ValueError("Expression must evaluate to a number")
+    return float(result)
+
+
+@mcp.tool()
+def evaluate(expressions: List[str], variables: Optional[Dict[str, float]] = None) -> List[float]:
+    """Evaluate several arithmetic expressions in one call.
+
+    Supports numbers, + - * / // % **, parentheses, the constants pi and e,
+    the functions abs, min, max, round, floor, ceil, sqrt, log, exp and sum
+    (sum also accepts a list literal), and named variables.
+
+    Args:
+        expressions: Expressions, e.g. ['floor(cash * 0.1 / 182.5)', '(p1 - p0) / p0'].
+        variables: Optional values for the names used in the expressions, e.g. {'cash': 10000, 'p0': 100, 'p1': 104}.
+
+    Returns:
+        One float per expression, in the same order.
+    """
+    results = []
+    for i, expression in enumerate(expressions):
+        try:
+            results.append(evaluate_expression(expression, variables))
+        except (SyntaxError, ValueError, TypeError, ArithmeticError) as e:
+            raise ValueError(f"Expression {i} ({expression!r}): {e}") from e
+    return results
+
+
 if __name__ == "__main__":
     port = int(os.getenv("MATH_HTTP_PORT", "8000"))
     mcp.run(transport="streamable-http", port=port)
@@ -8,6 +8,7 @@ sys.path.insert(0, project_root)
 from tools.price_tools import get_yesterday_date, get_open_prices, get_yesterday_open_and_close_price, get_latest_position, get_yesterday_profit
 import json
 from tools.general_tools import get_config_value,write_config_value
+from tools.position_ledger import PositionTransaction, default_position_file, get_position_writer
 mcp = FastMCP("TradeTools")
 
 
@@ -49,36 +50,35 @@ def buy(symbol: str, amount: int) -> Dict[str, Any]:
     # Get current trading date from environment variable
     today_date = get_config_value("TODAY_DATE")
     
-    # Step 2: Get current latest position and operation ID
-    # get_latest_position returns two values: position dictionary and current maximum operation ID
-    # This ID is used to ensure each operation has a unique identifier
-    try:
-        current_position, current_action_id = get_latest_position(today_date, signature)
-    except Exception as e:
-        print(e)
-        print(current_position, current_action_id)
-        print(today_date, signature)
-    # Step 3: Get stock opening price for the day
-    # Use get_open_prices function to get the opening price of specified stock for the day
-    # If stock symbol does not exist or price data is missing, KeyError exception will be raised
-    try:
-        this_symbol_price = get_open_prices(today_date, [symbol])[f'{symbol}_price']
-    except KeyError:
-        # Stock symbol does not exist or price data is missing, return error message
-        return {"error": f"Symbol {symbol} not found! This action will not be allowed.", "symbol": symbol, "date": today_date}
+    # Steps 2-6 run inside one ledger transaction, so no other writer can change the position in between
+    with get_position_writer(str(default_position_file(signature))).transaction() as txn:
+        # Step 2: Get current latest position
+        # get_latest_position returns two values: position dictionary and current maximum operation ID
+        # The ID of the new record is assigned by the ledger writer, ensuring each operation has a unique identifier
+        try:
+            current_position, current_action_id = get_latest_position(today_date, signature)
+        except Exception as e:
+            print(e)
+            print(today_date, signature)
+            raise
+        # Step 3: Get stock opening price for the day
+        # Use get_open_prices function to get the opening price of specified stock for the day
+        # If stock symbol does not exist or price data is missing, KeyError exception will be raised
+        try:
+            this_symbol_price = get_open_prices(today_date, [symbol])[f'{symbol}_price']
+        except KeyError:
+            # Stock symbol does not exist or price data is missing, return error message
+            return {"error": f"Symbol {symbol} not found! This action will not be allowed.", "symbol": symbol, "date": today_date}
 
-    # Step 4: Validate buy conditions
-    # Calculate cash required for purchase: stock price × buy quantity
-    try:
+        # Step 4: Validate buy conditions
+        # Calculate cash required for purchase: stock price × buy quantity
         cash_left = current_position["CASH"] - this_symbol_price * amount
-    except Exception as e:
-        print(current_position, "CASH", this_symbol_price, amount)
-
-    # Check if cash balance is sufficient for purchase
-    if cash_left < 0:
-        # Insufficient cash, return error message
-        return {"error": "Insufficient cash! This action will not be allowed.", "required_cash": this_symbol_price * amount, "cash_available": current_position.get("CASH", 0), "symbol": symbol, "date": today_date}
-    else:
+
+        # Check if cash balance is sufficient for purchase
+        if cash_left < 0:
+            # Insufficient cash, return error message
+            return {"error": "Insufficient cash! This action will not be allowed.", "required_cash": this_symbol_price * amount, "cash_available": current_position.get("CASH", 0), "symbol": symbol, "date": today_date}
+
         # Step 5: Execute buy operation, update position
         # Create a copy of current position to avoid directly modifying original data
         new_position = current_position.copy()
@@ -87,21 +87,15 @@ def buy(symbol: str, amount: int) -> Dict[str, Any]:
         new_position["CASH"] = cash_left
         
         # Increase stock position quantity
-        new_position[symbol] += amount
+        new_position[symbol] = new_position.get(symbol, 0) + amount
         
         # Step 6: Record transaction to position.jsonl file
-        # Build file path: {project_root}/data/agent_data/{signature}/position/position.jsonl
-        # Use append mode ("a") to write new transaction record
-        # Each operation ID increments by 1, ensuring uniqueness of operation sequence
-        position_file_path = os.path.join(project_root, "data", "agent_data", signature, "position", "position.jsonl")
-        with open(position_file_path, "a") as f:
-            # Write JSON format transaction record, containing date, operation ID, transaction details and updated position
-            print(f"Writing to position.jsonl: {json.dumps({'date': today_date, 'id': current_action_id + 1, 'this_action':{'action':'buy','symbol':symbol,'amount':amount},'positions': new_position})}")
-            f.write(json.dumps({"date": today_date, "id": current_action_id + 1, "this_action":{"action":"buy","symbol":symbol,"amount":amount},"positions": new_position}) + "\n")
-        # Step 7: Return updated position
-        write_config_value("IF_TRADE", True)
-        print("IF_TRADE", get_config_value("IF_TRADE"))
-        return new_position
+        # The record is appended to {project_root}/data/agent_data/{signature}/position/position.jsonl when the transaction commits
+        record = txn.append(today_date, {"action": "buy", "symbol": symbol, "amount": amount}, new_position)
+        print(f"Writing to position.jsonl: {json.dumps(record)}")
+    # Step 7: Return updated position
+    write_config_value("IF_TRADE", True)
+    return new_position
 
 @mcp.tool()
 def sell(symbol: str, amount: int) -> Dict[str, Any]:
@@ -140,54 +134,234 @@ def sell(symbol: str, amount: int) -> Dict[str, Any]:
     # Get current trading date from environment variable
     today_date = get_config_value("TODAY_DATE")
     
-    # Step 2: Get current latest position and operation ID
-    # get_latest_position returns two values: position dictionary and current maximum operation ID
-    # This ID is used to ensure each operation has a unique identifier
-    current_position, current_action_id = get_latest_position(today_date, signature)
-    
-    # Step 3: Get stock opening price for the day
-    # Use get_open_prices function to get the opening price of specified stock for the day
-    # If stock symbol does not exist or price data is missing, KeyError exception will be raised
-    try:
-        this_symbol_price = get_open_prices(today_date, [symbol])[f'{symbol}_price']
-    except KeyError:
-        # Stock symbol does not exist or price data is missing, return error message
-        return {"error": f"Symbol {symbol} not found! This action will not be allowed.", "symbol": symbol, "date": today_date}
-
-    # Step 4: Validate sell conditions
-    # Check if holding this stock
-    if symbol not in current_position:
-        return {"error": f"No position for {symbol}! This action will not be allowed.", "symbol": symbol, "date": today_date}
-
-    # Check if position quantity is sufficient for selling
-    if current_position[symbol] < amount:
-        return {"error": "Insufficient shares! This action will not be allowed.", "have": current_position.get(symbol, 0), "want_to_sell": amount, "symbol": symbol, "date": today_date}
-
-    # Step 5: Execute sell operation, update position
-    # Create a copy of current position to avoid directly modifying original data
-    new_position = current_position.copy()
-    
-    # Decrease stock position quantity
-    new_position[symbol] -= amount
-    
-    # Increase cash balance: sell price × sell quantity
-    # Use get method to ensure CASH field exists, default to 0 if not present
-    new_position["CASH"] = new_position.get("CASH", 0) + this_symbol_price * amount
-
-    # Step 6: Record transaction to position.jsonl file
-    # Build file path: {project_root}/data/agent_data/{signature}/position/position.jsonl
-    # Use append mode ("a") to write new transaction record
-    # Each operation ID increments by 1, ensuring uniqueness of operation sequence
-    position_file_path = os.path.join(project_root, "data", "agent_data", signature, "position", "position.jsonl")
-    with open(position_file_path, "a") as f:
-        # Write JSON format transaction record, containing date, operation ID and updated position
-        print(f"Writing to position.jsonl: {json.dumps({'date': today_date, 'id': current_action_id + 1, 'this_action':{'action':'sell','symbol':symbol,'amount':amount},'positions': new_position})}")
-        f.write(json.dumps({"date": today_date, "id": current_action_id + 1, "this_action":{"action":"sell","symbol":symbol,"amount":amount},"positions": new_position}) + "\n")
+    # Steps 2-6 run inside one ledger transaction, so no other writer can change the position in between
+    with get_position_writer(str(default_position_file(signature))).transaction() as txn:
+        # Step 2: Get current latest position
+        # get_latest_position returns two values: position dictionary and current maximum operation ID
+        # The ID of the new record is assigned by the ledger writer, ensuring each operation has a unique identifier
+        current_position, current_action_id = get_latest_position(today_date, signature)
+        
+        # Step 3: Get stock opening price for the day
+        # Use get_open_prices function to get the opening price of specified stock for the day
+        # If stock symbol does not exist or price data is missing, KeyError exception will be raised
+        try:
+            this_symbol_price = get_open_prices(today_date, [symbol])[f'{symbol}_price']
+        except KeyError:
+            # Stock symbol does not exist or price data is missing, return error message
+            return {"error": f"Symbol {symbol} not found! This action will not be allowed.", "symbol": symbol, "date": today_date}
+
+        # Step 4: Validate sell conditions
+        # Check if holding this stock
+        if symbol not in current_position:
+            return {"error": f"No position for {symbol}! This action will not be allowed.", "symbol": symbol, "date": today_date}
+
+        # Check if position quantity is sufficient for selling
+        if current_position[symbol] < amount:
+            return {"error": "Insufficient shares! This action will not be allowed.", "have": current_position.get(symbol, 0), "want_to_sell": amount, "symbol": symbol, "date": today_date}
+
+        # Step 5: Execute sell operation, update position
+        # Create a copy of current position to avoid directly modifying original data
+        new_position = current_position.copy()
+        
+        # Decrease stock position quantity
+        new_position[symbol] -= amount
+        
+        # Increase cash balance: sell price × sell quantity
+        # Use get method to ensure CASH field exists, default to 0 if not present
+        new_position["CASH"] = new_position.get("CASH", 0) + this_symbol_price * amount
+
+        # Step 6: Record transaction to position.jsonl file
+        # The record is appended to {project_root}/data/agent_data/{signature}/position/position.jsonl when the transaction commits
+        record = txn.append(today_date, {"action": "sell", "symbol": symbol, "amount": amount}, new_position)
+        print(f"Writing to position.jsonl: {json.dumps(record)}")
 
     # Step 7: Return updated position
     write_config_value("IF_TRADE", True)
     return new_position
 
+def _commit_plan(txn: PositionTransaction, today_date: str, steps: List[tuple]) -> Dict[str, Any]:
+    """Stage one record per executed order in the open ledger transaction and return the final position"""
+    for order, position in steps:
+        txn.append(today_date, {"action": order["side"], "symbol": order["symbol"], "amount": order["amount"]}, position)
+    print(f"Writing {len(steps)} records to position.jsonl")
+    return steps[-1][1]
+
+
+def _normalize_orders(orders: List[Dict[str, Any]], today_date: str) -> Dict[str, Any]:
+    """
+    Check the shape of each order and normalise side and amount
+
+    Runs before any prices are fetched, so malformed orders never reach the price lookup.
+
+    Returns:
+        {"orders": [{"symbol", "side", "amount"}, ...]} on success, {"error": ...} otherwise
+    """
+    normalized = []
+    for index, order in enumerate(orders):
+        if not isinstance(order, dict):
+            return {"error": f"Order {index}: each order must be an object like {{\"symbol\": \"AAPL\", \"side\": \"buy\", \"amount\": 10}}. No orders were executed.", "order": order, "date": today_date}
+        symbol = order.get("symbol")
+        side = str(order.get("side", "")).lower()
+        amount = order.get("amount")
+        if isinstance(amount, float) and amount.is_integer():
+            amount = int(amount)
+        if not isinstance(symbol, str) or not symbol:
+            return {"error": f"Order {index}: symbol must be a ticker string such as \"AAPL\". No orders were executed.", "order": order, "date": today_date}
+        if side not in ("buy", "sell"):
+            return {"error": f"Order {index}: side must be 'buy' or 'sell'. No orders were executed.", "order": order, "date": today_date}
+        if not isinstance(amount, int) or isinstance(amount, bool) or amount <= 0:
+            return {"error": f"Order {index}: amount must be a positive integer. No orders were executed.", "order": order, "date": today_date}
+        normalized.append({"symbol": symbol, "side": side, "amount": amount})
+    return {"orders": normalized}
+
+
+def _plan_orders(orders: List[Dict[str, Any]], current_position: Dict[str, float], prices: Dict[str, Optional[float]], today_date: str) -> Dict[str, Any]:
+    """
+    Validate a batch of normalised orders against one position snapshot and compute the resulting records
+
+    Orders must already have passed _normalize_orders. Sells are applied
+    before buys so that sale proceeds can fund purchases. Nothing is applied
+    if any order fails validation.
+
+    Returns:
+        {"steps": [(order, new_position), ...]} on success, {"error": ...} otherwise
+    """
+    for index, order in enumerate(orders):
+        if prices.get(f'{order["symbol"]}_price') is None:
+            return {"error": f"Order {index}: Symbol {order['symbol']} not found! No orders were executed.", "order": order, "date": today_date}
+
+    position = current_position.copy()
+    steps = []
+    for order in sorted(orders, key=lambda o: o["side"] != "sell"):
+        symbol, amount = order["symbol"], order["amount"]
+        price = prices[f'{symbol}_price']
+        if order["side"] == "sell":
+            if position.get(symbol, 0) < amount:
+                return {"error": "Insufficient shares! No orders were executed.", "have": position.get(symbol, 0), "want_to_sell": amount, "symbol": symbol, "date": today_date}
+            position[symbol] = position[symbol] - amount
+            position["CASH"] = position.get("CASH", 0) + price * amount
+        else:
+            cash_left = position.get("CASH", 0) - price * amount
+            if cash_left < 0:
+                return {"error": "Insufficient cash! No orders were executed.", "required_cash": price * amount, "cash_available": position.get("CASH", 0), "symbol": symbol, "date": today_date}
+            position["CASH"] = cash_left
+            position[symbol] = position.get(symbol, 0) + amount
+        steps.append((order, position.copy()))
+    return {"steps": steps}
+
+
+@mcp.tool()
+def execute_orders(orders: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Execute several buy/sell orders at today's opening prices in one call
+
+    All orders are checked against the same position snapshot. Sells are
+    executed before buys, so their proceeds can pay for the buys. The batch
+    is all-or-nothing: if any order is invalid (unknown symbol, not enough
+    shares or cash) nothing is executed and the error is returned.
+
+    Args:
+        orders: List of orders, each {"symbol": "AAPL", "side": "buy" or "sell", "amount": 10}
+
+    Returns:
+        Dict[str, Any]:
+          - Success: Returns new position dictionary (containing stock quantity and cash balance)
+          - Failure: Returns {"error": error message, ...} dictionary
+
+    Example:
+        >>> result = execute_orders([{"symbol": "MSFT", "side": "sell", "amount": 5}, {"symbol": "AAPL", "side": "buy", "amount": 10}])
+        >>> print(result)  # {"AAPL": 110, "MSFT": 0, "CASH": 5000.0, ...}
+    """
+    signature = get_config_value("SIGNATURE")
+    if signature is None:
+        raise ValueError("SIGNATURE environment variable is not set")
+    today_date = get_config_value("TODAY_DATE")
+
+    if not orders or not isinstance(orders, list):
+        return {"error": "No orders given.", "date": today_date}
+    normalized = _normalize_orders(orders, today_date)
+    if "error" in normalized:
+        return normalized
+    orders = normalized["orders"]
+
+    # One snapshot of positions and prices for the whole batch, locked until the records are written
+    with get_position_writer(str(default_position_file(signature))).transaction() as txn:
+        current_position, _ = get_latest_position(today_date, signature)
+        prices = get_open_prices(today_date, [order["symbol"] for order in orders])
+
+        plan = _plan_orders(orders, current_position, prices, today_date)
+        if "error" in plan:
+            return plan
+        new_position = _commit_plan(txn, today_date, plan["steps"])
+    write_config_value("IF_TRADE", True)
+    return new_position
+
+
+@mcp.tool()
+def rebalance(target_weights: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Rebalance listed stocks to target portfolio weights at today's opening prices
+
+    Total portfolio value is cash plus every holding valued at today's opening
+    price. Each listed symbol is traded to floor(weight * total value / price)
+    shares; symbols that are not listed are left unchanged. The resulting sells
+    and buys are executed as one batch via the same rules as execute_orders.
+
+    Args:
+        target_weights: {symbol: weight}, weights between 0 and 1 summing to at most 1, e.g. {"AAPL": 0.3, "MSFT": 0.2}
+
+    Returns:
+        Dict[str, Any]:
+          - Success: Returns new position dictionary (containing stock quantity and cash balance)
+          - Failure: Returns {"error": error message, ...} dictionary
+    """
+    signature = get_config_value("SIGNATURE")
+    if signature is None:
+        raise ValueError("SIGNATURE environment variable is not set")
+    today_date = get_config_value("TODAY_DATE")
+
+    try:
+        weights = {symbol: float(weight) for symbol, weight in target_weights.items()}
+    except (TypeError, ValueError, AttributeError):
+        weights = None
+    if weights is None or any(weight != weight or weight < 0 for weight in weights.values()) or sum(weights.values()) > 1 + 1e-9:
+        return {"error": "Target weights must be numbers that are non-negative and sum to at most 1.", "target_weights": target_weights, "date": today_date}
+    target_weights = weights
+
+    with get_position_writer(str(default_position_file(signature))).transaction() as txn:
+        current_position, _ = get_latest_position(today_date, signature)
+        held = [symbol for symbol, shares in current_position.items() if symbol != "CASH" and shares]
+        prices = get_open_prices(today_date, list(target_weights) + held)
+
+        missing = [symbol for symbol in target_weights if prices.get(f'{symbol}_price') is None]
+        if missing:
+            return {"error": f"Symbols not found: {missing}. No orders were executed.", "date": today_date}
+
+        total_value = current_position.get("CASH", 0)
+        for symbol in held:
+            price = prices.get(f'{symbol}_price')
+            if price is not None:
+                total_value += current_position[symbol] * price
+
+        orders = []
+        for symbol, weight in target_weights.items():
+            target_shares = int(weight * total_value // prices[f'{symbol}_price'])
+            delta = target_shares - current_position.get(symbol, 0)
+            if delta > 0:
+                orders.append({"symbol": symbol, "side": "buy", "amount": int(delta)})
+            elif delta < 0:
+                orders.append({"symbol": symbol, "side": "sell", "amount": int(-delta)})
+        if not orders:
+            return current_position
+
+        plan = _plan_orders(orders, current_position, prices, today_date)
+        if "error" in plan:
+            return plan
+        new_position = _commit_plan(txn, today_date, plan["steps"])
+
+    write_config_value("IF_TRADE", True)
+    return new_position
+
 if __name__ == "__main__":
     # new_result = buy("AAPL", 1)
     # print(new_result)
@@ -9,6 +9,7 @@ from typing import Dict, Iterable, List
 import pandas as pd
 
 from ..agents import CoordinatorConfig, EnsembleCoordinator, AgentSpec
+from ..configs import Settings, trading_sessions
 from ..core.backtester import Backtester, AllocationPlanner
 from ..core.performance import summarize_performance
 from ..core.data_feed import DataFeed
@@ -50,9 +51,8 @@ def parse_args(argv: Iterable[str] | None = None) -> argparse.Namespace:
     return parser.parse_args(list(argv) if argv is not None else None)
 
 
-def build_date_range(start: str, end: str) -> List[str]:
-    dates = pd.date_range(start=start, end=end, freq="B")
-    return [date.strftime("%Y-%m-%d") for date in dates]
+def build_date_range(start: str, end: str, settings: Settings | None = None) -> List[str]:
+    return trading_sessions(start, end, settings=settings)
 
 
 def create_llm_coordinator(data_feed: DataFeed) -> AllocationPlanner:
@@ -73,9 +73,9 @@ def create_llm_coordinator(data_feed: DataFeed) -> AllocationPlanner:
 
 def main(argv: Iterable[str] | None = None) -> None:
     args = parse_args(argv)
-    dates = build_date_range(args.start, args.end)
 
     data_feed = DataFeed.create_default()
+    dates = build_date_range(args.start, args.end, data_feed.settings)
     backtester = Backtester(data_feed)
 
     if args.mode == "demo":
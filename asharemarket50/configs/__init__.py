@@ -1,6 +1,7 @@
 """Configuration helpers for the CSI 50 simulator project."""
 
+from .calendar import SSE_HOLIDAYS, trading_sessions
 from .settings import Settings
 from .universe import load_universe
 
-__all__ = ["Settings", "load_universe"]
+__all__ = ["SSE_HOLIDAYS", "Settings", "load_universe", "trading_sessions"]
@@ -0,0 +1,42 @@
+"""Shanghai Stock Exchange trading calendar."""
+from __future__ import annotations
+
+from typing import List
+
+import pandas as pd
+
+from .settings import Settings
+
+#: Weekday closures published by the SSE (weekend make-up days never trade).
+SSE_HOLIDAYS: frozenset[str] = frozenset(
+    {
+        # 2024
+        "2024-01-01", "2024-02-09", "2024-02-12", "2024-02-13", "2024-02-14",
+        "2024-02-15", "2024-02-16", "2024-04-04", "2024-04-05", "2024-05-01",
+        "2024-05-02", "2024-05-03", "2024-06-10", "2024-09-16", "2024-09-17",
+        "2024-10-01", "2024-10-02", "2024-10-03", "2024-10-04", "2024-10-07",
+        # 2025
+        "2025-01-01", "2025-01-28", "2025-01-29", "2025-01-30", "2025-01-31",
+        "2025-02-03", "2025-02-04", "2025-04-04", "2025-05-01", "2025-05-02",
+        "2025-05-05", "2025-06-02", "2025-10-01", "2025-10-02", "2025-10-03",
+        "2025-10-06", "2025-10-07", "2025-10-08",
+        # 2026
+        "2026-01-01", "2026-01-02", "2026-02-16", "2026-02-17", "2026-02-18",
+        "2026-02-19", "2026-02-20", "2026-02-23", "2026-04-06", "2026-05-01",
+        "2026-05-04", "2026-05-05", "2026-06-19", "2026-09-25", "2026-10-01",
+        "2026-10-02", "2026-10-05", "2026-10-06", "2026-10-07",
+    }
+)
+
+
+def trading_sessions(start: str, end: str, *, settings: Settings | None = None) -> List[str]:
+    """Return SSE sessions in the inclusive range ``[start, end]``.
+
+    ``settings.trading_calendar`` takes precedence when it is populated;
+    otherwise weekdays minus :data:`SSE_HOLIDAYS` are used.
+    """
+
+    if settings is not None and settings.trading_calendar:
+        return [day for day in sorted(set(settings.trading_calendar)) if start <= day <= end]
+    dates = pd.bdate_range(start=start, end=end, freq="C", holidays=sorted(SSE_HOLIDAYS))
+    return [date.strftime("%Y-%m-%d") for date in dates]
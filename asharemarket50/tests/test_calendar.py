@@ -0,0 +1,11 @@
+from asharemarket50.configs import Settings, trading_sessions
+
+
+def test_trading_sessions_skip_national_day_holiday():
+    sessions = trading_sessions("2025-09-29", "2025-10-10")
+    assert sessions == ["2025-09-29", "2025-09-30", "2025-10-09", "2025-10-10"]
+
+
+def test_trading_sessions_prefer_settings_calendar():
+    settings = Settings(trading_calendar=["2024-01-03", "2024-01-02", "2024-01-10"])
+    assert trading_sessions("2024-01-01", "2024-01-05", settings=settings) == ["2024-01-02", "2024-01-03"]
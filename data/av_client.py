@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import requests
+from dotenv import load_dotenv
+load_dotenv()
+
+# Alpha Vantage endpoint; point ALPHAVANTAGE_BASE_URL at a local stub server to run offline
+DEFAULT_BASE_URL = "https://www.alphavantage.co/query"
+# Requests per minute allowed by the API key's plan (75 is the smallest premium plan)
+DEFAULT_CALLS_PER_MINUTE = 75
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_RETRIES = 5
+# "Information" messages that retrying cannot fix: premium-only endpoints/parameters,
+# malformed calls and the daily quota of free keys (everything else is throttling)
+PERMANENT_INFORMATION_MARKERS = ("premium", "invalid", "per day")
+
+
+class ThrottledError(Exception):
+    """The API answered with a rate-limit message (Note / Information / HTTP 429)."""
+
+
+class PermanentError(Exception):
+    """The API rejected the request (e.g. unknown symbol, premium-only call); retrying will not help."""
+
+
+def classify_information(message: str) -> Exception:
+    """Map an "Information" message to PermanentError or ThrottledError."""
+    lowered = message.lower()
+    if any(marker in lowered for marker in PERMANENT_INFORMATION_MARKERS):
+        return PermanentError(message)
+    return ThrottledError(message)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket
+
+    Tokens refill at ``rate`` per second up to ``capacity``; ``acquire()``
+    blocks until a token is available. ``penalize()`` empties the bucket and
+    pauses refilling, so every worker backs off after a throttled response.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self, seconds: float) -> None:
+        with self._lock:
+            self._tokens = 0.0
+            self._updated = max(self._updated, time.monotonic() + seconds)
+
+
+class AlphaVantageClient:
+    """
+    Rate-limited Alpha Vantage client
+
+    Every request takes a token from a shared bucket sized to the plan's
+    per-minute quota. Throttled responses and network errors are retried with
+    exponential backoff plus jitter; API error messages (including premium-only
+    and daily-quota notices) are not retried.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        calls_per_minute: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        base_delay: float = 2.0,
+        timeout: float = 30.0,
+    ):
+        self.api_key = api_key if api_key is not None else os.getenv("ALPHAADVANTAGE_API_KEY")
+        self.base_url = base_url or os.getenv("ALPHAVANTAGE_BASE_URL", DEFAULT_BASE_URL)
+        calls_per_minute = calls_per_minute or float(os.getenv("ALPHAVANTAGE_CALLS_PER_MINUTE", DEFAULT_CALLS_PER_MINUTE))
+        self.bucket = TokenBucket(calls_per_minute / 60.0)
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("ALPHAVANTAGE_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+        self.base_delay = base_delay
+        self.timeout = timeout
+        self._session = threading.local()
+
+    def _get_session(self) -> requests.Session:
+        session = getattr(self._session, "value", None)
+        if session is None:
+            session = requests.Session()
+            self._session.value = session
+        return session
+
+    def _request(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.bucket.acquire()
+        response = self._get_session().get(self.base_url, params={**params, "apikey": self.api_key}, timeout=self.timeout)
+        if response.status_code == 429:
+            raise ThrottledError(f"HTTP 429: {response.text[:200]}")
+        response.raise_for_status()
+        data = response.json()
+        if data.get("Note") is not None:
+            raise ThrottledError(data["Note"])
+        if data.get("Information") is not None:
+            raise classify_information(data["Information"])
+        if data.get("Error Message") is not None:
+            raise PermanentError(data["Error Message"])
+        return data
+
+    def query(self, **params: Any) -> Dict[str, Any]:
+        """
+        Call the API, retrying throttled responses and transient failures
+
+        Args:
+            **params: Query parameters, e.g. function="TIME_SERIES_DAILY", symbol="AAPL"
+
+        Returns:
+            Parsed JSON response
+
+        Raises:
+            PermanentError: The API rejected the request
+            ThrottledError / requests.RequestException: Still failing after max_retries attempts
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._request(params)
+            except PermanentError:
+                raise
+            except (ThrottledError, requests.RequestException, ValueError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.base_delay * (2 ** attempt) * (0.5 + random.random())
+                if isinstance(e, ThrottledError):
+                    # Throttling is per key, so slow every worker down, not just this one
+                    self.bucket.penalize(delay)
+                print(f"⚠️  {params.get('symbol', '')} attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+
+def write_json_atomic(path: str, data: Any, indent: Optional[int] = 4) -> None:
+    """Write ``data`` as JSON to ``path`` via a temporary file and rename."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp_path, path)
+
+
+class Progress:
+    """
+    Resumable per-run progress: symbols finished today are recorded in a small JSON file
+    and skipped when the script is restarted on the same day.
+    """
+
+    def __init__(self, path: str, run_key: Optional[str] = None):
+        self.path = path
+        self.run_key = run_key or datetime.now().strftime("%Y-%m-%d")
+        self._lock = threading.Lock()
+        self.done: List[str] = []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("run") == self.run_key:
+                self.done = list(saved.get("done", []))
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def is_done(self, symbol: str) -> bool:
+        return symbol in self.done
+
+    def mark_done(self, symbol: str) -> None:
+        with self._lock:
+            if symbol not in self.done:
+                self.done.append(symbol)
+            write_json_atomic(self.path, {"run": self.run_key, "done": self.done}, indent=None)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.done = []
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def run_symbols(symbols: Iterable[str], task: Callable[[str], None], progress: Optional[Progress] = None, max_workers: Optional[int] = None) -> List[str]:
+    """
+    Run ``task(symbol)`` for every symbol in a thread pool
+
+    Symbols already recorded in ``progress`` are skipped; each success is recorded.
+
+    Returns:
+        Symbols whose task raised (after the client's own retries)
+    """
+    max_workers = max_workers or int(os.getenv("ALPHAVANTAGE_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+    pending = [symbol for symbol in dict.fromkeys(symbols) if progress is None or not progress.is_done(symbol)]
+    if progress is not None and len(pending) < len(set(symbols)):
+        print(f"⏭️  Resuming: {len(set(symbols)) - len(pending)} symbols already fetched in this run")
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(task, symbol): symbol for symbol in pending}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ {symbol}: {e}")
+                failed.append(symbol)
+                continue
+            if progress is not None:
+                progress.mark_done(symbol)
+    return failed
@@ -1,8 +1,11 @@
-import requests
 import os
+import sys
+import argparse
 from dotenv import load_dotenv
 load_dotenv()
-import json
+
+from av_client import AlphaVantageClient, Progress, run_symbols, write_json_atomic
+from price_history import SERIES_KEY, HistoryGapError, HistoryStore
 
 
 all_nasdaq_100_symbols = [
@@ -19,27 +22,76 @@ all_nasdaq_100_symbols = [
     "ON", "BIIB", "LULU", "CDW", "GFS"
 ]
 
-def get_daily_price(SYMBOL: str):
+PROGRESS_FILE = "./.daily_price_progress.json"
+HISTORY_DIR = "./history"
+# Bars kept in daily_prices_{SYMBOL}.json, matching an outputsize=compact response
+COMPACT_BARS = 100
+
+_client = None
+
+
+def get_client() -> AlphaVantageClient:
+    global _client
+    if _client is None:
+        _client = AlphaVantageClient()
+    return _client
+
+
+def get_daily_price(SYMBOL: str, history: HistoryStore = None):
     FUNCTION = "TIME_SERIES_DAILY"
     OUTPUTSIZE = 'compact'
-    APIKEY = os.getenv("ALPHAADVANTAGE_API_KEY")
-    url = f'https://www.alphavantage.co/query?function={FUNCTION}&symbol={SYMBOL}&outputsize={OUTPUTSIZE}&apikey={APIKEY}'
-    r = requests.get(url)
-    data = r.json()
-    print(data)
-    if data.get('Note') is not None or data.get('Information') is not None:
-        print(f"Error")
-        return
-    with open(f'./daily_prices_{SYMBOL}.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    # History mode: one full backfill per symbol, compact deltas afterwards
+    backfill = history is not None and history.load_meta(SYMBOL) is None
+    if backfill:
+        OUTPUTSIZE = 'full'
+    # Rate limiting and retries on throttled responses are handled by the client
+    data = get_client().query(function=FUNCTION, symbol=SYMBOL, outputsize=OUTPUTSIZE)
+    if history is not None:
+        try:
+            added = history.apply(SYMBOL, data, full=backfill)
+        except HistoryGapError as e:
+            # Last refresh is older than the compact window: backfill again instead of leaving a hole
+            print(f"⚠️ {e}; re-fetching full history")
+            backfill = True
+            data = get_client().query(function=FUNCTION, symbol=SYMBOL, outputsize='full')
+            added = history.apply(SYMBOL, data, full=True)
+        print(f"📚 {SYMBOL}: {'backfilled' if backfill else 'appended'} {added} bars")
+        if backfill:
+            # Keep daily_prices_{SYMBOL}.json the same size as a compact response
+            series = data.get(SERIES_KEY, {})
+            data = dict(data)
+            data[SERIES_KEY] = {d: series[d] for d in sorted(series, reverse=True)[:COMPACT_BARS]}
+    write_json_atomic(f'./daily_prices_{SYMBOL}.json', data)
     if SYMBOL == "QQQ":
-        with open(f'./Adaily_prices_{SYMBOL}.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        write_json_atomic(f'./Adaily_prices_{SYMBOL}.json', data)
+    print(f"✅ {SYMBOL}: {len(data.get('Time Series (Daily)', {}))} bars")
 
 
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Download daily prices for the NASDAQ 100 symbols and QQQ.")
+    parser.add_argument("symbols", nargs="*", help="Symbols to fetch (default: NASDAQ 100 + QQQ)")
+    parser.add_argument("--workers", type=int, help="Concurrent requests (default: ALPHAVANTAGE_MAX_WORKERS or 8)")
+    parser.add_argument("--restart", action="store_true", help="Ignore today's progress file and fetch everything again")
+    parser.add_argument("--history", action="store_true", help=f"Also keep full history in {HISTORY_DIR}/ (full backfill once, then compact deltas)")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    for symbol in all_nasdaq_100_symbols:
-        get_daily_price(symbol)
+    args = _parse_args()
+    symbols = args.symbols or all_nasdaq_100_symbols + ["QQQ"]
+
+    progress = Progress(PROGRESS_FILE)
+    if args.restart:
+        progress.reset()
 
-    get_daily_price("QQQ")
\ No newline at end of file
+    history = HistoryStore(HISTORY_DIR) if args.history else None
+    failed = run_symbols(symbols, lambda symbol: get_daily_price(symbol, history), progress, args.workers)
+    if failed:
+        # Don't leave silent gaps: report them so the run can be resumed
+        print(f"❌ {len(failed)} symbols failed: {', '.join(sorted(failed))}")
+        print("   Re-run the script to retry only the missing symbols")
+        if not any(progress.is_done(symbol) for symbol in symbols):
+            # Nothing fetched at all (bad key, no network): stop the launch
+            sys.exit(1)
+    else:
+        print(f"✅ All {len(set(symbols))} symbols up to date")
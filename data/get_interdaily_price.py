@@ -1,8 +1,14 @@
-import requests
 import os
+import sys
+import argparse
 from dotenv import load_dotenv
 load_dotenv()
-import json
+
+from av_client import AlphaVantageClient, Progress, run_symbols, write_json_atomic
+
+# 将项目根目录加入 Python 路径，便于复用 tools 下的分钟线缓存编译
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.intraday_store import compile_intraday_cache
 
 
 all_nasdaq_100_symbols = [
@@ -19,29 +25,52 @@ all_nasdaq_100_symbols = [
     "ON", "BIIB", "LULU", "CDW", "GFS"
 ]
 
-def get_daily_price(SYMBOL: str):
-    # FUNCTION = "TIME_SERIES_DAILY"
+PROGRESS_FILE = "./.intraday_price_progress.json"
+
+_client = None
+
+
+def get_client() -> AlphaVantageClient:
+    global _client
+    if _client is None:
+        _client = AlphaVantageClient()
+    return _client
+
+
+def get_intraday_price(SYMBOL: str):
     FUNCTION = "TIME_SERIES_INTRADAY"
     INTERVAL = "60min"
     OUTPUTSIZE = 'compact'
-    APIKEY = os.getenv("ALPHAADVANTAGE_API_KEY")
-    url = f'https://www.alphavantage.co/query?function={FUNCTION}&symbol={SYMBOL}&interval={INTERVAL}&outputsize={OUTPUTSIZE}&entitlement=delayed&apikey={APIKEY}'
-    r = requests.get(url)
-    data = r.json()
-    print(data)
-    if data.get('Note') is not None or data.get('Information') is not None:
-        print(f"Error")
-        return
-    with open(f'./daily_prices_{SYMBOL}.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-    if SYMBOL == "QQQ":
-        with open(f'./Adaily_prices_{SYMBOL}.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+    data = get_client().query(function=FUNCTION, symbol=SYMBOL, interval=INTERVAL, outputsize=OUTPUTSIZE, entitlement="delayed")
+    # Separate file names so intraday bars never overwrite daily_prices_{SYMBOL}.json
+    write_json_atomic(f'./intraday_prices_{SYMBOL}.json', data)
+    print(f"✅ {SYMBOL}: {len(data.get(f'Time Series ({INTERVAL})', {}))} bars")
+
 
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Download 60min bars for the NASDAQ 100 symbols and QQQ.")
+    parser.add_argument("symbols", nargs="*", help="Symbols to fetch (default: NASDAQ 100 + QQQ)")
+    parser.add_argument("--workers", type=int, help="Concurrent requests (default: ALPHAVANTAGE_MAX_WORKERS or 8)")
+    parser.add_argument("--restart", action="store_true", help="Ignore today's progress file and fetch everything again")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    for symbol in all_nasdaq_100_symbols:
-        get_daily_price(symbol)
+    args = _parse_args()
+    symbols = args.symbols or all_nasdaq_100_symbols + ["QQQ"]
+
+    progress = Progress(PROGRESS_FILE)
+    if args.restart:
+        progress.reset()
+
+    failed = run_symbols(symbols, get_intraday_price, progress, args.workers)
+
+    # 编译分钟线列式缓存（data/intraday.cache/），供 get_intraday_prices 工具查询
+    print(f"Intraday cache written to: {compile_intraday_cache(os.path.dirname(os.path.abspath(__file__)))}")
 
-    get_daily_price("QQQ")
\ No newline at end of file
+    if failed:
+        print(f"❌ {len(failed)} symbols failed: {', '.join(sorted(failed))}")
+        print("   Re-run the script to retry only the missing symbols")
+        if not any(progress.is_done(symbol) for symbol in symbols):
+            # Nothing fetched at all (bad key, no network): stop the launch
+            sys.exit(1)
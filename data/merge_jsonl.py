@@ -1,6 +1,14 @@
 import json
 import os
+import re
 import glob
+import hashlib
+import sys
+
+# 将项目根目录加入 Python 路径，便于复用 tools 下的价格缓存编译
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.price_store import compile_price_cache
+from price_history import HistoryStore
 
 
 all_nasdaq_100_symbols = [
@@ -17,51 +25,181 @@ all_nasdaq_100_symbols = [
     "ON", "BIIB", "LULU", "CDW", "GFS"
 ]
 
-# 合并所有以 daily_price 开头的 json，逐文件一行写入 merged.jsonl
-current_dir = os.path.dirname(__file__)
-pattern = os.path.join(current_dir, 'daily_price*.json')
-files = sorted(glob.glob(pattern))
+MERGE_STATE_VERSION = 1
+FILE_PATTERN = re.compile(r'^daily_prices_(.+)\.json$')
+
+
+def transform_daily_prices(data: dict) -> dict:
+    """统一重命名："1. open" -> "1. buy price"；"4. close" -> "4. sell price"；对于最新的一天，只保留 "1. buy price"。"""
+    try:
+        # 查找所有以 "Time Series" 开头的键
+        series = None
+        for key, value in data.items():
+            if key.startswith("Time Series"):
+                series = value
+                break
+        if isinstance(series, dict) and series:
+            # 先对所有日期做键名重命名
+            for d, bar in list(series.items()):
+                if not isinstance(bar, dict):
+                    continue
+                if "1. open" in bar:
+                    bar["1. buy price"] = bar.pop("1. open")
+                if "4. close" in bar:
+                    bar["4. sell price"] = bar.pop("4. close")
+            # 再处理最新日期，仅保留买入价
+            latest_date = max(series.keys())
+            latest_bar = series.get(latest_date, {})
+            if isinstance(latest_bar, dict):
+                buy_val = latest_bar.get("1. buy price")
+                series[latest_date] = {"1. buy price": buy_val} if buy_val is not None else {}
+            # 更新 Meta Data 描述
+            meta = data.get("Meta Data", {})
+            if isinstance(meta, dict):
+                meta["1. Information"] = "Daily Prices (buy price, high, low, sell price) and Volumes"
+    except Exception:
+        # 若结构异常则原样写入
+        pass
+    return data
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _load_state(state_file: str, output_file: str) -> dict:
+    """读取上次合并的状态；若 merged.jsonl 已被其他程序改写，则视为无状态（全量合并）。"""
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        stat = os.stat(output_file)
+        if state.get('version') == MERGE_STATE_VERSION and state.get('output_size') == stat.st_size and state.get('output_mtime_ns') == stat.st_mtime_ns:
+            return state
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {'version': MERGE_STATE_VERSION, 'files': {}}
+
+
+def _list_sources(current_dir: str, history_store: HistoryStore = None):
+    """返回 [(状态键, 文件路径, 标的代码)]；history 模式下对已回填（有 meta）的标的读取 history/{SYMBOL}.jsonl 全量历史。"""
+    # 仅当文件名中的代码（精确匹配）属于纳指100成分时才写入
+    symbol_set = set(all_nasdaq_100_symbols)
+    sources = []
+    for fp in sorted(glob.glob(os.path.join(current_dir, 'daily_price*.json'))):
+        match = FILE_PATTERN.match(os.path.basename(fp))
+        if not match or match.group(1) not in symbol_set:
+            continue
+        symbol = match.group(1)
+        if (history_store is not None and os.path.exists(history_store.bars_path(symbol))
+                and history_store.load_meta(symbol) is not None):
+            sources.append((f'history/{symbol}.jsonl', history_store.bars_path(symbol), symbol))
+        else:
+            sources.append((os.path.basename(fp), fp, symbol))
+    return sources
+
 
-output_file = os.path.join(current_dir, 'merged.jsonl')
+def merge(data_dir: str = None, full: bool = False, history: bool = False) -> bool:
+    """
+    增量合并 daily_prices_{SYMBOL}.json 到 merged.jsonl
 
-with open(output_file, 'w', encoding='utf-8') as fout:
-    for fp in files:
-        basename = os.path.basename(fp)
-        # 仅当文件名包含任一纳指100成分符号时才写入
-        if not any(symbol in basename for symbol in all_nasdaq_100_symbols):
+    每个源文件的 mtime/size/sha256 以及其在 merged.jsonl 中的字节位置记录在 merged.state.json 中。
+    未变化的标的直接拷贝已有的行，只有新增或变化的文件会被重新解析和转换。
+    结果先写入临时文件再原子替换。
+
+    Args:
+        data_dir: 数据目录，默认为本脚本所在目录。
+        full: 忽略状态文件，全量重建。
+        history: 对已有全量历史（history/{SYMBOL}.jsonl）的标的，使用全量历史代替 daily_prices 文件。
+
+    Returns:
+        merged.jsonl 是否被改写。
+    """
+    current_dir = data_dir or os.path.dirname(os.path.abspath(__file__))
+    output_file = os.path.join(current_dir, 'merged.jsonl')
+    state_file = os.path.join(current_dir, 'merged.state.json')
+
+    history_store = HistoryStore(os.path.join(current_dir, 'history')) if history else None
+    sources = _list_sources(current_dir, history_store)
+
+    previous = {'files': {}} if full else _load_state(state_file, output_file)
+    old_files = previous.get('files', {})
+
+    changed = 0
+    entries = []  # (basename, 文件元数据, 新行 bytes 或 None 表示沿用旧行)
+    for basename, fp, symbol in sources:
+        stat = os.stat(fp)
+        old = old_files.get(basename)
+        meta = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+        if old is not None and old['mtime_ns'] == stat.st_mtime_ns and old['size'] == stat.st_size:
+            meta['sha256'] = old['sha256']
+            entries.append((basename, meta, None))
+            continue
+        meta['sha256'] = _file_digest(fp)
+        if old is not None and old['sha256'] == meta['sha256']:
+            entries.append((basename, meta, None))
             continue
-        with open(fp, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        # 统一重命名："1. open" -> "1. buy price"；"4. close" -> "4. sell price"
-        # 对于最新的一天，只保留并写入 "1. buy price"
-        try:
-            # 查找所有以 "Time Series" 开头的键
-            series = None
-            for key, value in data.items():
-                if key.startswith("Time Series"):
-                    series = value
-                    break
-            if isinstance(series, dict) and series:
-                # 先对所有日期做键名重命名
-                for d, bar in list(series.items()):
-                    if not isinstance(bar, dict):
-                        continue
-                    if "1. open" in bar:
-                        bar["1. buy price"] = bar.pop("1. open")
-                    if "4. close" in bar:
-                        bar["4. sell price"] = bar.pop("4. close")
-                # 再处理最新日期，仅保留买入价
-                latest_date = max(series.keys())
-                latest_bar = series.get(latest_date, {})
-                if isinstance(latest_bar, dict):
-                    buy_val = latest_bar.get("1. buy price")
-                    series[latest_date] = {"1. buy price": buy_val} if buy_val is not None else {}
-                # 更新 Meta Data 描述
-                meta = data.get("Meta Data", {})
-                if isinstance(meta, dict):
-                    meta["1. Information"] = "Daily Prices (buy price, high, low, sell price) and Volumes"
-        except Exception:
-            # 若结构异常则原样写入
-            pass
-
-        fout.write(json.dumps(data, ensure_ascii=False) + "\n")
+        if fp.endswith('.jsonl'):
+            data = history_store.load(symbol)
+            if data is None:
+                print(f"⚠️ history/{symbol}.jsonl 缺少元数据，跳过该标的")
+                continue
+        else:
+            with open(fp, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        line = (json.dumps(transform_daily_prices(data), ensure_ascii=False) + "\n").encode('utf-8')
+        entries.append((basename, meta, line))
+        changed += 1
+
+    removed = len(set(old_files) - {basename for basename, _, _ in sources})
+    if not changed and not removed and os.path.exists(output_file) and len(entries) == len(old_files):
+        print("merged.jsonl is up to date")
+        return False
+
+    # 写入临时文件：未变化的行从旧 merged.jsonl 按字节拷贝
+    tmp_file = f"{output_file}.{os.getpid()}.tmp"
+    files_state = {}
+    old_out = open(output_file, 'rb') if os.path.exists(output_file) and old_files else None
+    try:
+        with open(tmp_file, 'wb') as fout:
+            for basename, meta, line in entries:
+                if line is None:
+                    old_out.seek(old_files[basename]['offset'])
+                    line = old_out.read(old_files[basename]['length'])
+                meta['offset'] = fout.tell()
+                meta['length'] = len(line)
+                fout.write(line)
+                files_state[basename] = meta
+    finally:
+        if old_out is not None:
+            old_out.close()
+    os.replace(tmp_file, output_file)
+
+    stat = os.stat(output_file)
+    state = {
+        'version': MERGE_STATE_VERSION,
+        'output_size': stat.st_size,
+        'output_mtime_ns': stat.st_mtime_ns,
+        'files': files_state,
+    }
+    tmp_state = f"{state_file}.{os.getpid()}.tmp"
+    with open(tmp_state, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_state, state_file)
+    print(f"merged.jsonl updated: {changed} changed, {removed} removed, {len(entries) - changed} unchanged")
+    return True
+
+
+if __name__ == "__main__":
+    full = "--full" in sys.argv[1:]
+    history = "--history" in sys.argv[1:]
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    output_file = os.path.join(current_dir, 'merged.jsonl')
+    cache_index = os.path.join(current_dir, 'merged.cache', 'index.json')
+    if merge(current_dir, full=full, history=history) or not os.path.exists(cache_index):
+        # 编译列式二进制缓存（data/merged.cache/），供各服务以只读内存映射方式共享
+        cache_dir = compile_price_cache(output_file)
+        print(f"Price cache written to: {cache_dir}")
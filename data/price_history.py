@@ -0,0 +1,113 @@
+import os
+import json
+from typing import Dict, Optional
+
+from av_client import write_json_atomic
+
+SERIES_KEY = "Time Series (Daily)"
+
+
+class HistoryGapError(ValueError):
+    """An incremental response starts after the last stored date, so bars in between would be lost."""
+
+
+class HistoryStore:
+    """
+    Persistent, append-only daily price history, one pair of files per symbol
+
+    ``{SYMBOL}.jsonl`` holds one bar per line ({"date": ..., "1. open": ...}),
+    appended in fetch order; when a date appears more than once (a revised
+    latest bar) the last line wins. ``{SYMBOL}.meta.json`` holds the last
+    stored date and the API's "Meta Data", so a refresh never has to read the
+    history itself.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def bars_path(self, symbol: str) -> str:
+        return os.path.join(self.root, f"{symbol}.jsonl")
+
+    def meta_path(self, symbol: str) -> str:
+        return os.path.join(self.root, f"{symbol}.meta.json")
+
+    def load_meta(self, symbol: str) -> Optional[dict]:
+        """Return the symbol's metadata, or None if it was never backfilled."""
+        try:
+            with open(self.meta_path(symbol), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def apply(self, symbol: str, data: dict, full: bool = False) -> int:
+        """
+        Store the bars of an API response
+
+        With ``full`` the history is replaced by the response (backfill);
+        otherwise only bars dated on or after the last stored date are appended,
+        so the latest stored bar can be revised.
+
+        Returns:
+            Number of bars written
+
+        Raises:
+            HistoryGapError: If an incremental response does not reach back to the
+                last stored date (fetch outputsize=full and apply it with ``full``)
+        """
+        series = data.get(SERIES_KEY) or {}
+        meta = None if full else self.load_meta(symbol)
+        last_date = meta.get("last_date") if meta else None
+        if last_date is not None and series and min(series) > last_date:
+            raise HistoryGapError(f"{symbol}: response starts at {min(series)}, after the last stored date {last_date}")
+
+        new_dates = sorted(d for d in series if last_date is None or d >= last_date)
+        if last_date is not None and new_dates and new_dates[0] == last_date:
+            # Re-append the last stored bar only if the API revised it
+            if self._read_last_bar(symbol) == series[last_date]:
+                new_dates = new_dates[1:]
+
+        lines = "".join(json.dumps({"date": d, **series[d]}, ensure_ascii=False) + "\n" for d in new_dates)
+        if full:
+            tmp_path = f"{self.bars_path(symbol)}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(lines)
+            os.replace(tmp_path, self.bars_path(symbol))
+        elif lines:
+            with open(self.bars_path(symbol), "a", encoding="utf-8") as f:
+                f.write(lines)
+
+        if full or new_dates:
+            write_json_atomic(self.meta_path(symbol), {
+                # Appended dates are never older than the stored last date
+                "last_date": new_dates[-1] if new_dates else last_date,
+                "meta": data.get("Meta Data", meta.get("meta") if meta else {}),
+            })
+        return len(new_dates)
+
+    def _read_last_bar(self, symbol: str) -> Optional[Dict[str, str]]:
+        try:
+            with open(self.bars_path(symbol), "rb") as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                f.seek(max(0, size - 4096))
+                last_line = f.read().rstrip(b"\n").rsplit(b"\n", 1)[-1]
+            bar = json.loads(last_line)
+        except (OSError, ValueError):
+            return None
+        bar.pop("date", None)
+        return bar
+
+    def load(self, symbol: str) -> Optional[dict]:
+        """Return the full history in the API's format ({"Meta Data", "Time Series (Daily)"}, newest first)."""
+        meta = self.load_meta(symbol)
+        if meta is None:
+            return None
+        bars: Dict[str, dict] = {}
+        with open(self.bars_path(symbol), "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                bar = json.loads(line)
+                bars[bar.pop("date")] = bar
+        return {"Meta Data": meta.get("meta", {}), SERIES_KEY: {d: bars[d] for d in sorted(bars, reverse=True)}}
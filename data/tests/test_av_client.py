@@ -0,0 +1,75 @@
+import os
+import sys
+
+import pytest
+
+# Data scripts import their helpers as top-level modules (they run with cwd=data)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from av_client import AlphaVantageClient, PermanentError, ThrottledError
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+        self.text = str(payload)
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    """Replays canned responses in order and records the request params."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append(params)
+        return self.responses.pop(0)
+
+
+def make_client(responses, max_retries=2):
+    client = AlphaVantageClient(api_key="demo", base_url="http://stub.invalid/query",
+                                calls_per_minute=60000, max_retries=max_retries, base_delay=0.0)
+    session = FakeSession(responses)
+    client._get_session = lambda: session
+    return client, session
+
+
+def test_query_retries_throttled_responses():
+    bars = {"Time Series (Daily)": {"2025-01-02": {"4. close": "1.0"}}}
+    client, session = make_client([
+        FakeResponse({"Note": "API call frequency is 5 calls per minute."}),
+        FakeResponse({}, status_code=429),
+        FakeResponse(bars),
+    ])
+    assert client.query(function="TIME_SERIES_DAILY", symbol="AAPL") == bars
+    assert len(session.calls) == 3
+    assert session.calls[0]["apikey"] == "demo"
+
+
+@pytest.mark.parametrize("message", [
+    "Thank you for using Alpha Vantage! This is a premium endpoint.",
+    "Thank you for using Alpha Vantage! The outputsize=full parameter value is a premium feature.",
+    "Invalid API call. Please retry or visit the documentation.",
+    "Our standard API rate limit is 25 requests per day.",
+])
+def test_query_does_not_retry_permanent_information(message):
+    client, session = make_client([FakeResponse({"Information": message})])
+    with pytest.raises(PermanentError):
+        client.query(function="TIME_SERIES_DAILY", symbol="AAPL")
+    assert len(session.calls) == 1
+
+
+def test_query_gives_up_after_max_retries():
+    throttled = {"Information": "Please consider spreading out your free API requests more sparingly (1 request per second)."}
+    client, session = make_client([FakeResponse(throttled)] * 3, max_retries=2)
+    with pytest.raises(ThrottledError):
+        client.query(function="TIME_SERIES_DAILY", symbol="AAPL")
+    assert len(session.calls) == 3
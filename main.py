@@ -7,7 +7,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import tools and prompts
-from tools.general_tools import get_config_value, write_config_value
+from tools.general_tools import SessionContext, get_runtime_env_path
 from prompts.agent_prompt import all_nasdaq_100_symbols
 
 
@@ -91,6 +91,84 @@ def load_config(config_path=None):
         exit(1)
 
 
+async def run_model(AgentClass, agent_type, model_config, init_date, end_date, agent_kwargs):
+    """
+    Run one model over the date range
+    
+    Args:
+        AgentClass: Agent class to instantiate
+        agent_type: Agent type name (for logging)
+        model_config: Model entry from the configuration file
+        init_date: Start date
+        end_date: End date
+        agent_kwargs: Shared keyword arguments for the agent (log_path, max_steps, ...)
+        
+    Raises:
+        Exception: Re-raised after logging if the agent fails
+    """
+    # Read basemodel and signature directly from configuration file
+    model_name = model_config.get("name", "unknown")
+    basemodel = model_config.get("basemodel")
+    signature = model_config.get("signature")
+    openai_base_url = model_config.get("openai_base_url",None)
+    openai_api_key = model_config.get("openai_api_key",None)
+
+    # Validate required fields
+    if not basemodel:
+        print(f"❌ Model {model_name} missing basemodel field")
+        return
+    if not signature:
+        print(f"❌ Model {model_name} missing signature field")
+        return
+    
+    print("=" * 60)
+    print(f"🤖 Processing model: {model_name}")
+    print(f"📝 Signature: {signature}")
+    print(f"🔧 BaseModel: {basemodel}")
+    
+    # Initialize runtime configuration (the model's own file when models run concurrently)
+    runtime_env = SessionContext(persist_path=agent_kwargs.get("runtime_env_path") or get_runtime_env_path(), write_behind=False)
+    runtime_env.set("SIGNATURE", signature)
+    runtime_env.set("TODAY_DATE", end_date)
+    runtime_env.set("IF_TRADE", False)
+
+    try:
+        # Dynamically create Agent instance
+        agent = AgentClass(
+            signature=signature,
+            basemodel=basemodel,
+            stock_symbols=all_nasdaq_100_symbols,
+            openai_base_url=openai_base_url,
+            openai_api_key=openai_api_key,
+            init_date=init_date,
+            **agent_kwargs
+        )
+        
+        print(f"✅ {agent_type} instance created successfully: {agent}")
+        
+        # Initialize MCP connection and AI model
+        await agent.initialize()
+        print("✅ Initialization successful")
+        # Run all trading days in date range
+        await agent.run_date_range(init_date, end_date)
+        
+        # Display final position summary
+        summary = agent.get_position_summary()
+        print(f"📊 Final position summary:")
+        print(f"   - Latest date: {summary.get('latest_date')}")
+        print(f"   - Total records: {summary.get('total_records')}")
+        print(f"   - Cash balance: ${summary.get('positions', {}).get('CASH', 0):.2f}")
+        
+    except Exception as e:
+        print(f"❌ Error processing model {model_name} ({signature}): {str(e)}")
+        print(f"📋 Error details: {e}")
+        raise
+    
+    print("=" * 60)
+    print(f"✅ Model {model_name} ({signature}) processing completed")
+    print("=" * 60)
+
+
 async def main(config_path=None):
     """Run trading experiment using BaseAgent class
     
@@ -140,6 +218,9 @@ async def main(config_path=None):
     max_retries = agent_config.get("max_retries", 3)
     base_delay = agent_config.get("base_delay", 0.5)
     initial_cash = agent_config.get("initial_cash", 10000.0)
+    max_context_tokens = agent_config.get("max_context_tokens", 32000)
+    keep_recent_steps = agent_config.get("keep_recent_steps", 3)
+    retry_budget = agent_config.get("retry_budget", 20)
     
     # Display enabled model information
     model_names = [m.get("name", m.get("signature")) for m in enabled_models]
@@ -150,77 +231,49 @@ async def main(config_path=None):
     print(f"🤖 Model list: {model_names}")
     print(f"⚙️  Agent config: max_steps={max_steps}, max_retries={max_retries}, base_delay={base_delay}, initial_cash={initial_cash}")
                     
-    for model_config in enabled_models:
-        # Read basemodel and signature directly from configuration file
-        model_name = model_config.get("name", "unknown")
-        basemodel = model_config.get("basemodel")
-        signature = model_config.get("signature")
-        openai_base_url = model_config.get("openai_base_url",None)
-        openai_api_key = model_config.get("openai_api_key",None)
-
-        # Validate required fields
-        if not basemodel:
-            print(f"❌ Model {model_name} missing basemodel field")
-            continue
-        if not signature:
-            print(f"❌ Model {model_name} missing signature field")
-            continue
-        
-        print("=" * 60)
-        print(f"🤖 Processing model: {model_name}")
-        print(f"📝 Signature: {signature}")
-        print(f"🔧 BaseModel: {basemodel}")
+    # Get log path configuration
+    log_path = log_config.get("log_path", "./data/agent_data")
+    max_concurrent_models = max(1, int(agent_config.get("max_concurrent_models", 1)))
+    
+    agent_kwargs = dict(
+        log_path=log_path,
+        max_steps=max_steps,
+        max_retries=max_retries,
+        base_delay=base_delay,
+        initial_cash=initial_cash,
+        max_context_tokens=max_context_tokens,
+        keep_recent_steps=keep_recent_steps,
+        retry_budget=retry_budget,
+    )
+    
+    if max_concurrent_models == 1:
+        for model_config in enabled_models:
+            try:
+                await run_model(AgentClass, agent_type, model_config, INIT_DATE, END_DATE, agent_kwargs)
+            except Exception:
+                # Can choose to continue processing next model, or exit
+                # continue  # Continue processing next model
+                exit()  # Or exit program
+    else:
+        print(f"⚡ Running up to {max_concurrent_models} models concurrently")
+        semaphore = asyncio.Semaphore(max_concurrent_models)
         
-        # Initialize runtime configuration
-        write_config_value("SIGNATURE", signature)
-        write_config_value("TODAY_DATE", END_DATE)
-        write_config_value("IF_TRADE", False)
-
-
-        # Get log path configuration
-        log_path = log_config.get("log_path", "./data/agent_data")
-
-        try:
-            # Dynamically create Agent instance
-            agent = AgentClass(
-                signature=signature,
-                basemodel=basemodel,
-                stock_symbols=all_nasdaq_100_symbols,
-                log_path=log_path,
-                openai_base_url=openai_base_url,
-                openai_api_key=openai_api_key,
-                max_steps=max_steps,
-                max_retries=max_retries,
-                base_delay=base_delay,
-                initial_cash=initial_cash,
-                init_date=INIT_DATE
-            )
-            
-            print(f"✅ {agent_type} instance created successfully: {agent}")
-            
-            # Initialize MCP connection and AI model
-            await agent.initialize()
-            print("✅ Initialization successful")
-            # Run all trading days in date range
-            await agent.run_date_range(INIT_DATE, END_DATE)
-            
-            # Display final position summary
-            summary = agent.get_position_summary()
-            print(f"📊 Final position summary:")
-            print(f"   - Latest date: {summary.get('latest_date')}")
-            print(f"   - Total records: {summary.get('total_records')}")
-            print(f"   - Cash balance: ${summary.get('positions', {}).get('CASH', 0):.2f}")
-            
-        except Exception as e:
-            print(f"❌ Error processing model {model_name} ({signature}): {str(e)}")
-            print(f"📋 Error details: {e}")
-            # Can choose to continue processing next model, or exit
-            # continue  # Continue processing next model
-            exit()  # Or exit program
+        async def run_limited(model_config):
+            async with semaphore:
+                # Each model gets its own runtime config file, so SIGNATURE/TODAY_DATE/IF_TRADE don't collide
+                signature = model_config.get("signature") or model_config.get("name", "unknown")
+                runtime_env_path = os.path.join(os.path.abspath(log_path), signature, ".runtime_env.json")
+                os.makedirs(os.path.dirname(runtime_env_path), exist_ok=True)
+                try:
+                    await run_model(
+                        AgentClass, agent_type, model_config, INIT_DATE, END_DATE,
+                        dict(agent_kwargs, runtime_env_path=runtime_env_path)
+                    )
+                except Exception:
+                    # Already reported; keep the other models running
+                    pass
         
-        print("=" * 60)
-        print(f"✅ Model {model_name} ({signature}) processing completed")
-        print("=" * 60)
+        await asyncio.gather(*(run_limited(model_config) for model_config in enabled_models))
     
     print("🎉 All models processing completed!")
     
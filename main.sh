@@ -16,11 +16,13 @@ cd ../
 
 echo "🔧 Now starting MCP services..."
 cd ./agent_tools
-python start_mcp_services.py
-cd ../
+python start_mcp_services.py &
+MCP_PID=$!
+trap "kill $MCP_PID 2>/dev/null" EXIT
 
-#waiting for MCP services to start
-sleep 2
+# waiting until every MCP service answers list_tools
+python start_mcp_services.py wait
+cd ../
 
 echo "🤖 Now starting the main trading agent..."
 python main.py configs/default_config.json
@@ -10,7 +10,7 @@ import os
 # Add project root directory to Python path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
-from tools.price_tools import get_yesterday_date, get_open_prices, get_yesterday_open_and_close_price, get_today_init_position, get_yesterday_profit
+from tools.price_tools import get_yesterday_date, get_open_prices, get_yesterday_open_and_close_price, get_today_init_position
 from tools.general_tools import get_config_value
 
 all_nasdaq_100_symbols = [
@@ -29,7 +29,8 @@ all_nasdaq_100_symbols = [
 
 STOP_SIGNAL = "<FINISH_SIGNAL>"
 
-agent_system_prompt = """
+# Static instructions, identical for every model and date so providers can cache the prefix
+agent_static_prompt = """
 You are a stock fundamental analysis trading assistant.
 
 Your goals are:
@@ -42,11 +43,19 @@ Thinking standards:
 - Clearly show key intermediate steps:
   - Read input of yesterday's positions and today's prices
   - Update valuation and adjust weights for each target (if strategy requires)
+  - Use the technical indicator tool for trends (SMA/EMA/RSI/MACD/ATR/returns) instead of computing them step by step with math tools
 
 Notes:
 - You don't need to request user permission during operations, you can execute directly
 - You must execute operations by calling tools, directly output operations will not be accepted
+- Each trading day starts with a message holding that day's date, positions and prices; only trade on that date
 
+When you think your task is complete, output
+{STOP_SIGNAL}
+""".format(STOP_SIGNAL=STOP_SIGNAL)
+
+# Date-specific context, sent as the first user message of each trading day
+agent_day_context = """
 Here is the information you need:
 
 Today's date:
@@ -61,28 +70,29 @@ Yesterday's closing prices:
 Today's buying prices:
 {today_buy_price}
 
-When you think your task is complete, output
-{STOP_SIGNAL}
+Please analyze and update today's ({date}) positions.
 """
 
-def get_agent_system_prompt(today_date: str, signature: str) -> str:
-    print(f"signature: {signature}")
-    print(f"today_date: {today_date}")
-    # Get yesterday's buy and sell prices
-    yesterday_buy_prices, yesterday_sell_prices = get_yesterday_open_and_close_price(today_date, all_nasdaq_100_symbols)
+
+def get_agent_day_context(today_date: str, signature: str) -> str:
+    """Build the per-day context message (date, positions, yesterday's closes, today's opens)."""
+    _, yesterday_sell_prices = get_yesterday_open_and_close_price(today_date, all_nasdaq_100_symbols)
     today_buy_price = get_open_prices(today_date, all_nasdaq_100_symbols)
     today_init_position = get_today_init_position(today_date, signature)
-    yesterday_profit = get_yesterday_profit(today_date, yesterday_buy_prices, yesterday_sell_prices, today_init_position)
-    return agent_system_prompt.format(
-        date=today_date, 
-        positions=today_init_position, 
-        STOP_SIGNAL=STOP_SIGNAL,
+    return agent_day_context.format(
+        date=today_date,
+        positions=today_init_position,
         yesterday_close_price=yesterday_sell_prices,
         today_buy_price=today_buy_price,
-        yesterday_profit=yesterday_profit
     )
 
 
+def get_agent_system_prompt(today_date: str, signature: str) -> str:
+    """Full single-prompt form: the static instructions followed by the day's context."""
+    print(f"signature: {signature}")
+    print(f"today_date: {today_date}")
+    return agent_static_prompt + get_agent_day_context(today_date, signature)
+
 
 if __name__ == "__main__":
     today_date = get_config_value("TODAY_DATE")
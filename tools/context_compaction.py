@@ -0,0 +1,178 @@
+import hashlib
+from typing import Any, Dict, List, Optional
+
+# Prefix of the user message that carries a step's tool results (see BaseAgent.run_trading_session)
+TOOL_RESULTS_PREFIX = "Tool results: "
+# Characters kept from an older message when it is shrunk to fit the budget
+TRUNCATED_HEAD_CHARS = 400
+
+_ENCODING = None
+_ENCODING_LOADED = False
+
+
+def _get_encoding():
+    """Return a tiktoken encoding, or None if tiktoken (or its BPE file) is unavailable."""
+    global _ENCODING, _ENCODING_LOADED
+    if not _ENCODING_LOADED:
+        _ENCODING_LOADED = True
+        try:
+            import tiktoken
+            _ENCODING = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _ENCODING = None
+    return _ENCODING
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of ``text``
+
+    Uses tiktoken's cl100k_base encoding when available and falls back to
+    the usual ~4 characters per token estimate otherwise.
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Token count of a message list, including a small per-message overhead."""
+    return sum(count_tokens(msg.get("content") or "") + 4 for msg in messages)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ToolOutputDeduplicator:
+    """
+    Replace tool outputs already shown earlier in the session by a short reference
+
+    Agents often fetch the same prices or news twice in a day; the second copy
+    adds tokens to every following step without adding information.
+    """
+
+    def __init__(self, min_chars: int = 200, seen: Optional[Dict[str, int]] = None):
+        self.min_chars = min_chars
+        # Digest of each output -> step it first appeared in
+        self.seen: Dict[str, int] = dict(seen or {})
+
+    def dedupe(self, outputs: List[str], step: int) -> List[str]:
+        """Return ``outputs`` with repeats of earlier outputs (of at least ``min_chars``) replaced."""
+        result = []
+        for output in outputs:
+            if len(output) < self.min_chars:
+                result.append(output)
+                continue
+            key = _digest(output)
+            if key in self.seen:
+                result.append(f"[Same result as step {self.seen[key]}, omitted]")
+            else:
+                self.seen[key] = step
+                result.append(output)
+        return result
+
+
+def _truncate(content: str, head_chars: int) -> str:
+    if len(content) <= head_chars + 50:
+        return content
+    return f"{content[:head_chars]} ... [truncated {len(content) - head_chars} chars]"
+
+
+def compact_messages(
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    keep_recent: int = 6,
+) -> List[Dict[str, str]]:
+    """
+    Shrink a conversation to ``max_tokens`` while keeping its shape
+
+    The first message (the day's context) and the last ``keep_recent`` messages
+    are always kept verbatim. Older messages are shrunk oldest first: tool
+    results are cut to their first TRUNCATED_HEAD_CHARS characters, then
+    replaced by a one-line note; assistant messages are cut last. Messages are
+    never removed, so user/assistant turns keep alternating.
+
+    Args:
+        messages: Conversation as a list of {"role", "content"} dicts (not modified)
+        max_tokens: Token budget for the whole list
+        keep_recent: Number of trailing messages never shrunk (a rolling window)
+
+    Returns:
+        The compacted conversation (a new list)
+    """
+    compacted = [dict(msg) for msg in messages]
+    total = count_message_tokens(compacted)
+    if total <= max_tokens:
+        return compacted
+
+    protected_from = max(1, len(compacted) - keep_recent)
+    older = range(1, protected_from)
+    is_tool_result = lambda msg: msg["role"] == "user" and (msg.get("content") or "").startswith(TOOL_RESULTS_PREFIX)
+
+    passes = [
+        (is_tool_result, lambda content: _truncate(content, TRUNCATED_HEAD_CHARS)),
+        (is_tool_result, lambda content: f"{TOOL_RESULTS_PREFIX}[omitted to save context]"),
+        (lambda msg: msg["role"] == "assistant", lambda content: _truncate(content, TRUNCATED_HEAD_CHARS)),
+    ]
+    for applies, shrink in passes:
+        for i in older:
+            if total <= max_tokens:
+                return compacted
+            msg = compacted[i]
+            if not applies(msg):
+                continue
+            before = count_tokens(msg.get("content") or "")
+            msg["content"] = shrink(msg.get("content") or "")
+            total -= before - count_tokens(msg["content"])
+    return compacted
+
+
+class TokenMeter:
+    """
+    Per-session token meter
+
+    Records the (estimated) prompt size sent at each step and, when the model
+    reports it, the actual input/output token usage.
+    """
+
+    def __init__(self, steps: Optional[List[Dict[str, Any]]] = None):
+        self.steps: List[Dict[str, Any]] = list(steps or [])
+
+    def record(self, step: int, prompt_tokens: int, compacted_from: int, response: Optional[dict] = None) -> Dict[str, Any]:
+        """Record one step; returns the step's entry."""
+        usage = usage_from_response(response) if response is not None else {}
+        entry = {
+            "step": step,
+            "prompt_tokens_est": prompt_tokens,
+            "compacted_from_est": compacted_from,
+            "input_tokens": usage.get("input_tokens"),
+            "output_tokens": usage.get("output_tokens"),
+        }
+        self.steps.append(entry)
+        return entry
+
+    def totals(self) -> Dict[str, int]:
+        """Sum of the recorded steps (reported usage where available, estimates otherwise)."""
+        return {
+            "steps": len(self.steps),
+            "prompt_tokens_est": sum(s["prompt_tokens_est"] for s in self.steps),
+            "saved_tokens_est": sum(s["compacted_from_est"] - s["prompt_tokens_est"] for s in self.steps),
+            "input_tokens": sum(s["input_tokens"] or 0 for s in self.steps),
+            "output_tokens": sum(s["output_tokens"] or 0 for s in self.steps),
+        }
+
+
+def usage_from_response(response: dict) -> Dict[str, int]:
+    """Sum the usage_metadata of the AI messages in an agent response."""
+    totals = {"input_tokens": 0, "output_tokens": 0}
+    found = False
+    for msg in (response or {}).get("messages", []):
+        usage = getattr(msg, "usage_metadata", None)
+        if not usage:
+            continue
+        found = True
+        totals["input_tokens"] += int(usage.get("input_tokens") or 0)
+        totals["output_tokens"] += int(usage.get("output_tokens") or 0)
+    return totals if found else {}
@@ -1,45 +1,249 @@
-
 import os
+import sys
 import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict, Iterator, Optional, Tuple
 from dotenv import load_dotenv
 load_dotenv()
 
-def _load_runtime_env() -> dict:
-    path = os.environ.get("RUNTIME_ENV_PATH")
-    if path is None:
+# HTTP header carrying the agent's session values (JSON) with every MCP tool call
+SESSION_HEADER = "X-Session-Context"
+
+class SessionContext:
+    """
+    In-process runtime config for one agent session (SIGNATURE, TODAY_DATE, ...)
+
+    Values live in memory and travel to the MCP tool servers in the
+    SESSION_HEADER of each tool call, so tools never touch the runtime file.
+    If ``persist_path`` is set the values are also mirrored to that JSON file
+    for external readers: on every write when ``write_behind`` is False,
+    otherwise only on ``flush()`` (and when the session ends).
+    """
+
+    def __init__(self, values: Optional[Dict[str, Any]] = None, persist_path: Optional[str] = None, write_behind: bool = True):
+        self.values: Dict[str, Any] = dict(values or {})
+        self.persist_path = persist_path
+        self.write_behind = write_behind
+        self._dirty = False
+
+    def get(self, key: str, default=None):
+        return self.values.get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        if self.values.get(key, _MISSING) == value:
+            return
+        self.values[key] = value
+        self._dirty = True
+        if not self.write_behind:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write pending values to ``persist_path`` (no-op when nothing changed or no file is configured)."""
+        if not self._dirty or not self.persist_path:
+            return
+        data = _load_runtime_env_file(self.persist_path)
+        data.update(self.values)
+        _write_runtime_env_file(self.persist_path, data)
+        self._dirty = False
+
+    def to_header(self) -> str:
+        return json.dumps(self.values, ensure_ascii=True, separators=(",", ":"), default=str)
+
+
+_MISSING = object()
+_session: ContextVar[Optional[SessionContext]] = ContextVar("session_context", default=None)
+
+
+@contextmanager
+def session_context(persist_path: Optional[str] = None, write_behind: bool = True, **values: Any) -> Iterator[SessionContext]:
+    """
+    Activate a SessionContext for the current context (asyncio task)
+
+    The session starts from the values already stored in ``persist_path``
+    (if any), updated with ``values``, and is flushed on exit.
+
+    Args:
+        persist_path: Optional runtime config file to mirror the session to
+        write_behind: Defer file writes until flush() / exit instead of writing on every change
+        **values: Initial session values, e.g. SIGNATURE="gpt-5"
+
+    Yields:
+        The active SessionContext
+    """
+    initial = _load_runtime_env_file(persist_path) if persist_path else {}
+    session = SessionContext(initial, persist_path=persist_path, write_behind=write_behind)
+    for key, value in values.items():
+        session.set(key, value)
+    token = _session.set(session)
+    try:
+        yield session
+    finally:
+        _session.reset(token)
+        session.flush()
+
+
+def get_session() -> Optional[SessionContext]:
+    """Return the SessionContext active in the current context, if any."""
+    return _session.get()
+
+
+def session_headers() -> Dict[str, str]:
+    """HTTP headers that forward the active session to MCP tool servers (empty without a session)."""
+    session = _session.get()
+    if session is None:
+        return {}
+    return {SESSION_HEADER: session.to_header()}
+
+
+def _current_request():
+    """The MCP HTTP request being served, or None outside a tool server."""
+    # Only MCP tool servers have fastmcp loaded; avoid importing it anywhere else
+    dependencies = sys.modules.get("fastmcp.server.dependencies")
+    if dependencies is None:
+        return None
+    try:
+        return dependencies.get_http_request()
+    except Exception:
+        return None
+
+
+# Last parsed header -> values; read-only, every request gets its own copy
+_request_session_cache: Tuple[Optional[str], Dict[str, Any]] = (None, {})
+
+
+def _parse_session_header(raw: str) -> Optional[Dict[str, Any]]:
+    global _request_session_cache
+    cached_raw, cached_values = _request_session_cache
+    if raw == cached_raw:
+        return dict(cached_values)
+    try:
+        values = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(values, dict):
+        return None
+    _request_session_cache = (raw, values)
+    return dict(values)
+
+
+def _request_session_values() -> Optional[Dict[str, Any]]:
+    """
+    Session values sent by the agent with the current MCP HTTP request, if any
+
+    The values are parsed once per request and kept on the request, so writes
+    made while serving it stay local to it.
+    """
+    request = _current_request()
+    if request is None:
+        return None
+    values = getattr(request.state, "session_values", None)
+    if values is not None:
+        return values
+    raw = request.headers.get(SESSION_HEADER)
+    if not raw:
+        return None
+    values = _parse_session_header(raw)
+    if values is not None:
+        request.state.session_values = values
+    return values
+
+
+def get_runtime_env_path() -> Optional[str]:
+    """Return the runtime config file (RUNTIME_ENV_PATH), if configured."""
+    return os.environ.get("RUNTIME_ENV_PATH")
+
+
+# path -> ((mtime_ns, size), parsed contents); the file is only re-parsed when it changes
+_runtime_env_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+_runtime_env_lock = threading.Lock()
+
+
+def _load_runtime_env_file(path: str) -> dict:
+    try:
+        stat = os.stat(path)
+    except OSError:
         return {}
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _runtime_env_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return dict(cached[1])
     try:
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, dict):
-                    return data
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
     except Exception:
-        pass
-    return {}
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    with _runtime_env_lock:
+        _runtime_env_cache[path] = (key, data)
+    return dict(data)
+
+
+def _write_runtime_env_file(path: str, data: dict) -> None:
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+    except Exception as e:
+        print(f"❌ Error writing config to {path}: {e}")
+        return
+    with _runtime_env_lock:
+        _runtime_env_cache.pop(path, None)
+
+
+def _load_runtime_env() -> dict:
+    path = get_runtime_env_path()
+    if path is None:
+        return {}
+    return _load_runtime_env_file(path)
 
 
 def get_config_value(key: str, default=None):
+    """
+    Look up a runtime config value
+
+    Resolution order: the active SessionContext, the session sent with the
+    current MCP request, the runtime config file, then the process environment.
+    """
+    session = _session.get()
+    if session is not None and key in session.values:
+        return session.values[key]
+    request_values = _request_session_values()
+    if request_values is not None and key in request_values:
+        return request_values[key]
+
     _RUNTIME_ENV = _load_runtime_env()
-    
     if key in _RUNTIME_ENV:
         return _RUNTIME_ENV[key]
     return os.getenv(key, default)
 
 def write_config_value(key: str, value: Any):
-    path = os.environ.get("RUNTIME_ENV_PATH")
+    """
+    Store a runtime config value
+
+    Inside a SessionContext the value is kept in memory (and persisted
+    according to the session's write policy); inside an MCP request that
+    carries a session it only updates that request's view. Otherwise it is
+    written to the runtime config file.
+    """
+    session = _session.get()
+    if session is not None:
+        session.set(key, value)
+        return
+    request_values = _request_session_values()
+    if request_values is not None:
+        request_values[key] = value
+        return
+    path = get_runtime_env_path()
     if path is None:
         print(f"⚠️  WARNING: RUNTIME_ENV_PATH not set, config value '{key}' not persisted")
         return
-    _RUNTIME_ENV = _load_runtime_env()
+    _RUNTIME_ENV = _load_runtime_env_file(path)
     _RUNTIME_ENV[key] = value
-    try:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(_RUNTIME_ENV, f, ensure_ascii=False, indent=4)
-    except Exception as e:
-        print(f"❌ Error writing config to {path}: {e}")
+    _write_runtime_env_file(path, _RUNTIME_ENV)
+
 
 def extract_conversation(conversation: dict, output_type: str):
     """Extract information from a conversation payload.
@@ -0,0 +1,227 @@
+import os
+import glob
+import json
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Bar fields as returned by TIME_SERIES_INTRADAY, mapped to short column names
+INTRADAY_FIELDS = {
+    "open": "1. open",
+    "high": "2. high",
+    "low": "3. low",
+    "close": "4. close",
+    "volume": "5. volume",
+}
+
+INTRADAY_CACHE_VERSION = 1
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+FILE_PATTERN = re.compile(r"^intraday_prices_(.+)\.json$")
+
+
+def default_data_dir() -> Path:
+    """Return project_root/data."""
+    return Path(__file__).resolve().parents[1] / "data"
+
+
+def default_intraday_cache_dir(data_dir: Optional[Path] = None) -> Path:
+    """Return the compiled intraday cache directory (data/intraday.cache/)."""
+    return (data_dir or default_data_dir()) / "intraday.cache"
+
+
+def parse_timestamp(value: str) -> np.datetime64:
+    """Parse 'YYYY-MM-DD', 'YYYY-MM-DD HH:MM' or 'YYYY-MM-DD HH:MM:SS' into a second-resolution datetime64."""
+    for fmt in (TIMESTAMP_FORMAT, "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return np.datetime64(datetime.strptime(value, fmt), "s")
+        except ValueError:
+            continue
+    raise ValueError("timestamp must be in 'YYYY-MM-DD', 'YYYY-MM-DD HH:MM' or 'YYYY-MM-DD HH:MM:SS' format")
+
+
+def _series_from_response(data: dict) -> dict:
+    for key, value in data.items():
+        if key.startswith("Time Series") and isinstance(value, dict):
+            return value
+    return {}
+
+
+def compile_intraday_cache(data_dir: Optional[str] = None, cache_dir: Optional[str] = None) -> Path:
+    """
+    Compile every data/intraday_prices_{SYMBOL}.json into one columnar cache
+
+    Bars of all symbols are concatenated symbol by symbol, each symbol's bars
+    sorted by timestamp, into one ``.npy`` array per column (``timestamp`` as
+    datetime64[s] plus one float64 array per field). ``index.json`` maps each
+    symbol to its [start, end) row range and is written last, so readers never
+    see a half-written cache.
+
+    Args:
+        data_dir: Directory holding the intraday_prices_*.json files, defaults to project_root/data
+        cache_dir: Output directory, defaults to data/intraday.cache
+
+    Returns:
+        Path to the cache directory
+    """
+    source_dir = Path(data_dir) if data_dir is not None else default_data_dir()
+    target = Path(cache_dir) if cache_dir is not None else default_intraday_cache_dir(source_dir)
+    target.mkdir(parents=True, exist_ok=True)
+
+    timestamps: List[np.ndarray] = []
+    columns: Dict[str, List[np.ndarray]] = {name: [] for name in INTRADAY_FIELDS}
+    ranges: Dict[str, List[int]] = {}
+    interval = None
+    row = 0
+    for fp in sorted(glob.glob(str(source_dir / "intraday_prices_*.json"))):
+        match = FILE_PATTERN.match(os.path.basename(fp))
+        if not match:
+            continue
+        with open(fp, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        series = _series_from_response(data)
+        if not series:
+            continue
+        interval = interval or data.get("Meta Data", {}).get("4. Interval")
+        keys = sorted(series)
+        timestamps.append(np.array([parse_timestamp(k) for k in keys], dtype="datetime64[s]"))
+        for name, key in INTRADAY_FIELDS.items():
+            values = np.full(len(keys), np.nan)
+            for i, k in enumerate(keys):
+                try:
+                    values[i] = float(series[k][key])
+                except (KeyError, TypeError, ValueError):
+                    continue
+            columns[name].append(values)
+        ranges[match.group(1)] = [row, row + len(keys)]
+        row += len(keys)
+
+    arrays = {"timestamp": np.concatenate(timestamps) if timestamps else np.zeros(0, dtype="datetime64[s]")}
+    for name, parts in columns.items():
+        arrays[name] = np.concatenate(parts) if parts else np.zeros(0)
+    for name, arr in arrays.items():
+        tmp_file = target / f"{name}.npy.tmp"
+        with tmp_file.open("wb") as f:
+            np.save(f, arr)
+        os.replace(tmp_file, target / f"{name}.npy")
+
+    index = {"version": INTRADAY_CACHE_VERSION, "interval": interval, "rows": row, "symbols": ranges}
+    tmp_index = target / "index.json.tmp"
+    with tmp_index.open("w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp_index, target / "index.json")
+    return target
+
+
+class IntradayStore:
+    """
+    Read-only view over the compiled intraday cache
+
+    Columns are memory-mapped; a range query is two binary searches inside
+    the symbol's row slice. The store reloads when index.json changes.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else default_intraday_cache_dir()
+        self._lock = threading.Lock()
+        self._mtime_ns: Optional[int] = None
+        self.interval: Optional[str] = None
+        self.ranges: Dict[str, Tuple[int, int]] = {}
+        self.columns: Dict[str, np.ndarray] = {}
+
+    def refresh(self) -> None:
+        """Reload the cache if it was recompiled since the last load."""
+        try:
+            mtime_ns = (self.cache_dir / "index.json").stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = None
+        if mtime_ns == self._mtime_ns:
+            return
+        with self._lock:
+            if mtime_ns == self._mtime_ns:
+                return
+            self.ranges, self.columns, self.interval = {}, {}, None
+            if mtime_ns is not None:
+                try:
+                    with (self.cache_dir / "index.json").open("r", encoding="utf-8") as f:
+                        index = json.load(f)
+                    if index.get("version") == INTRADAY_CACHE_VERSION:
+                        self.columns = {
+                            name: np.load(self.cache_dir / f"{name}.npy", mmap_mode="r")
+                            for name in ["timestamp", *INTRADAY_FIELDS]
+                        }
+                        self.ranges = {sym: (int(r[0]), int(r[1])) for sym, r in index["symbols"].items()}
+                        self.interval = index.get("interval")
+                except (OSError, ValueError, KeyError):
+                    self.ranges, self.columns = {}, {}
+            self._mtime_ns = mtime_ns
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.ranges
+
+    def query(self, symbol: str, start: str, end: str) -> List[List]:
+        """
+        Bars of ``symbol`` with start <= timestamp <= end
+
+        Args:
+            symbol: Stock symbol
+            start: Range start ('YYYY-MM-DD', 'YYYY-MM-DD HH:MM' or with seconds)
+            end: Range end, inclusive; a bare date means the whole day
+
+        Returns:
+            Rows of [timestamp, open, high, low, close, volume], ascending by timestamp
+        """
+        if symbol not in self.ranges:
+            return []
+        lo, hi = self.ranges[symbol]
+        start_ts = parse_timestamp(start)
+        end_ts = parse_timestamp(end)
+        if len(end.strip()) == 10:
+            end_ts = end_ts + np.timedelta64(1, "D") - np.timedelta64(1, "s")
+        timestamps = self.columns["timestamp"][lo:hi]
+        first = lo + int(np.searchsorted(timestamps, start_ts, side="left"))
+        last = lo + int(np.searchsorted(timestamps, end_ts, side="right"))
+        rows = []
+        for i in range(first, last):
+            bar = [str(self.columns["timestamp"][i]).replace("T", " ")]
+            for name in INTRADAY_FIELDS:
+                value = float(self.columns[name][i])
+                bar.append(None if np.isnan(value) else (int(value) if name == "volume" else value))
+            rows.append(bar)
+        return rows
+
+
+_STORES: Dict[str, IntradayStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_intraday_store(cache_dir: Optional[str] = None) -> IntradayStore:
+    """
+    Return the shared IntradayStore, reloaded if the cache was recompiled
+
+    Args:
+        cache_dir: Optional cache directory; defaults to data/intraday.cache under the project root
+
+    Returns:
+        IntradayStore instance shared by all callers in this process
+    """
+    key = os.path.abspath(cache_dir) if cache_dir is not None else str(default_intraday_cache_dir())
+    store = _STORES.get(key)
+    if store is None:
+        with _STORES_LOCK:
+            store = _STORES.get(key)
+            if store is None:
+                store = IntradayStore(key)
+                _STORES[key] = store
+    store.refresh()
+    return store
+
+
+if __name__ == "__main__":
+    import sys
+
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    print(f"Intraday cache written to: {compile_intraday_cache(data_dir)}")
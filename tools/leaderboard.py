@@ -0,0 +1,170 @@
+import os
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import sys
+
+# Add project root directory to Python path to allow running this file from subdirectories
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from tools.position_ledger import default_position_file, get_position_ledger
+from tools.result_tools import calculate_metrics_from_values, get_portfolio_values_frame
+
+# Metrics copied into each leaderboard entry, in display order
+LEADERBOARD_METRICS = [
+    "cumulative_return",
+    "annualized_return",
+    "sharpe_ratio",
+    "max_drawdown",
+    "max_drawdown_start",
+    "max_drawdown_end",
+    "volatility",
+    "win_rate",
+    "profit_loss_ratio",
+    "total_trading_days",
+    "start_date",
+    "end_date",
+]
+
+
+def default_agent_data_dir() -> Path:
+    """Return data/agent_data under the project root."""
+    return Path(__file__).resolve().parents[1] / "data" / "agent_data"
+
+
+def default_leaderboard_path() -> Path:
+    """Return data/leaderboard.json under the project root (served to the docs site via docs/data)."""
+    return Path(__file__).resolve().parents[1] / "data" / "leaderboard.json"
+
+
+def discover_models(agent_data_dir: Optional[str] = None) -> List[str]:
+    """
+    Find every model directory that has a position ledger
+
+    Args:
+        agent_data_dir: Directory holding one sub-directory per model, defaults to data/agent_data
+
+    Returns:
+        Sorted list of model names (signatures)
+    """
+    base = Path(agent_data_dir) if agent_data_dir is not None else default_agent_data_dir()
+    if not base.is_dir():
+        return []
+    return sorted(
+        entry.name for entry in base.iterdir()
+        if (entry / "position" / "position.jsonl").is_file()
+    )
+
+
+def compute_leaderboard(modelnames: Optional[List[str]] = None, start_date: Optional[str] = None, end_date: Optional[str] = None, max_workers: Optional[int] = None) -> List[Dict[str, any]]:
+    """
+    Compute performance metrics for many models at once and rank them
+
+    All equity curves come from one vectorised valuation over the shared
+    price store; the per-model metrics are then computed in a thread pool.
+
+    Args:
+        modelnames: Models to rank, defaults to every model found by discover_models()
+        start_date: Start date in YYYY-MM-DD format, uses each model's earliest date if None
+        end_date: End date in YYYY-MM-DD format, uses each model's latest date if None
+        max_workers: Thread pool size, defaults to the executor's default
+
+    Returns:
+        Entries sorted by cumulative return (best first), each with rank, model_name, metrics and portfolio_values
+    """
+    if modelnames is None:
+        modelnames = discover_models()
+    if not modelnames:
+        return []
+
+    frame = get_portfolio_values_frame(modelnames, start_date, end_date)
+
+    def model_entry(modelname: str) -> Optional[Dict[str, any]]:
+        # Keep each model on its own record dates, exactly as calculate_all_metrics does
+        record_dates = set(get_position_ledger(str(default_position_file(modelname))).dates())
+        column = frame[modelname].dropna()
+        portfolio_values = {date: float(value) for date, value in column.items() if date in record_dates}
+        if not portfolio_values:
+            return None
+        metrics = calculate_metrics_from_values(portfolio_values)
+        entry = {"model_name": modelname}
+        entry.update({key: metrics[key] for key in LEADERBOARD_METRICS})
+        entry["portfolio_values"] = portfolio_values
+        return entry
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        entries = [entry for entry in executor.map(model_entry, modelnames) if entry is not None]
+
+    entries.sort(key=lambda entry: entry["cumulative_return"], reverse=True)
+    for rank, entry in enumerate(entries, start=1):
+        entry["rank"] = rank
+    return entries
+
+
+def write_leaderboard(entries: List[Dict[str, any]], output_path: Optional[str] = None) -> str:
+    """
+    Write the leaderboard as one JSON document
+
+    Args:
+        entries: Output of compute_leaderboard()
+        output_path: Target file, defaults to data/leaderboard.json
+
+    Returns:
+        Path to the written file
+    """
+    path = Path(output_path) if output_path is not None else default_leaderboard_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "models": entries,
+    }
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return str(path)
+
+
+def print_leaderboard(entries: List[Dict[str, any]]) -> None:
+    """
+    Print the leaderboard as a table
+
+    Args:
+        entries: Output of compute_leaderboard()
+    """
+    print("=" * 80)
+    print("Model Leaderboard")
+    print("=" * 80)
+    print(f"{'Rank':<5} {'Model':<28} {'Cum Ret':>9} {'Ann Ret':>9} {'Sharpe':>8} {'Max DD':>8} {'Days':>5}")
+    print("-" * 80)
+    for entry in entries:
+        print(
+            f"{entry['rank']:<5} {entry['model_name']:<28} {entry['cumulative_return']:>9.2%} "
+            f"{entry['annualized_return']:>9.2%} {entry['sharpe_ratio']:>8.4f} "
+            f"{entry['max_drawdown']:>8.2%} {entry['total_trading_days']:>5}"
+        )
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rank every model under data/agent_data by performance.")
+    parser.add_argument("--models", nargs="+", help="Model names to include (default: all discovered models)")
+    parser.add_argument("--start-date", help="Start date (YYYY-MM-DD)")
+    parser.add_argument("--end-date", help="End date (YYYY-MM-DD)")
+    parser.add_argument("--output", help="Output JSON path (default: data/leaderboard.json)")
+    parser.add_argument("--workers", type=int, help="Number of worker threads")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    entries = compute_leaderboard(args.models, args.start_date, args.end_date, args.workers)
+    if not entries:
+        print("❌ No models with position data found")
+        sys.exit(1)
+    print_leaderboard(entries)
+    print(f"✅ Leaderboard saved to: {write_leaderboard(entries, args.output)}")
@@ -0,0 +1,439 @@
+import os
+import json
+import hashlib
+import time
+import atexit
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+INDEX_VERSION = 2
+# Positions of this many (date, id) records are kept in memory per ledger
+POSITIONS_CACHE_SIZE = 256
+
+# How hard PositionWriter pushes appended records to disk:
+#   "none"   - write to the OS and never fsync
+#   "batch"  - fsync at most once per POSITION_FSYNC_INTERVAL seconds (and at exit)
+#   "always" - fsync after every committed transaction
+DURABILITY_LEVELS = ("none", "batch", "always")
+DEFAULT_DURABILITY = "batch"
+DEFAULT_FSYNC_INTERVAL = 1.0
+
+
+def default_position_file(modelname: str) -> Path:
+    """Return data/agent_data/{modelname}/position/position.jsonl under the project root."""
+    base_dir = Path(__file__).resolve().parents[1]
+    return base_dir / "data" / "agent_data" / modelname / "position" / "position.jsonl"
+
+
+class PositionLedger:
+    """
+    Incremental index over a model's position.jsonl
+
+    Keeps, per date, the id and byte offset of the record with the largest id,
+    plus the global max id / max date. Only bytes appended since the last
+    refresh are parsed, and the index is persisted to a small sidecar file
+    (position.index.json) so a cold start resumes from the saved offset
+    instead of rescanning the whole ledger.
+    """
+
+    def __init__(self, position_file: str, index_file: Optional[str] = None):
+        self.position_file = Path(position_file)
+        self.index_file = Path(index_file) if index_file is not None else self.position_file.with_name("position.index.json")
+        self._lock = threading.RLock()
+        self._positions_cache: "OrderedDict[Tuple[str, int], Dict[str, float]]" = OrderedDict()
+        # (inode, offset, tail_digest) last written to the sidecar; it is rewritten only when this changes
+        self._saved_state: Optional[Tuple[Optional[int], int, Optional[str]]] = None
+        self._reset()
+        self._load_index()
+
+    def _reset(self) -> None:
+        self.inode: Optional[int] = None
+        self.offset = 0
+        self.max_id = -1
+        self.max_date: Optional[str] = None
+        self.record_count = 0
+        self.last_offset = -1
+        # sha1 of the bytes from last_offset to offset, to notice rewrites that keep inode and size
+        self.tail_digest: Optional[str] = None
+        # date -> [max id, byte offset of that record]
+        self.latest_by_date: Dict[str, List[int]] = {}
+        self._positions_cache.clear()
+
+    def _load_index(self) -> None:
+        try:
+            with self.index_file.open("r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") != INDEX_VERSION:
+                return
+            self.inode = index["inode"]
+            self.offset = index["offset"]
+            self.max_id = index["max_id"]
+            self.max_date = index["max_date"]
+            self.record_count = index["record_count"]
+            self.last_offset = index["last_offset"]
+            self.tail_digest = index["tail_digest"]
+            self.latest_by_date = {d: list(v) for d, v in index["dates"].items()}
+            self._saved_state = self._index_state()
+        except (OSError, ValueError, KeyError, TypeError):
+            self._reset()
+
+    def _index_state(self) -> Tuple[Optional[int], int, Optional[str]]:
+        return self.inode, self.offset, self.tail_digest
+
+    def _save_index(self) -> None:
+        index = {
+            "version": INDEX_VERSION,
+            "inode": self.inode,
+            "offset": self.offset,
+            "max_id": self.max_id,
+            "max_date": self.max_date,
+            "record_count": self.record_count,
+            "last_offset": self.last_offset,
+            "tail_digest": self.tail_digest,
+            "dates": self.latest_by_date,
+        }
+        tmp_file = self.index_file.with_name(f"{self.index_file.name}.{os.getpid()}.tmp")
+        try:
+            with tmp_file.open("w", encoding="utf-8") as f:
+                json.dump(index, f)
+            os.replace(tmp_file, self.index_file)
+            self._saved_state = self._index_state()
+        except OSError as e:
+            print(f"⚠️  Failed to write position index {self.index_file}: {e}")
+
+    def _read_tail(self, f) -> bytes:
+        """Bytes of the last indexed line(s): from the last record's start up to ``offset``."""
+        start = self.last_offset if self.last_offset >= 0 else max(0, self.offset - 1)
+        f.seek(start)
+        return f.read(self.offset - start)
+
+    def _is_consistent(self, stat: os.stat_result) -> bool:
+        """Check that the indexed prefix still belongs to the current file."""
+        if self.inode != stat.st_ino or self.offset > stat.st_size:
+            return False
+        if self.offset == 0:
+            return True
+        with self.position_file.open("rb") as f:
+            tail = self._read_tail(f)
+        # A rewrite in place (same inode, even the same size) changes the last indexed line
+        return tail.endswith(b"\n") and hashlib.sha1(tail).hexdigest() == self.tail_digest
+
+    def refresh(self) -> None:
+        """Index records appended since the last refresh (full rescan if the file was rewritten)."""
+        with self._lock:
+            try:
+                stat = self.position_file.stat()
+            except FileNotFoundError:
+                if self.inode is not None or self.offset:
+                    self._reset()
+                return
+
+            if not self._is_consistent(stat):
+                self._reset()
+                self.inode = stat.st_ino
+            if stat.st_size > self.offset:
+                with self.position_file.open("rb") as f:
+                    f.seek(self.offset)
+                    chunk = f.read(stat.st_size - self.offset)
+
+                # Only consume complete lines; a trailing partial line is picked up next time
+                end = chunk.rfind(b"\n") + 1
+                pos = self.offset
+                for raw in chunk[:end].splitlines(keepends=True):
+                    line_offset = pos
+                    pos += len(raw)
+                    if not raw.strip():
+                        continue
+                    try:
+                        doc = json.loads(raw)
+                    except Exception:
+                        continue
+                    self._index_record(doc, line_offset)
+
+                if end:
+                    self.offset += end
+                    with self.position_file.open("rb") as f:
+                        self.tail_digest = hashlib.sha1(self._read_tail(f)).hexdigest()
+
+            if self._index_state() != self._saved_state:
+                self._save_index()
+
+    def _index_record(self, doc: Dict[str, Any], line_offset: int) -> None:
+        date = doc.get("date")
+        self.record_count += 1
+        self.last_offset = line_offset
+        try:
+            record_id = int(doc.get("id"))
+        except (TypeError, ValueError):
+            # A record without a usable id can never be the latest of its date
+            record_id = None
+        if record_id is None:
+            if date and (self.max_date is None or date > self.max_date):
+                self.max_date = date
+            return
+        if record_id > self.max_id:
+            self.max_id = record_id
+        if not date:
+            return
+        if self.max_date is None or date > self.max_date:
+            self.max_date = date
+        current = self.latest_by_date.get(date)
+        if current is None or record_id > current[0]:
+            self.latest_by_date[date] = [record_id, line_offset]
+            if "positions" in doc:
+                self._cache_positions((date, record_id), doc.get("positions", {}))
+
+    def _cache_positions(self, key: Tuple[str, int], positions: Dict[str, float]) -> None:
+        self._positions_cache[key] = positions
+        self._positions_cache.move_to_end(key)
+        while len(self._positions_cache) > POSITIONS_CACHE_SIZE:
+            self._positions_cache.popitem(last=False)
+
+    def _read_record(self, line_offset: int) -> Dict[str, Any]:
+        with self.position_file.open("rb") as f:
+            f.seek(line_offset)
+            return json.loads(f.readline())
+
+    def latest(self, date: str) -> Tuple[Dict[str, float], int]:
+        """
+        Get the record with the largest id on ``date``
+
+        Args:
+            date: Date string in YYYY-MM-DD format
+
+        Returns:
+            (positions, id); ({}, -1) if the ledger has no record on that date
+        """
+        self.refresh()
+        with self._lock:
+            entry = self.latest_by_date.get(date)
+            if entry is None:
+                return {}, -1
+            record_id, line_offset = entry
+            key = (date, record_id)
+            positions = self._positions_cache.get(key)
+            if positions is None:
+                positions = self._read_record(line_offset).get("positions", {})
+            self._cache_positions(key, positions)
+            return dict(positions), record_id
+
+    def last_record(self) -> Optional[Dict[str, Any]]:
+        """Return the last record in file order, or None if the ledger is empty."""
+        self.refresh()
+        with self._lock:
+            if self.last_offset < 0:
+                return None
+            return self._read_record(self.last_offset)
+
+    def end_offset(self) -> int:
+        """Return the byte offset just past the last indexed record."""
+        self.refresh()
+        with self._lock:
+            return self.offset
+
+    def records_from(self, offset: int) -> List[Dict[str, Any]]:
+        """Return the records written at or after byte ``offset``, in file order."""
+        self.refresh()
+        records = []
+        with self.position_file.open("rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        return records
+
+    def dates(self) -> List[str]:
+        """Return all dates that have at least one record, ascending."""
+        self.refresh()
+        with self._lock:
+            return sorted(self.latest_by_date.keys())
+
+
+_LEDGERS: Dict[str, PositionLedger] = {}
+_LEDGERS_LOCK = threading.Lock()
+
+
+def get_position_ledger(position_file: str) -> PositionLedger:
+    """
+    Return the shared PositionLedger for ``position_file``, refreshed to the current file contents
+
+    Args:
+        position_file: Path to a position.jsonl file
+
+    Returns:
+        PositionLedger instance shared by all callers in this process
+    """
+    key = os.path.abspath(position_file)
+    ledger = _LEDGERS.get(key)
+    if ledger is None:
+        with _LEDGERS_LOCK:
+            ledger = _LEDGERS.get(key)
+            if ledger is None:
+                ledger = PositionLedger(key)
+                _LEDGERS[key] = ledger
+    ledger.refresh()
+    return ledger
+
+
+class PositionTransaction:
+    """Records staged inside PositionWriter.transaction(); ids are assigned on append."""
+
+    def __init__(self, next_id: int):
+        self.next_id = next_id
+        self.records: List[Dict[str, Any]] = []
+
+    def append(self, date: str, this_action: Dict[str, Any], positions: Dict[str, float]) -> Dict[str, Any]:
+        """
+        Stage one record
+
+        Args:
+            date: Trading date in YYYY-MM-DD format
+            this_action: {"action": ..., "symbol": ..., "amount": ...}
+            positions: Positions after the action
+
+        Returns:
+            The staged record, including its assigned id
+        """
+        record = {"date": date, "id": self.next_id, "this_action": this_action, "positions": positions}
+        self.next_id += 1
+        self.records.append(record)
+        return record
+
+
+class PositionWriter:
+    """
+    Serialised, append-only writer for one position.jsonl
+
+    A transaction holds a per-file thread lock plus an exclusive ``flock`` on
+    the ledger, so a read-modify-write (read latest position, validate,
+    append) cannot interleave with another writer in this or another
+    process. Ids are assigned monotonically from the highest id seen, and
+    all records of a transaction go out in a single ``write``.
+    """
+
+    def __init__(self, position_file: str, durability: str = DEFAULT_DURABILITY, fsync_interval: float = DEFAULT_FSYNC_INTERVAL):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"durability must be one of {DURABILITY_LEVELS}, got {durability!r}")
+        self.position_file = Path(position_file)
+        self.durability = durability
+        self.fsync_interval = fsync_interval
+        self._lock = threading.RLock()
+        # Highest id this writer appended, valid while the file keeps its inode and doesn't shrink
+        self._last_id = -1
+        self._file_state: Optional[Tuple[int, int]] = None
+        self._last_fsync = 0.0
+        self._unsynced = False
+
+    @contextmanager
+    def transaction(self) -> Iterator[PositionTransaction]:
+        """
+        Lock the ledger and stage records; they are written when the block exits without an exception
+
+        Reads through get_position_ledger() inside the block see every record
+        committed before the lock was taken.
+        """
+        with self._lock:
+            self.position_file.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.position_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                stat = os.fstat(fd)
+                if self._file_state is None or stat.st_ino != self._file_state[0] or stat.st_size < self._file_state[1]:
+                    # The ledger was deleted, recreated or truncated: ids restart from what it holds now
+                    self._last_id = -1
+                ledger = get_position_ledger(str(self.position_file))
+                txn = PositionTransaction(max(self._last_id, ledger.max_id) + 1)
+                yield txn
+                if txn.records:
+                    payload = "".join(json.dumps(record) + "\n" for record in txn.records).encode("utf-8")
+                    view = memoryview(payload)
+                    while view:
+                        view = view[os.write(fd, view):]
+                    self._last_id = txn.next_id - 1
+                    stat = os.fstat(fd)
+                    self._unsynced = True
+                    self._maybe_fsync(fd)
+                self._file_state = (stat.st_ino, stat.st_size)
+            finally:
+                # Closing the descriptor also releases the flock
+                os.close(fd)
+
+    def append(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Append ``records`` ({"date", "this_action", "positions"}) in one transaction, assigning their ids."""
+        with self.transaction() as txn:
+            return [txn.append(r["date"], r["this_action"], r["positions"]) for r in records]
+
+    def _maybe_fsync(self, fd: int) -> None:
+        if self.durability == "none":
+            return
+        now = time.monotonic()
+        if self.durability == "always" or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(fd)
+            self._last_fsync = now
+            self._unsynced = False
+
+    def sync(self) -> None:
+        """Force pending appends to disk (no-op if everything is already synced or durability is "none")."""
+        with self._lock:
+            if not self._unsynced or self.durability == "none":
+                return
+            try:
+                fd = os.open(self.position_file, os.O_RDONLY)
+            except OSError:
+                return
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._last_fsync = time.monotonic()
+            self._unsynced = False
+
+
+_WRITERS: Dict[str, PositionWriter] = {}
+
+
+def get_position_writer(position_file: str) -> PositionWriter:
+    """
+    Return the shared PositionWriter for ``position_file``
+
+    Durability comes from POSITION_DURABILITY ("none", "batch", "always";
+    default "batch") and POSITION_FSYNC_INTERVAL (seconds, default 1.0).
+
+    Args:
+        position_file: Path to a position.jsonl file
+
+    Returns:
+        PositionWriter instance shared by all callers in this process
+    """
+    key = os.path.abspath(position_file)
+    writer = _WRITERS.get(key)
+    if writer is None:
+        with _LEDGERS_LOCK:
+            writer = _WRITERS.get(key)
+            if writer is None:
+                writer = PositionWriter(
+                    key,
+                    durability=os.getenv("POSITION_DURABILITY", DEFAULT_DURABILITY),
+                    fsync_interval=float(os.getenv("POSITION_FSYNC_INTERVAL", DEFAULT_FSYNC_INTERVAL)),
+                )
+                _WRITERS[key] = writer
+    return writer
+
+
+@atexit.register
+def _sync_writers() -> None:
+    for writer in list(_WRITERS.values()):
+        writer.sync()
@@ -0,0 +1,149 @@
+import os
+import sys
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Add project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from tools.price_store import PriceSnapshot, PriceStore, get_price_store
+
+# MACD parameters, the same defaults as asharemarket50's IndicatorLibrary
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+
+# Indicator tables kept in memory, keyed by (store, store version, date, window)
+CACHE_SIZE = 32
+
+_CACHE: "OrderedDict[Tuple[int, int, str, int], pd.DataFrame]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+def indicator_columns(window: int) -> List[str]:
+    """Return the column names produced by ``compute_indicators`` for ``window``."""
+    return [
+        "close",
+        f"sma_{window}",
+        f"ema_{window}",
+        f"rsi_{window}",
+        "macd", "macd_signal", "macd_hist",
+        f"atr_{window}",
+        "return_1d",
+        f"return_{window}d",
+    ]
+
+
+def compute_indicators(store: Union[PriceStore, PriceSnapshot], date: str, window: int = 14) -> pd.DataFrame:
+    """
+    Compute technical indicators for every symbol in one vectorised pass
+
+    Only bars dated strictly before ``date`` are used, so the values are what
+    an agent trading at ``date``'s open could know. Each indicator is computed
+    column-wise over the whole ``dates x symbols`` block; days without a bar
+    for a symbol are forward-filled from its previous close.
+
+    Args:
+        store: Daily price store, or one snapshot of it (read consistently either way)
+        date: Trading date (YYYY-MM-DD); indicators are as of the previous trading day
+        window: Look-back in trading days for SMA, EMA, RSI, ATR and the N-day return
+
+    Returns:
+        DataFrame indexed by symbol with the columns of ``indicator_columns(window)``
+        and the as-of date in ``frame.attrs["as_of"]``
+    """
+    if window < 1:
+        raise ValueError("window must be a positive integer")
+
+    store = store.snapshot if isinstance(store, PriceStore) else store
+    end = bisect_left(store.dates, date)
+    # Ten look-backs are enough for the EMAs to settle; older bars no longer move the result measurably
+    start = max(0, end - max(window, MACD_SLOW) * 10)
+    rows = slice(start, end)
+    frame = pd.DataFrame(columns=indicator_columns(window), index=pd.Index(store.symbols, name="symbol"), dtype=float)
+    frame.attrs["as_of"] = store.dates[end - 1] if end > 0 else None
+    if end == 0:
+        return frame
+
+    def block(field: str) -> pd.DataFrame:
+        values = np.where(store.has_bar[rows], store.fields[field][rows], np.nan)
+        return pd.DataFrame(values, index=store.dates[rows], columns=store.symbols)
+
+    close = block("sell_price").ffill()
+    high = block("high").fillna(close)
+    low = block("low").fillna(close)
+    prev_close = close.shift(1)
+
+    delta = close.diff()
+    avg_gain = delta.clip(lower=0).rolling(window=window).mean()
+    avg_loss = (-delta.clip(upper=0)).rolling(window=window).mean()
+    rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+
+    ema_fast = close.ewm(span=MACD_FAST, adjust=False).mean()
+    ema_slow = close.ewm(span=MACD_SLOW, adjust=False).mean()
+    macd = ema_fast - ema_slow
+    macd_signal = macd.ewm(span=MACD_SIGNAL, adjust=False).mean()
+
+    true_range = np.maximum(high - low, np.maximum((high - prev_close).abs(), (low - prev_close).abs()))
+
+    columns = [
+        close,
+        close.rolling(window=window).mean(),
+        close.ewm(span=window, adjust=False).mean(),
+        rsi,
+        macd, macd_signal, macd - macd_signal,
+        true_range.rolling(window=window).mean(),
+        close / prev_close - 1,
+        close / close.shift(window) - 1,
+    ]
+    for name, values in zip(frame.columns, columns):
+        frame[name] = values.iloc[-1]
+    return frame
+
+
+def get_indicators(date: str, window: int = 14, merged_path: Optional[str] = None) -> pd.DataFrame:
+    """
+    Return the indicator table for ``date``, computing it at most once per price data version
+
+    Args:
+        date: Trading date (YYYY-MM-DD)
+        window: Look-back in trading days
+        merged_path: Optional custom merged.jsonl path
+
+    Returns:
+        DataFrame as returned by ``compute_indicators``; treat it as read-only
+    """
+    store = get_price_store(merged_path)
+    snapshot = store.snapshot
+    key = (id(store), snapshot.version, date, window)
+    with _CACHE_LOCK:
+        frame = _CACHE.get(key)
+        if frame is not None:
+            _CACHE.move_to_end(key)
+            return frame
+    frame = compute_indicators(snapshot, date, window)
+    with _CACHE_LOCK:
+        _CACHE[key] = frame
+        while len(_CACHE) > CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return frame
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print technical indicators for all symbols as of a trading date.")
+    parser.add_argument("date", help="Trading date (YYYY-MM-DD)")
+    parser.add_argument("--window", type=int, default=14, help="Look-back in trading days (default: 14)")
+    args = parser.parse_args()
+
+    table = get_indicators(args.date, args.window)
+    print(f"Indicators as of {table.attrs['as_of']} (window={args.window})")
+    print(table.round(4).to_string())
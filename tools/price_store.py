@@ -0,0 +1,371 @@
+import os
+import json
+import threading
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Field keys as written by data/merge_jsonl.py, mapped to short column names
+PRICE_FIELDS = {
+    "buy_price": "1. buy price",
+    "high": "2. high",
+    "low": "3. low",
+    "sell_price": "4. sell price",
+    "volume": "5. volume",
+}
+
+
+CACHE_VERSION = 1
+
+
+def default_merged_path() -> Path:
+    """Return the default location of merged.jsonl (project_root/data/merged.jsonl)."""
+    base_dir = Path(__file__).resolve().parents[1]
+    return base_dir / "data" / "merged.jsonl"
+
+
+def default_cache_dir(merged_path: Path) -> Path:
+    """Return the columnar cache directory for ``merged_path`` (e.g. data/merged.cache/)."""
+    return merged_path.parent / f"{merged_path.stem}.cache"
+
+
+class PriceSnapshot:
+    """
+    One load of merged.jsonl: the date/symbol axes and the arrays indexed by them
+
+    A snapshot is never modified after it is built (parsed arrays are marked
+    read-only), so a reader holding one always sees an index and arrays that
+    belong together, even while the store publishes a newer snapshot.
+    """
+
+    __slots__ = ("symbols", "dates", "symbol_index", "date_index", "fields", "has_bar", "version")
+
+    def __init__(self, symbols: List[str], dates: List[str], fields: Dict[str, np.ndarray], has_bar: np.ndarray, version: int = 0):
+        self.symbols = symbols
+        self.dates = dates
+        self.symbol_index: Dict[str, int] = {sym: i for i, sym in enumerate(symbols)}
+        self.date_index: Dict[str, int] = {d: i for i, d in enumerate(dates)}
+        self.fields = fields
+        self.has_bar = has_bar
+        # Incremented on every (re)load so dependents can tell when to rebuild
+        self.version = version
+
+    @classmethod
+    def empty(cls, version: int = 0) -> "PriceSnapshot":
+        return cls([], [], {name: np.empty((0, 0)) for name in PRICE_FIELDS}, np.zeros((0, 0), dtype=bool), version)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.symbol_index
+
+    def has_date(self, symbol: str, date: str) -> bool:
+        """Whether ``symbol`` has a bar on ``date``."""
+        col = self.symbol_index.get(symbol)
+        row = self.date_index.get(date)
+        if col is None or row is None:
+            return False
+        return bool(self.has_bar[row, col])
+
+    def get(self, symbol: str, date: str, field: str) -> Optional[float]:
+        """
+        Look up a single value
+
+        Args:
+            symbol: Stock symbol
+            date: Date string in YYYY-MM-DD format
+            field: One of PRICE_FIELDS keys (buy_price, high, low, sell_price, volume)
+
+        Returns:
+            The value as float, or None if the symbol/date/field is missing
+        """
+        col = self.symbol_index.get(symbol)
+        row = self.date_index.get(date)
+        if col is None or row is None:
+            return None
+        value = self.fields[field][row, col]
+        return None if np.isnan(value) else float(value)
+
+    def get_bar(self, symbol: str, date: str) -> Optional[Dict[str, Optional[float]]]:
+        """Return all fields for ``symbol`` on ``date``, or None if there is no bar."""
+        if not self.has_date(symbol, date):
+            return None
+        return {name: self.get(symbol, date, name) for name in PRICE_FIELDS}
+
+    def symbol_dates(self, symbol: str) -> List[str]:
+        """Return the ascending list of dates that carry a bar for ``symbol``."""
+        col = self.symbol_index.get(symbol)
+        if col is None:
+            return []
+        rows = np.flatnonzero(self.has_bar[:, col])
+        return [self.dates[i] for i in rows]
+
+    def date_range(self, start: str, end: str) -> slice:
+        """Return the row slice of dates with start <= date <= end (both inclusive)."""
+        return slice(bisect_left(self.dates, start), bisect_right(self.dates, end))
+
+    def get_table(self, symbols: List[str], start: str, end: str, fields: List[str]) -> Dict[str, List[list]]:
+        """
+        Look up a block of bars in one pass
+
+        Args:
+            symbols: Stock symbols; unknown symbols are left out of the result
+            start: First date (YYYY-MM-DD), inclusive
+            end: Last date (YYYY-MM-DD), inclusive
+            fields: PRICE_FIELDS keys to return, in column order
+
+        Returns:
+            {symbol: [[date, value, ...], ...]}, one row per date that carries a bar, ascending
+        """
+        rows = self.date_range(start, end)
+        dates = self.dates[rows]
+        cols = [self.symbol_index[sym] for sym in symbols if sym in self.symbol_index]
+        block_has_bar = self.has_bar[rows][:, cols]
+        blocks = [self.fields[name][rows][:, cols] for name in fields]
+
+        table: Dict[str, List[list]] = {}
+        for j, col in enumerate(cols):
+            sym = self.symbols[col]
+            table[sym] = [
+                [dates[i]] + [None if np.isnan(block[i, j]) else float(block[i, j]) for block in blocks]
+                for i in np.flatnonzero(block_has_bar[:, j])
+            ]
+        return table
+
+
+
+
+class PriceStore:
+    """
+    In-memory (symbol, date) index over data/merged.jsonl
+
+    The file is parsed once into dense ``dates x symbols`` float arrays (NaN for
+    missing values) plus a boolean ``has_bar`` mask that records which dates
+    actually carry a bar for a symbol. The store is reloaded only when the
+    file's mtime changes, so repeated lookups cost a dict access instead of a
+    full JSON parse.
+
+    If a columnar cache compiled by ``compile_price_cache`` exists and matches
+    the current merged.jsonl, the arrays are memory-mapped read-only from it
+    instead of parsing JSON, so every process shares the same pages.
+
+    Each load builds a new PriceSnapshot and publishes it with a single
+    assignment, so lock-free readers never mix axes and arrays of different
+    loads. Callers doing several lookups should take ``store.snapshot`` once.
+    """
+
+    def __init__(self, merged_path: Optional[str] = None, cache_dir: Optional[str] = None):
+        self.path = Path(merged_path) if merged_path is not None else default_merged_path()
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir(self.path)
+        self._lock = threading.Lock()
+        self._mtime_ns: Optional[int] = None
+        self._snapshot = PriceSnapshot.empty()
+
+    @property
+    def snapshot(self) -> PriceSnapshot:
+        """The current data; consistent for as long as the caller holds it."""
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    @property
+    def symbols(self) -> List[str]:
+        return self._snapshot.symbols
+
+    @property
+    def dates(self) -> List[str]:
+        return self._snapshot.dates
+
+    def refresh(self) -> bool:
+        """
+        Reload the store if merged.jsonl changed since the last load
+
+        Returns:
+            True if the data was (re)loaded, False if the cached copy is still current
+        """
+        try:
+            mtime_ns = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = None
+
+        if mtime_ns == self._mtime_ns:
+            return False
+
+        with self._lock:
+            if mtime_ns == self._mtime_ns:
+                return False
+            version = self._snapshot.version + 1
+            if mtime_ns is None:
+                snapshot = PriceSnapshot.empty(version)
+            else:
+                snapshot = self._load_cache(mtime_ns, version) or self._load(version)
+            self._snapshot = snapshot
+            self._mtime_ns = mtime_ns
+        return True
+
+    def _load_cache(self, mtime_ns: int, version: int) -> Optional[PriceSnapshot]:
+        """Memory-map the compiled cache if it was built from the current merged.jsonl."""
+        index_file = self.cache_dir / "index.json"
+        try:
+            with index_file.open("r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") != CACHE_VERSION or index.get("source_mtime_ns") != mtime_ns:
+                return None
+            dates = index["dates"]
+            symbols = index["symbols"]
+            shape = (len(dates), len(symbols))
+            fields = {name: np.load(self.cache_dir / f"{name}.npy", mmap_mode="r") for name in PRICE_FIELDS}
+            has_bar = np.load(self.cache_dir / "has_bar.npy", mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            return None
+        if has_bar.shape != shape or any(arr.shape != shape for arr in fields.values()):
+            return None
+        return PriceSnapshot(symbols, dates, fields, has_bar, version)
+
+    def _load(self, version: int = 0) -> PriceSnapshot:
+        series_by_symbol: Dict[str, dict] = {}
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    doc = json.loads(line)
+                except Exception:
+                    continue
+                meta = doc.get("Meta Data", {}) if isinstance(doc, dict) else {}
+                sym = meta.get("2. Symbol")
+                series = doc.get("Time Series (Daily)", {})
+                if not sym or not isinstance(series, dict):
+                    continue
+                series_by_symbol[sym] = series
+
+        symbols = list(series_by_symbol.keys())
+        dates = sorted({d for series in series_by_symbol.values() for d in series.keys()})
+        symbol_index = {sym: i for i, sym in enumerate(symbols)}
+        date_index = {d: i for i, d in enumerate(dates)}
+
+        shape = (len(dates), len(symbols))
+        fields = {name: np.full(shape, np.nan, dtype=np.float64) for name in PRICE_FIELDS}
+        has_bar = np.zeros(shape, dtype=bool)
+
+        for sym, series in series_by_symbol.items():
+            col = symbol_index[sym]
+            for date, bar in series.items():
+                if not isinstance(bar, dict):
+                    continue
+                row = date_index[date]
+                has_bar[row, col] = True
+                for name, key in PRICE_FIELDS.items():
+                    value = bar.get(key)
+                    if value is None:
+                        continue
+                    try:
+                        fields[name][row, col] = float(value)
+                    except (TypeError, ValueError):
+                        continue
+
+        for arr in (*fields.values(), has_bar):
+            arr.setflags(write=False)
+        return PriceSnapshot(symbols, dates, fields, has_bar, version)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._snapshot
+
+    def has_date(self, symbol: str, date: str) -> bool:
+        return self._snapshot.has_date(symbol, date)
+
+    def get(self, symbol: str, date: str, field: str) -> Optional[float]:
+        return self._snapshot.get(symbol, date, field)
+
+    def get_bar(self, symbol: str, date: str) -> Optional[Dict[str, Optional[float]]]:
+        return self._snapshot.get_bar(symbol, date)
+
+    def symbol_dates(self, symbol: str) -> List[str]:
+        return self._snapshot.symbol_dates(symbol)
+
+    def date_range(self, start: str, end: str) -> slice:
+        return self._snapshot.date_range(start, end)
+
+    def get_table(self, symbols: List[str], start: str, end: str, fields: List[str]) -> Dict[str, List[list]]:
+        return self._snapshot.get_table(symbols, start, end, fields)
+
+
+_STORES: Dict[str, PriceStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_price_store(merged_path: Optional[str] = None) -> PriceStore:
+    """
+    Return the shared PriceStore for ``merged_path``, reloading it if the file changed
+
+    Args:
+        merged_path: Optional custom merged.jsonl path; defaults to data/merged.jsonl under the project root
+
+    Returns:
+        Up-to-date PriceStore instance shared by all callers in this process
+    """
+    path = Path(merged_path) if merged_path is not None else default_merged_path()
+    key = os.path.abspath(path)
+    store = _STORES.get(key)
+    if store is None:
+        with _STORES_LOCK:
+            store = _STORES.get(key)
+            if store is None:
+                store = PriceStore(key)
+                _STORES[key] = store
+    store.refresh()
+    return store
+
+
+def compile_price_cache(merged_path: Optional[str] = None, cache_dir: Optional[str] = None) -> Path:
+    """
+    Compile merged.jsonl into a columnar, memory-mappable cache
+
+    The cache directory holds one ``.npy`` array per field (``dates x symbols``,
+    float64, NaN for missing), a ``has_bar.npy`` mask and an ``index.json`` with
+    the date/symbol axes and the mtime of the source file. ``index.json`` is
+    written last, so readers never pick up a half-written cache.
+
+    Args:
+        merged_path: Optional custom merged.jsonl path; defaults to data/merged.jsonl under the project root
+        cache_dir: Optional output directory; defaults to <merged stem>.cache next to merged.jsonl
+
+    Returns:
+        Path to the cache directory
+    """
+    source = Path(merged_path) if merged_path is not None else default_merged_path()
+    target = Path(cache_dir) if cache_dir is not None else default_cache_dir(source)
+    target.mkdir(parents=True, exist_ok=True)
+
+    source_mtime_ns = source.stat().st_mtime_ns
+    snapshot = PriceStore(str(source), cache_dir=str(target))._load()
+
+    arrays = dict(snapshot.fields)
+    arrays["has_bar"] = snapshot.has_bar
+    for name, arr in arrays.items():
+        tmp_file = target / f"{name}.npy.tmp"
+        with tmp_file.open("wb") as f:
+            np.save(f, np.ascontiguousarray(arr))
+        os.replace(tmp_file, target / f"{name}.npy")
+
+    index = {
+        "version": CACHE_VERSION,
+        "source": source.name,
+        "source_mtime_ns": source_mtime_ns,
+        "dates": snapshot.dates,
+        "symbols": snapshot.symbols,
+    }
+    tmp_index = target / "index.json.tmp"
+    with tmp_index.open("w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_index, target / "index.json")
+    return target
+
+
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    print(f"Price cache written to: {compile_price_cache(path)}")
@@ -12,6 +12,9 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 from tools.general_tools import get_config_value
+from tools.price_store import get_price_store
+from tools.position_ledger import default_position_file, get_position_ledger, get_position_writer
+from tools.trading_calendar import get_trading_calendar
 
 all_nasdaq_100_symbols = [
     "NVDA", "MSFT", "AAPL", "GOOG", "GOOGL", "AMZN", "META", "AVGO", "TSLA",
@@ -35,16 +38,14 @@ def get_yesterday_date(today_date: str) -> str:
 
     Returns:
         yesterday_date: 昨日日期字符串，格式 YYYY-MM-DD。
+
+    Raises:
+        ValueError: 交易日历中找不到 today_date 之前的交易日。
     """
-    # 计算昨日日期，考虑休市日
-    today_dt = datetime.strptime(today_date, "%Y-%m-%d")
-    yesterday_dt = today_dt - timedelta(days=1)
-    
-    # 如果昨日是周末，向前找到最近的交易日
-    while yesterday_dt.weekday() >= 5:  # 5=Saturday, 6=Sunday
-        yesterday_dt -= timedelta(days=1)
-    
-    yesterday_date = yesterday_dt.strftime("%Y-%m-%d")
+    # 从交易日历中取上一个交易日（价格数据中的实际交易日 + 交易所节假日表）
+    yesterday_date = get_trading_calendar().previous_session(today_date)
+    if yesterday_date is None:
+        raise ValueError(f"No trading session before {today_date} in the trading calendar")
     return yesterday_date
 
 def get_open_prices(today_date: str, symbols: List[str], merged_path: Optional[str] = None) -> Dict[str, Optional[float]]:
@@ -58,40 +59,12 @@ def get_open_prices(today_date: str, symbols: List[str], merged_path: Optional[s
     Returns:
         {symbol_price: open_price 或 None} 的字典；若未找到对应日期或标的，则值为 None。
     """
-    wanted = set(symbols)
     results: Dict[str, Optional[float]] = {}
+    store = get_price_store(merged_path).snapshot
 
-    if merged_path is None:
-        base_dir = Path(__file__).resolve().parents[1]
-        merged_file = base_dir / "data" / "merged.jsonl"
-    else:
-        merged_file = Path(merged_path)
-
-    if not merged_file.exists():
-        return results
-
-    with merged_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-            except Exception:
-                continue
-            meta = doc.get("Meta Data", {}) if isinstance(doc, dict) else {}
-            sym = meta.get("2. Symbol")
-            if sym not in wanted:
-                continue
-            series = doc.get("Time Series (Daily)", {})
-            if not isinstance(series, dict):
-                continue
-            bar = series.get(today_date)
-            if isinstance(bar, dict):
-                open_val = bar.get("1. buy price")
-                try:
-                    results[f'{sym}_price'] = float(open_val) if open_val is not None else None
-                except Exception:
-                    results[f'{sym}_price'] = None
+    for sym in dict.fromkeys(symbols):
+        if store.has_date(sym, today_date):
+            results[f'{sym}_price'] = store.get(sym, today_date, "buy_price")
 
     return results
 
@@ -106,84 +79,26 @@ def get_yesterday_open_and_close_price(today_date: str, symbols: List[str], merg
     Returns:
         (买入价字典, 卖出价字典) 的元组；若未找到对应日期或标的，则值为 None。
     """
-    wanted = set(symbols)
     buy_results: Dict[str, Optional[float]] = {}
     sell_results: Dict[str, Optional[float]] = {}
+    store = get_price_store(merged_path).snapshot
 
-    if merged_path is None:
-        base_dir = Path(__file__).resolve().parents[1]
-        merged_file = base_dir / "data" / "merged.jsonl"
-    else:
-        merged_file = Path(merged_path)
-
-    if not merged_file.exists():
-        return buy_results, sell_results
+    calendar = get_trading_calendar(merged_path=merged_path)
+    yesterday_date = calendar.previous_session(today_date)
+    # 如果昨日没有数据，最多向前查找5个交易日
+    fallback_dates = calendar.previous_sessions(yesterday_date, 5) if yesterday_date else []
 
-    yesterday_date = get_yesterday_date(today_date)
+    for sym in dict.fromkeys(symbols):
+        if sym not in store:
+            continue
 
-    with merged_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-            except Exception:
-                continue
-            meta = doc.get("Meta Data", {}) if isinstance(doc, dict) else {}
-            sym = meta.get("2. Symbol")
-            if sym not in wanted:
-                continue
-            series = doc.get("Time Series (Daily)", {})
-            if not isinstance(series, dict):
-                continue
-            
-            # 尝试获取昨日买入价和卖出价
-            bar = series.get(yesterday_date)
-            if isinstance(bar, dict):
-                buy_val = bar.get("1. buy price")  # 买入价字段
-                sell_val = bar.get("4. sell price")  # 卖出价字段
-                
-                try:
-                    buy_price = float(buy_val) if buy_val is not None else None
-                    sell_price = float(sell_val) if sell_val is not None else None
-                    buy_results[f'{sym}_price'] = buy_price
-                    sell_results[f'{sym}_price'] = sell_price
-                except Exception:
-                    buy_results[f'{sym}_price'] = None
-                    sell_results[f'{sym}_price'] = None
-            else:
-                # 如果昨日没有数据，尝试向前查找最近的交易日
-                today_dt = datetime.strptime(today_date, "%Y-%m-%d")
-                yesterday_dt = today_dt - timedelta(days=1)
-                current_date = yesterday_dt
-                found_data = False
-                
-                # 最多向前查找5个交易日
-                for _ in range(5):
-                    current_date -= timedelta(days=1)
-                    # 跳过周末
-                    while current_date.weekday() >= 5:
-                        current_date -= timedelta(days=1)
-                    
-                    check_date = current_date.strftime("%Y-%m-%d")
-                    bar = series.get(check_date)
-                    if isinstance(bar, dict):
-                        buy_val = bar.get("1. buy price")
-                        sell_val = bar.get("4. sell price")
-                        
-                        try:
-                            buy_price = float(buy_val) if buy_val is not None else None
-                            sell_price = float(sell_val) if sell_val is not None else None
-                            buy_results[f'{sym}_price'] = buy_price
-                            sell_results[f'{sym}_price'] = sell_price
-                            found_data = True
-                            break
-                        except Exception:
-                            continue
-                
-                if not found_data:
-                    buy_results[f'{sym}_price'] = None
-                    sell_results[f'{sym}_price'] = None
+        buy_results[f'{sym}_price'] = None
+        sell_results[f'{sym}_price'] = None
+        for check_date in [yesterday_date, *fallback_dates]:
+            if store.has_date(sym, check_date):
+                buy_results[f'{sym}_price'] = store.get(sym, check_date, "buy_price")
+                sell_results[f'{sym}_price'] = store.get(sym, check_date, "sell_price")
+                break
 
     return buy_results, sell_results
 
@@ -233,31 +148,14 @@ def get_today_init_position(today_date: str, modelname: str) -> Dict[str, float]
     Returns:
         {symbol: weight} 的字典；若未找到对应日期，则返回空字典。
     """
-    base_dir = Path(__file__).resolve().parents[1]
-    position_file = base_dir / "data" / "agent_data" / modelname / "position" / "position.jsonl"
+    position_file = default_position_file(modelname)
 
     if not position_file.exists():
         print(f"Position file {position_file} does not exist")
         return {}
     
     yesterday_date = get_yesterday_date(today_date)
-    max_id = -1
-    latest_positions = {}
-  
-    with position_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-                if doc.get("date") == yesterday_date:
-                    current_id = doc.get("id", 0)
-                    if current_id > max_id:
-                        max_id = current_id
-                        latest_positions = doc.get("positions", {})
-            except Exception:
-                continue
-    
+    latest_positions, _ = get_position_ledger(str(position_file)).latest(yesterday_date)
     return latest_positions
 
 def get_latest_position(today_date: str, modelname: str) -> Tuple[Dict[str, float], int]:
@@ -275,53 +173,21 @@ def get_latest_position(today_date: str, modelname: str) -> Tuple[Dict[str, floa
           - positions: {symbol: weight} 的字典；若未找到任何记录，则为空字典。
           - max_id: 选中记录的最大 id；若未找到任何记录，则为 -1.
     """
-    base_dir = Path(__file__).resolve().parents[1]
-    position_file = base_dir / "data" / "agent_data" / modelname / "position" / "position.jsonl"
+    position_file = default_position_file(modelname)
 
     if not position_file.exists():
         return {}, -1
     
+    ledger = get_position_ledger(str(position_file))
+
     # 先尝试读取当天记录
-    max_id_today = -1
-    latest_positions_today: Dict[str, float] = {}
-    
-    with position_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-                if doc.get("date") == today_date:
-                    current_id = doc.get("id", -1)
-                    if current_id > max_id_today:
-                        max_id_today = current_id
-                        latest_positions_today = doc.get("positions", {})
-            except Exception:
-                continue
-    
+    latest_positions_today, max_id_today = ledger.latest(today_date)
     if max_id_today >= 0:
         return latest_positions_today, max_id_today
 
     # 当天没有记录，则回退到上一个交易日
     prev_date = get_yesterday_date(today_date)
-    max_id_prev = -1
-    latest_positions_prev: Dict[str, float] = {}
-
-    with position_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-                if doc.get("date") == prev_date:
-                    current_id = doc.get("id", -1)
-                    if current_id > max_id_prev:
-                        max_id_prev = current_id
-                        latest_positions_prev = doc.get("positions", {})
-            except Exception:
-                continue
-
-    return latest_positions_prev, max_id_prev
+    return ledger.latest(prev_date)
 
 def add_no_trade_record(today_date: str, modelname: str):
     """
@@ -333,19 +199,11 @@ def add_no_trade_record(today_date: str, modelname: str):
     Returns:
         None
     """
-    save_item = {}
-    current_position, current_action_id = get_latest_position(today_date, modelname)
-    print(current_position, current_action_id)
-    save_item["date"] = today_date
-    save_item["id"] = current_action_id+1
-    save_item["this_action"] = {"action":"no_trade","symbol":"","amount":0}
-    
-    save_item["positions"] = current_position
-    base_dir = Path(__file__).resolve().parents[1]
-    position_file = base_dir / "data" / "agent_data" / modelname / "position" / "position.jsonl"
-
-    with position_file.open("a", encoding="utf-8") as f:
-        f.write(json.dumps(save_item) + "\n")
+    position_file = default_position_file(modelname)
+    with get_position_writer(str(position_file)).transaction() as txn:
+        current_position, current_action_id = get_latest_position(today_date, modelname)
+        print(current_position, current_action_id)
+        txn.append(today_date, {"action":"no_trade","symbol":"","amount":0}, current_position)
     return 
 
 if __name__ == "__main__":
@@ -21,6 +21,8 @@ from tools.price_tools import (
     all_nasdaq_100_symbols
 )
 from tools.general_tools import get_config_value
+from tools.price_store import get_price_store
+from tools.position_ledger import default_position_file, get_position_ledger
 
 
 def calculate_portfolio_value(positions: Dict[str, float], prices: Dict[str, Optional[float]], cash: float = 0.0) -> float:
@@ -58,33 +60,97 @@ def get_available_date_range(modelname: str) -> Tuple[str, str]:
     Returns:
         Tuple of (earliest date, latest date) in YYYY-MM-DD format
     """
-    base_dir = Path(__file__).resolve().parents[1]
-    position_file = base_dir / "data" / "agent_data" / modelname / "position" / "position.jsonl"
+    position_file = default_position_file(modelname)
     
     if not position_file.exists():
         return "", ""
     
-    dates = []
-    
-    with position_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-                date = doc.get("date")
-                if date:
-                    dates.append(date)
-            except Exception:
-                continue
-    
+    dates = get_position_ledger(str(position_file)).dates()
     if not dates:
         return "", ""
     
-    dates.sort()
     return dates[0], dates[-1]
 
 
+def get_portfolio_values_frame(modelnames: List[str], start_date: Optional[str] = None, end_date: Optional[str] = None) -> pd.DataFrame:
+    """
+    Value the portfolios of one or many models in a single vectorised pass
+    
+    Positions (latest record per date from each model's ledger) are laid out
+    as a models x dates x symbols share tensor on the union of the models'
+    record dates, forward-filled so a model keeps its last holdings on dates
+    where it has no record. Closing (sell) prices form a dates x symbols
+    matrix, and each day's value is cash plus the shares-by-closes product.
+    As in calculate_portfolio_value, only positive holdings of NASDAQ 100
+    symbols with a close on that date contribute.
+    
+    Args:
+        modelnames: Model names (signatures)
+        start_date: Start date in YYYY-MM-DD format, uses earliest date if None
+        end_date: End date in YYYY-MM-DD format, uses latest date if None
+    
+    Returns:
+        DataFrame indexed by date with one column per model; NaN before a model's first record
+    """
+    base_dir = Path(__file__).resolve().parents[1]
+    merged_file = base_dir / "data" / "merged.jsonl"
+    if not merged_file.exists():
+        return pd.DataFrame(columns=modelnames, dtype=float)
+    
+    store = get_price_store(str(merged_file)).snapshot
+    symbols = [symbol for symbol in dict.fromkeys(all_nasdaq_100_symbols) if symbol in store]
+    symbol_col = {symbol: j for j, symbol in enumerate(symbols)}
+    
+    # Record dates per model within the requested range
+    ledgers = {}
+    model_dates = {}
+    for modelname in modelnames:
+        position_file = default_position_file(modelname)
+        if not position_file.exists():
+            continue
+        ledger = get_position_ledger(str(position_file))
+        ledgers[modelname] = ledger
+        model_dates[modelname] = [
+            date for date in ledger.dates()
+            if (start_date is None or date >= start_date) and (end_date is None or date <= end_date)
+        ]
+    
+    grid = sorted({date for dates in model_dates.values() for date in dates})
+    date_row = {date: i for i, date in enumerate(grid)}
+    shares = np.full((len(modelnames), len(grid), len(symbols)), np.nan)
+    cash = np.full((len(modelnames), len(grid)), np.nan)
+    
+    # Positions tensor: one row per (model, record date)
+    for m, modelname in enumerate(modelnames):
+        for date in model_dates.get(modelname, []):
+            positions, _ = ledgers[modelname].latest(date)
+            row = date_row[date]
+            shares[m, row, :] = 0.0
+            cash[m, row] = positions.get("CASH", 0.0)
+            for symbol, amount in positions.items():
+                col = symbol_col.get(symbol)
+                if col is not None and amount > 0:
+                    shares[m, row, col] = amount
+    
+    # Forward-fill positions along the date axis
+    filled = np.where(~np.isnan(cash), np.arange(len(grid)), 0)
+    np.maximum.accumulate(filled, axis=1, out=filled)
+    model_idx = np.arange(len(modelnames))[:, None]
+    shares = shares[model_idx, filled]
+    cash = cash[model_idx, filled]
+    
+    # Closes matrix on the same grid; missing closes contribute nothing
+    closes = np.zeros((len(grid), len(symbols)))
+    store_cols = np.array([store.symbol_index[symbol] for symbol in symbols], dtype=np.intp)
+    grid_rows = np.array([store.date_index.get(date, -1) for date in grid], dtype=np.intp)
+    present = grid_rows >= 0
+    if present.any() and len(symbols):
+        closes[present] = np.nan_to_num(store.fields["sell_price"][grid_rows[present]][:, store_cols], nan=0.0)
+    
+    values = np.einsum("mds,ds->md", np.nan_to_num(shares, nan=0.0), closes) + cash
+    return pd.DataFrame(values.T, index=pd.Index(grid, name="date"), columns=modelnames)
+
+
 def get_daily_portfolio_values(modelname: str, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, float]:
     """
     Get daily portfolio values
@@ -97,93 +163,11 @@ def get_daily_portfolio_values(modelname: str, start_date: Optional[str] = None,
     Returns:
         Dictionary of daily portfolio values in format {date: portfolio_value}
     """
-    base_dir = Path(__file__).resolve().parents[1]
-    position_file = base_dir / "data" / "agent_data" / modelname / "position" / "position.jsonl"
-    merged_file = base_dir / "data" / "merged.jsonl"
-    
-    if not position_file.exists() or not merged_file.exists():
+    frame = get_portfolio_values_frame([modelname], start_date, end_date)
+    if frame.empty:
         return {}
-    
-    # Get available date range if not specified
-    if start_date is None or end_date is None:
-        earliest_date, latest_date = get_available_date_range(modelname)
-        if not earliest_date or not latest_date:
-            return {}
-        
-        if start_date is None:
-            start_date = earliest_date
-        if end_date is None:
-            end_date = latest_date
-    
-    # Read position data
-    position_data = []
-    with position_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-                position_data.append(doc)
-            except Exception:
-                continue
-    
-    # Read price data
-    price_data = {}
-    with merged_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            if not line.strip():
-                continue
-            try:
-                doc = json.loads(line)
-                meta = doc.get("Meta Data", {})
-                symbol = meta.get("2. Symbol")
-                if symbol:
-                    price_data[symbol] = doc.get("Time Series (Daily)", {})
-            except Exception:
-                continue
-    
-    # Calculate daily portfolio values
-    daily_values = {}
-    
-    # Group position data by date
-    positions_by_date = {}
-    for record in position_data:
-        date = record.get("date")
-        if date:
-            if date not in positions_by_date:
-                positions_by_date[date] = []
-            positions_by_date[date].append(record)
-    
-    # For each date, sort records by id and take latest position
-    for date, records in positions_by_date.items():
-        if start_date and date < start_date:
-            continue
-        if end_date and date > end_date:
-            continue
-            
-        # Sort by id and take latest position
-        latest_record = max(records, key=lambda x: x.get("id", 0))
-        positions = latest_record.get("positions", {})
-        
-        # Get daily prices
-        daily_prices = {}
-        for symbol in all_nasdaq_100_symbols:
-            if symbol in price_data:
-                symbol_prices = price_data[symbol]
-                if date in symbol_prices:
-                    price_info = symbol_prices[date]
-                    buy_price = price_info.get("1. buy price")
-                    sell_price = price_info.get("4. sell price")
-                    # Use closing (sell) price to calculate value
-                    if sell_price is not None:
-                        daily_prices[f'{symbol}_price'] = float(sell_price)
-        
-        # Calculate portfolio value
-        cash = positions.get("CASH", 0.0)
-        portfolio_value = calculate_portfolio_value(positions, daily_prices, cash)
-        daily_values[date] = portfolio_value
-    
-    return daily_values
+    series = frame[modelname].dropna()
+    return {date: float(value) for date, value in series.items()}
 
 
 def calculate_daily_returns(portfolio_values: Dict[str, float]) -> List[float]:
@@ -478,6 +462,19 @@ def calculate_all_metrics(modelname: str, start_date: Optional[str] = None, end_
             "end_date": ""
         }
     
+    return calculate_metrics_from_values(portfolio_values)
+
+
+def calculate_metrics_from_values(portfolio_values: Dict[str, float]) -> Dict[str, any]:
+    """
+    Calculate all performance metrics from a daily portfolio value series
+    
+    Args:
+        portfolio_values: Non-empty daily portfolio value dictionary in format {date: portfolio_value}
+    
+    Returns:
+        Dictionary containing all metrics
+    """
     # Calculate daily returns
     daily_returns = calculate_daily_returns(portfolio_values)
     
@@ -592,6 +589,22 @@ def get_next_id(filepath: Path) -> int:
     return max_id + 1
 
 
+# filepath -> (file size, next id), so appends made by this process don't rescan the file
+_NEXT_IDS: Dict[str, Tuple[int, int]] = {}
+
+
+def _next_metrics_id(filepath: Path) -> int:
+    """get_next_id, answered from memory while the file is unchanged since our last append"""
+    try:
+        size = filepath.stat().st_size
+    except FileNotFoundError:
+        return 0
+    cached = _NEXT_IDS.get(str(filepath))
+    if cached is not None and cached[0] == size:
+        return cached[1]
+    return get_next_id(filepath)
+
+
 def save_metrics_to_jsonl(metrics: Dict[str, any], modelname: str, output_dir: Optional[str] = None) -> str:
     """
     Incrementally save metrics to JSONL format
@@ -619,7 +632,7 @@ def save_metrics_to_jsonl(metrics: Dict[str, any], modelname: str, output_dir: O
     filepath = output_dir / filename
     
     # Get next ID number
-    next_id = get_next_id(filepath)
+    next_id = _next_metrics_id(filepath)
     
     # Prepare data to save
     save_data = {
@@ -663,6 +676,7 @@ def save_metrics_to_jsonl(metrics: Dict[str, any], modelname: str, output_dir: O
     # Incrementally save to JSONL file (append mode)
     with filepath.open("a", encoding="utf-8") as f:
         f.write(json.dumps(save_data, ensure_ascii=False) + "\n")
+    _NEXT_IDS[str(filepath)] = (filepath.stat().st_size, next_id + 1)
     
     return str(filepath)
 
@@ -843,11 +857,9 @@ def calculate_and_save_metrics(modelname: str, start_date: Optional[str] = None,
         print(f"Metrics saved to: {saved_file}")
         metrics["saved_file"] = saved_file
         
-        # Get ID of just saved record
-        latest_record = get_latest_metrics(modelname, output_dir)
-        if latest_record:
-            metrics["record_id"] = latest_record["id"]
-            print(f"Record ID: {latest_record['id']}")
+        # ID of the record just saved
+        metrics["record_id"] = _NEXT_IDS[saved_file][1] - 1
+        print(f"Record ID: {metrics['record_id']}")
     except Exception as e:
         print(f"Error saving file: {e}")
         metrics["save_error"] = str(e)
@@ -859,6 +871,229 @@ def calculate_and_save_metrics(modelname: str, start_date: Optional[str] = None,
     return metrics
 
 
+METRICS_CHECKPOINT_VERSION = 2
+
+
+def _empty_metrics_state() -> Dict[str, any]:
+    return {
+        "first_date": None,
+        "first_value": None,
+        "last_date": None,
+        "last_value": None,
+        "total_trading_days": 0,
+        "peak_value": None,
+        "peak_date": None,
+        "max_drawdown": 0.0,
+        "max_drawdown_start": "",
+        "max_drawdown_end": "",
+        # Welford running mean / sum of squared deviations of daily returns
+        "return_count": 0,
+        "return_mean": 0.0,
+        "return_m2": 0.0,
+        "win_count": 0,
+        "profit_sum": 0.0,
+        "profit_count": 0,
+        "loss_sum": 0.0,
+        "loss_count": 0,
+    }
+
+
+def _advance_metrics_state(state: Dict[str, any], date: str, value: float) -> None:
+    """Fold one more day into the running state, mirroring calculate_metrics_from_values"""
+    if state["first_date"] is None:
+        state["first_date"] = date
+        state["first_value"] = value
+        state["peak_value"] = value
+        state["peak_date"] = date
+    else:
+        prev_value = state["last_value"]
+        if prev_value > 0:
+            daily_return = (value - prev_value) / prev_value
+            state["return_count"] += 1
+            delta = daily_return - state["return_mean"]
+            state["return_mean"] += delta / state["return_count"]
+            state["return_m2"] += delta * (daily_return - state["return_mean"])
+            if daily_return > 0:
+                state["win_count"] += 1
+                state["profit_sum"] += daily_return
+                state["profit_count"] += 1
+            elif daily_return < 0:
+                state["loss_sum"] += daily_return
+                state["loss_count"] += 1
+    state["last_date"] = date
+    state["last_value"] = value
+    state["total_trading_days"] += 1
+
+    if value > state["peak_value"]:
+        state["peak_value"] = value
+        state["peak_date"] = date
+    drawdown = (state["peak_value"] - value) / state["peak_value"]
+    if drawdown > state["max_drawdown"]:
+        state["max_drawdown"] = drawdown
+        state["max_drawdown_start"] = state["peak_date"]
+        state["max_drawdown_end"] = date
+
+
+def _metrics_from_state(state: Dict[str, any]) -> Dict[str, any]:
+    """Build the calculate_all_metrics result (without the full series) from running state"""
+    count = state["return_count"]
+    sharpe_ratio = 0.0
+    volatility = 0.0
+    if count >= 2:
+        std_return = np.sqrt(state["return_m2"] / (count - 1))
+        volatility = std_return * np.sqrt(252)
+        if volatility != 0:
+            sharpe_ratio = (state["return_mean"] * 252 - 0.02) / volatility
+
+    first_value, last_value = state["first_value"], state["last_value"]
+    cumulative_return = (last_value - first_value) / first_value if first_value else 0.0
+    days = (datetime.strptime(state["last_date"], "%Y-%m-%d") - datetime.strptime(state["first_date"], "%Y-%m-%d")).days
+    annualized_return = (1 + cumulative_return) ** (365 / days) - 1 if first_value and days else 0.0
+
+    win_rate = state["win_count"] / count if count else 0.0
+    profit_loss_ratio = 0.0
+    if state["profit_count"] and state["loss_count"]:
+        avg_loss = abs(state["loss_sum"] / state["loss_count"])
+        if avg_loss != 0:
+            profit_loss_ratio = (state["profit_sum"] / state["profit_count"]) / avg_loss
+
+    return {
+        # Only the endpoints of the series are kept; enough for reports and the saved summary
+        "portfolio_values": {state["first_date"]: first_value, state["last_date"]: last_value},
+        "sharpe_ratio": round(float(sharpe_ratio), 4),
+        "max_drawdown": round(state["max_drawdown"], 4),
+        "max_drawdown_start": state["max_drawdown_start"],
+        "max_drawdown_end": state["max_drawdown_end"],
+        "cumulative_return": round(cumulative_return, 4),
+        "annualized_return": round(annualized_return, 4),
+        "volatility": round(float(volatility), 4),
+        "win_rate": round(win_rate, 4),
+        "profit_loss_ratio": round(float(profit_loss_ratio), 4),
+        "total_trading_days": state["total_trading_days"],
+        "start_date": state["first_date"],
+        "end_date": state["last_date"],
+    }
+
+
+def update_metrics_incremental(modelname: str, output_dir: Optional[str] = None, print_report: bool = True, save: bool = True) -> Dict[str, any]:
+    """
+    Refresh a model's full-history metrics from the position records added since the last run
+    
+    Running state (first/last value, peak and drawdown, Welford mean/variance
+    of daily returns, win/loss sums) is kept in metrics_checkpoint.json next
+    to performance_metrics.jsonl. Only days before the ledger's latest date are
+    folded into the checkpoint, since the latest day can still receive trades;
+    that day is applied on top of a copy of the state. The checkpoint also
+    records the ledger's byte offset, so a run only reads the records appended
+    since the last one. It is rebuilt from scratch if the ledger or
+    merged.jsonl was rewritten.
+    
+    Args:
+        modelname: Model name (SIGNATURE)
+        output_dir: Output directory, defaults to data/agent_data/{modelname}/metrics/
+        print_report: Whether to print report
+        save: Whether to append the result to performance_metrics.jsonl
+    
+    Returns:
+        Same metrics as calculate_all_metrics, except that portfolio_values only holds the first and last day
+        and daily_returns is omitted
+    """
+    base_dir = Path(__file__).resolve().parents[1]
+    metrics_dir = Path(output_dir) if output_dir is not None else base_dir / "data" / "agent_data" / modelname / "metrics"
+    checkpoint_file = metrics_dir / "metrics_checkpoint.json"
+    
+    position_file = default_position_file(modelname)
+    merged_file = base_dir / "data" / "merged.jsonl"
+    if not position_file.exists() or not merged_file.exists():
+        metrics = {"error": "Unable to get portfolio data"}
+        print(f"Error: {metrics['error']}")
+        return metrics
+    
+    ledger = get_position_ledger(str(position_file))
+    ledger_offset = ledger.end_offset()
+    latest_date = ledger.max_date
+    if latest_date is None:
+        metrics = {"error": "Unable to get available data date range"}
+        print(f"Error: {metrics['error']}")
+        return metrics
+    source_mtime_ns = merged_file.stat().st_mtime_ns
+    
+    # Load the checkpoint, discarding it if what it summarised has changed
+    checkpoint = None
+    try:
+        with checkpoint_file.open("r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        pass
+    if checkpoint is not None:
+        last_date = checkpoint.get("state", {}).get("last_date")
+        valid = (
+            checkpoint.get("version") == METRICS_CHECKPOINT_VERSION
+            and checkpoint.get("source_mtime_ns") == source_mtime_ns
+            and checkpoint.get("ledger_offset", -1) <= ledger_offset
+            and (last_date is None or ledger.latest(last_date)[1] == checkpoint.get("last_record_id"))
+        )
+        if not valid:
+            checkpoint = None
+    state = checkpoint["state"] if checkpoint is not None else _empty_metrics_state()
+    
+    # Value only the days after the checkpoint: the day left open last time plus
+    # the dates of records appended since, so the ledger's history is not rescanned
+    if checkpoint is not None:
+        new_dates = {record.get("date") for record in ledger.records_from(checkpoint["ledger_offset"])}
+        new_dates.add(checkpoint.get("open_date"))
+    else:
+        new_dates = set(ledger.dates())
+    pending = sorted(date for date in new_dates if date and (state["last_date"] is None or date > state["last_date"]))
+    values = {}
+    if pending:
+        frame = get_portfolio_values_frame([modelname], pending[0], pending[-1])
+        values = {date: float(value) for date, value in frame[modelname].dropna().items()}
+    
+    for date in pending:
+        if date < latest_date and date in values:
+            _advance_metrics_state(state, date, values[date])
+    
+    if state["last_date"] is not None:
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        checkpoint = {
+            "version": METRICS_CHECKPOINT_VERSION,
+            "source_mtime_ns": source_mtime_ns,
+            "last_record_id": ledger.latest(state["last_date"])[1],
+            "ledger_offset": ledger_offset,
+            "open_date": latest_date,
+            "state": state,
+        }
+        tmp_file = checkpoint_file.with_name(f"{checkpoint_file.name}.tmp")
+        with tmp_file.open("w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, ensure_ascii=False)
+        os.replace(tmp_file, checkpoint_file)
+    
+    # The latest (possibly still open) day is applied on a copy
+    current = dict(state)
+    if latest_date in values and (state["last_date"] is None or latest_date > state["last_date"]):
+        _advance_metrics_state(current, latest_date, values[latest_date])
+    if current["last_date"] is None:
+        metrics = {"error": "Unable to get portfolio data"}
+        print(f"Error: {metrics['error']}")
+        return metrics
+    metrics = _metrics_from_state(current)
+    
+    if save:
+        try:
+            saved_file = save_metrics_to_jsonl(metrics, modelname, output_dir)
+            metrics["saved_file"] = saved_file
+            metrics["record_id"] = _NEXT_IDS[saved_file][1] - 1
+        except Exception as e:
+            print(f"Error saving file: {e}")
+            metrics["save_error"] = str(e)
+    
+    if print_report:
+        print_performance_report(metrics)
+    
+    return metrics
+
+
 if __name__ == "__main__":
     # Test code
     # 测试代码
@@ -868,5 +1103,8 @@ if __name__ == "__main__":
         print("请设置环境变量 SIGNATURE，例如: export SIGNATURE=claude-3.7-sonnet")
         sys.exit(1)
     
-    # 使用入口函数计算和保存指标
-    result = calculate_and_save_metrics(modelname)
+    # 使用入口函数计算和保存指标；--incremental 只处理上次运行之后新增的持仓记录
+    if "--incremental" in sys.argv[1:]:
+        result = update_metrics_incremental(modelname)
+    else:
+        result = calculate_and_save_metrics(modelname)
@@ -0,0 +1,140 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+try:
+    import httpx
+except ImportError:  # httpx comes with openai; classification falls back to status codes
+    httpx = None
+
+try:
+    import openai
+except ImportError:
+    openai = None
+
+RETRYABLE = "retryable"
+FATAL = "fatal"
+
+# HTTP status codes worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+# Upper bounds for one backoff delay and for an honoured Retry-After header (seconds)
+DEFAULT_MAX_DELAY = 60.0
+MAX_RETRY_AFTER = 300.0
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(exc: BaseException) -> str:
+    """
+    Decide whether an exception is worth retrying
+
+    Rate limits, server errors, timeouts and dropped connections are
+    RETRYABLE. Everything else is FATAL: client errors (400/401/403/404/422)
+    and programming errors repeat on every attempt, so retrying them only
+    burns tokens. Exception groups (raised by the MCP client) are retryable
+    if any member is.
+
+    Returns:
+        RETRYABLE or FATAL
+    """
+    if isinstance(getattr(exc, "exceptions", None), (list, tuple)):
+        return RETRYABLE if any(classify_error(e) == RETRYABLE for e in exc.exceptions) else FATAL
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return RETRYABLE
+    if openai is not None and isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+        return RETRYABLE
+    if httpx is not None and isinstance(exc, (httpx.TimeoutException, httpx.TransportError)):
+        return RETRYABLE
+    status = _status_code(exc)
+    if status is not None:
+        return RETRYABLE if status in RETRYABLE_STATUS_CODES else FATAL
+    cause = exc.__cause__ or exc.__context__
+    if cause is not None and cause is not exc:
+        return classify_error(cause)
+    return FATAL
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Return the delay requested by a Retry-After / retry-after-ms response header, if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            return min(MAX_RETRY_AFTER, max(0.0, float(value) / 1000))
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return min(MAX_RETRY_AFTER, max(0.0, float(value)))
+        except ValueError:
+            retry_at = parsedate_to_datetime(value)
+            return min(MAX_RETRY_AFTER, max(0.0, retry_at.timestamp() - time.time()))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class RetryBudget:
+    """
+    Retries allowed for a whole run (all dates of one model)
+
+    Keeps a persistently failing provider from multiplying the cost of every
+    day; once spent, errors are raised on first failure.
+    """
+
+    def __init__(self, total: Optional[int]):
+        self.total = total
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def consume(self) -> bool:
+        """Take one retry from the budget; False if it is exhausted (None means unlimited)."""
+        with self._lock:
+            if self.total is not None and self.used >= self.total:
+                return False
+            self.used += 1
+            return True
+
+    @property
+    def remaining(self) -> Optional[int]:
+        return None if self.total is None else max(0, self.total - self.used)
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter, honouring Retry-After
+
+    The delay before retry n (1-based) is uniform in [0, min(max_delay,
+    base_delay * 2**(n-1))], or the server's Retry-After if that is longer.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = DEFAULT_MAX_DELAY,
+                 budget: Optional[RetryBudget] = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+
+    def delay(self, attempt: int, exc: Optional[BaseException] = None) -> float:
+        """Seconds to wait after failed attempt ``attempt`` (1-based)."""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        retry_after = retry_after_seconds(exc) if exc is not None else None
+        return max(backoff, retry_after) if retry_after is not None else backoff
+
+    def should_retry(self, attempt: int, exc: BaseException) -> bool:
+        """Whether to retry after failed attempt ``attempt``; consumes budget when it says yes."""
+        if attempt >= self.max_attempts or classify_error(exc) != RETRYABLE:
+            return False
+        return self.budget is None or self.budget.consume()
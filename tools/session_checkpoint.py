@@ -0,0 +1,56 @@
+import os
+import glob
+import json
+from typing import Any, Dict, List, Optional
+
+# File name of the step checkpoint inside each {log_path}/{signature}/log/{date}/ directory
+CHECKPOINT_FILE_NAME = "checkpoint.json"
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_path(data_path: str, date: str) -> str:
+    """Return the checkpoint file of ``date`` for the model whose data lives in ``data_path``."""
+    return os.path.join(data_path, "log", date, CHECKPOINT_FILE_NAME)
+
+
+def load_checkpoint(data_path: str, date: str) -> Optional[Dict[str, Any]]:
+    """
+    Load the step checkpoint of an unfinished trading day
+
+    Returns:
+        The checkpoint dict, or None if there is none (or it is unreadable / from another version)
+    """
+    try:
+        with open(checkpoint_path(data_path, date), "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get("version") != CHECKPOINT_VERSION or checkpoint.get("date") != date:
+        return None
+    return checkpoint
+
+
+def save_checkpoint(data_path: str, date: str, checkpoint: Dict[str, Any]) -> None:
+    """Write the checkpoint atomically (temporary file + rename), so a crash never leaves half a file."""
+    path = checkpoint_path(data_path, date)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({**checkpoint, "version": CHECKPOINT_VERSION, "date": date}, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def clear_checkpoint(data_path: str, date: str) -> None:
+    """Remove the checkpoint once the day is finished."""
+    try:
+        os.remove(checkpoint_path(data_path, date))
+    except FileNotFoundError:
+        pass
+
+
+def pending_checkpoint_dates(data_path: str) -> List[str]:
+    """Return the dates (ascending) that have a checkpoint, i.e. sessions that started but never finished."""
+    pattern = os.path.join(data_path, "log", "*", CHECKPOINT_FILE_NAME)
+    return sorted(os.path.basename(os.path.dirname(fp)) for fp in glob.glob(pattern))
@@ -0,0 +1,267 @@
+import os
+import sys
+import glob
+import json
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Add project root directory to Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# File name of the span log inside each {log_path}/{signature}/log/{date}/ directory
+TRACE_FILE_NAME = "trace.jsonl"
+
+_CURRENT_TRACER: contextvars.ContextVar[Optional["Tracer"]] = contextvars.ContextVar("tracer", default=None)
+_CURRENT_SPAN: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    """
+    One timed operation
+
+    Serialised with OpenTelemetry's field names (trace_id, span_id,
+    parent_span_id, start/end_time_unix_nano, status, attributes) so the
+    JSONL can be converted to OTLP without remapping.
+    """
+
+    def __init__(self, tracer: "Tracer", name: str, kind: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_span_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes)
+        self.status = "OK"
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter()
+
+    def set(self, **attributes: Any) -> None:
+        """Add or overwrite attributes."""
+        self.attributes.update(attributes)
+
+    def to_dict(self, end_ns: int, duration_ms: float) -> Dict[str, Any]:
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": end_ns,
+            "duration_ms": round(duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+class Tracer:
+    """
+    Append-only span writer for one JSONL file
+
+    Common attributes (signature, date, ...) given to the tracer are copied
+    into every span it writes.
+    """
+
+    def __init__(self, path: str, **attributes: Any):
+        self.path = path
+        self.attributes = attributes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes: Any) -> Iterator[Span]:
+        """Time the enclosed block as a child of the current span and write it on exit."""
+        span = Span(self, name, kind, _CURRENT_SPAN.get(), {**self.attributes, **attributes})
+        token = _CURRENT_SPAN.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "ERROR"
+            span.error = f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            _CURRENT_SPAN.reset(token)
+            duration_ms = (time.perf_counter() - span._start_perf) * 1000
+            self._write(span.to_dict(time.time_ns(), duration_ms))
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+@contextmanager
+def use_tracer(tracer: Optional[Tracer]) -> Iterator[Optional[Tracer]]:
+    """Make ``tracer`` the current tracer for this context (asyncio tasks started inside inherit it)."""
+    token = _CURRENT_TRACER.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _CURRENT_TRACER.reset(token)
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Return the current tracer, or None if tracing is off."""
+    return _CURRENT_TRACER.get()
+
+
+@contextmanager
+def trace_span(name: str, kind: str = "internal", **attributes: Any) -> Iterator[Optional[Span]]:
+    """Span on the current tracer; yields None (and records nothing) when no tracer is active."""
+    tracer = _CURRENT_TRACER.get()
+    if tracer is None:
+        yield None
+        return
+    with tracer.span(name, kind, **attributes) as span:
+        yield span
+
+
+def payload_size(value: Any) -> int:
+    """Approximate payload size in bytes (UTF-8 length of its JSON or text form)."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if not isinstance(value, str):
+        try:
+            value = json.dumps(value, ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            value = str(value)
+    return len(value.encode("utf-8"))
+
+
+def load_spans(log_path: str = "./data/agent_data", models: Optional[List[str]] = None, date: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Read all spans under ``log_path``
+
+    Args:
+        log_path: Agent data directory ({log_path}/{signature}/log/{date}/trace.jsonl)
+        models: Optional signatures to include
+        date: Optional single date to include
+
+    Returns:
+        Span records, each with "signature" and "date" taken from its location
+    """
+    pattern = os.path.join(log_path, "*", "log", date or "*", TRACE_FILE_NAME)
+    spans = []
+    for fp in sorted(glob.glob(pattern)):
+        parts = os.path.normpath(fp).split(os.sep)
+        signature, day = parts[-4], parts[-2]
+        if models and signature not in models:
+            continue
+        with open(fp, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                record["signature"] = signature
+                record["date"] = day
+                spans.append(record)
+    return spans
+
+
+def summarize_spans(spans: List[Dict[str, Any]], top: int = 10) -> Dict[str, Any]:
+    """
+    Aggregate spans into per-tool statistics and the slowest steps/sessions
+
+    Returns:
+        {"tools": [...], "slowest_steps": [...], "sessions": [...]}, tools sorted by total time
+    """
+    tools: Dict[tuple, Dict[str, Any]] = {}
+    steps = []
+    sessions = []
+    for span in spans:
+        attrs = span.get("attributes", {})
+        if span.get("kind") == "tool":
+            key = (span["signature"], attrs.get("tool.name", span.get("name")))
+            stats = tools.setdefault(key, {"signature": key[0], "tool": key[1], "calls": 0, "errors": 0,
+                                           "total_ms": 0.0, "max_ms": 0.0, "response_bytes": 0})
+            stats["calls"] += 1
+            stats["errors"] += span.get("status") == "ERROR"
+            stats["total_ms"] += span.get("duration_ms", 0.0)
+            stats["max_ms"] = max(stats["max_ms"], span.get("duration_ms", 0.0))
+            stats["response_bytes"] += attrs.get("payload.response_bytes") or 0
+        elif span.get("kind") == "llm":
+            steps.append({
+                "signature": span["signature"],
+                "date": span["date"],
+                "step": attrs.get("step"),
+                "duration_ms": span.get("duration_ms", 0.0),
+                "input_tokens": attrs.get("llm.input_tokens"),
+                "output_tokens": attrs.get("llm.output_tokens"),
+                "retries": attrs.get("retry.count", 0),
+                "status": span.get("status"),
+            })
+        elif span.get("name") == "session":
+            sessions.append({
+                "signature": span["signature"],
+                "date": span["date"],
+                "duration_ms": span.get("duration_ms", 0.0),
+                "steps": attrs.get("steps"),
+                "status": span.get("status"),
+            })
+
+    tool_rows = sorted(tools.values(), key=lambda row: row["total_ms"], reverse=True)
+    for row in tool_rows:
+        row["avg_ms"] = row["total_ms"] / row["calls"]
+    return {
+        "tools": tool_rows[:top],
+        "slowest_steps": sorted(steps, key=lambda row: row["duration_ms"], reverse=True)[:top],
+        "sessions": sorted(sessions, key=lambda row: row["duration_ms"], reverse=True)[:top],
+    }
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    """Print the summary as three tables."""
+    print("\n🛠️  Slowest tools (by total time)")
+    print(f"{'Model':<20} {'Tool':<28} {'Calls':>6} {'Errors':>6} {'Total s':>9} {'Avg ms':>9} {'Max ms':>9} {'Resp KB':>9}")
+    for row in summary["tools"]:
+        print(f"{row['signature']:<20} {row['tool']:<28} {row['calls']:>6} {row['errors']:>6} {row['total_ms'] / 1000:>9.2f} "
+              f"{row['avg_ms']:>9.1f} {row['max_ms']:>9.1f} {row['response_bytes'] / 1024:>9.1f}")
+
+    print("\n🤖 Slowest steps")
+    print(f"{'Model':<20} {'Date':<12} {'Step':>5} {'Seconds':>9} {'In tok':>9} {'Out tok':>9} {'Retries':>8} {'Status':>7}")
+    for row in summary["slowest_steps"]:
+        print(f"{row['signature']:<20} {row['date']:<12} {str(row['step']):>5} {row['duration_ms'] / 1000:>9.2f} "
+              f"{str(row['input_tokens']):>9} {str(row['output_tokens']):>9} {row['retries']:>8} {row['status']:>7}")
+
+    print("\n📅 Slowest sessions")
+    print(f"{'Model':<20} {'Date':<12} {'Steps':>6} {'Seconds':>9} {'Status':>7}")
+    for row in summary["sessions"]:
+        print(f"{row['signature']:<20} {row['date']:<12} {str(row['steps']):>6} {row['duration_ms'] / 1000:>9.2f} {row['status']:>7}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rank the slowest tools, steps and sessions from agent trace files.")
+    parser.add_argument("--log-path", default=os.path.join(project_root, "data", "agent_data"), help="Agent data directory")
+    parser.add_argument("--models", nargs="*", help="Signatures to include (default: all)")
+    parser.add_argument("--date", help="Only this date (YYYY-MM-DD)")
+    parser.add_argument("--top", type=int, default=10, help="Rows per table (default: 10)")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    spans = load_spans(args.log_path, args.models, args.date)
+    if not spans:
+        print(f"❌ No trace files found under {args.log_path}")
+        sys.exit(1)
+    summary = summarize_spans(spans, args.top)
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    else:
+        print(f"📊 {len(spans)} spans")
+        print_summary(summary)
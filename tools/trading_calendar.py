@@ -0,0 +1,223 @@
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tools.price_store import get_price_store
+
+# Full-day exchange closures that fall on weekdays
+NYSE_HOLIDAYS = {
+    # 2024
+    "2024-01-01", "2024-01-15", "2024-02-19", "2024-03-29", "2024-05-27",
+    "2024-06-19", "2024-07-04", "2024-09-02", "2024-11-28", "2024-12-25",
+    # 2025
+    "2025-01-01", "2025-01-09", "2025-01-20", "2025-02-17", "2025-04-18",
+    "2025-05-26", "2025-06-19", "2025-07-04", "2025-09-01", "2025-11-27",
+    "2025-12-25",
+    # 2026
+    "2026-01-01", "2026-01-19", "2026-02-16", "2026-04-03", "2026-05-25",
+    "2026-06-19", "2026-07-03", "2026-09-07", "2026-11-26", "2026-12-25",
+}
+
+# "SSE" is added on first use by _holiday_table
+HOLIDAY_TABLES = {
+    "NYSE": NYSE_HOLIDAYS,
+}
+
+# merged.jsonl holds NASDAQ listings, which follow the NYSE holiday schedule;
+# other exchanges get a calendar built from their holiday table alone
+PRICE_STORE_EXCHANGE = "NYSE"
+
+# Days precomputed on either side of the observed sessions
+_PADDING_DAYS = 370
+
+
+def _holiday_table(exchange: str) -> Iterable[str]:
+    """Return the holiday table for ``exchange`` (empty for unknown exchanges)."""
+    if exchange == "SSE" and exchange not in HOLIDAY_TABLES:
+        # Single source of the SSE closures, shared with the A-share simulator;
+        # imported lazily so the US tool servers don't load that package and pandas
+        from asharemarket50.configs.calendar import SSE_HOLIDAYS
+        HOLIDAY_TABLES[exchange] = SSE_HOLIDAYS
+    return HOLIDAY_TABLES.get(exchange, set())
+
+
+def _parse(date: str) -> datetime:
+    return datetime.strptime(date, "%Y-%m-%d")
+
+
+def _format(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d")
+
+
+class TradingCalendar:
+    """
+    Trading-session calendar
+
+    Inside the range covered by ``observed_sessions`` (normally the dates in
+    the price store) only those dates count as sessions, so market closures
+    show up as gaps in the data. Outside that range a day is a session if it
+    is a weekday and not in ``holidays``. Previous/next-session lookups are
+    precomputed for every calendar day around the observed range.
+    """
+
+    def __init__(self, observed_sessions: Iterable[str] = (), holidays: Iterable[str] = ()):
+        self.holidays = set(holidays)
+        observed = sorted(set(observed_sessions))
+        self.first_observed = observed[0] if observed else None
+        self.last_observed = observed[-1] if observed else None
+
+        if observed:
+            start = _parse(observed[0]) - timedelta(days=_PADDING_DAYS)
+            end = _parse(observed[-1]) + timedelta(days=_PADDING_DAYS)
+        else:
+            today = datetime.now()
+            start = today - timedelta(days=_PADDING_DAYS)
+            end = today + timedelta(days=_PADDING_DAYS)
+        self.span_start = _format(start)
+        self.span_end = _format(end)
+
+        observed_set = set(observed)
+        days: List[str] = []
+        current = start
+        while current <= end:
+            days.append(_format(current))
+            current += timedelta(days=1)
+
+        self.sessions: List[str] = [
+            day for day in days
+            if (day in observed_set if self._in_observed_range(day) else self._is_default_session(day))
+        ]
+        self._session_index: Dict[str, int] = {d: i for i, d in enumerate(self.sessions)}
+
+        # Precomputed strict previous / next session for every day in the span
+        self._previous: Dict[str, Optional[str]] = {}
+        self._next: Dict[str, Optional[str]] = {}
+        last_session = None
+        for day in days:
+            self._previous[day] = last_session
+            if day in self._session_index:
+                last_session = day
+        next_session = None
+        for day in reversed(days):
+            self._next[day] = next_session
+            if day in self._session_index:
+                next_session = day
+
+    def _in_observed_range(self, date: str) -> bool:
+        return self.first_observed is not None and self.first_observed <= date <= self.last_observed
+
+    def _is_default_session(self, date: str) -> bool:
+        return _parse(date).weekday() < 5 and date not in self.holidays
+
+    def is_session(self, date: str) -> bool:
+        """Whether ``date`` (YYYY-MM-DD) is a trading session."""
+        if self.span_start <= date <= self.span_end:
+            return date in self._session_index
+        return self._is_default_session(date)
+
+    def previous_session(self, date: str) -> str:
+        """Return the last session strictly before ``date``."""
+        if self.span_start <= date <= self.span_end:
+            previous = self._previous[date]
+            # Days at the very start of the span fall back to the weekday/holiday rule
+            return previous if previous is not None else self._default_previous(self.span_start)
+        if date > self.span_end:
+            current = _parse(date) - timedelta(days=1)
+            while _format(current) > self.span_end:
+                if self._is_default_session(_format(current)):
+                    return _format(current)
+                current -= timedelta(days=1)
+            return self.sessions[-1] if self.sessions else self._default_previous(self.span_start)
+        return self._default_previous(date)
+
+    def _default_previous(self, date: str) -> str:
+        current = _parse(date) - timedelta(days=1)
+        while not self._is_default_session(_format(current)):
+            current -= timedelta(days=1)
+        return _format(current)
+
+    def next_session(self, date: str) -> Optional[str]:
+        """Return the first session strictly after ``date``."""
+        if self.span_start <= date <= self.span_end:
+            return self._next[date]
+        if date < self.span_start:
+            current = _parse(date) + timedelta(days=1)
+            while _format(current) < self.span_start:
+                if self._is_default_session(_format(current)):
+                    return _format(current)
+                current += timedelta(days=1)
+            return self.sessions[0] if self.sessions else None
+        current = _parse(date) + timedelta(days=1)
+        while not self._is_default_session(_format(current)):
+            current += timedelta(days=1)
+        return _format(current)
+
+    def previous_sessions(self, date: str, count: int) -> List[str]:
+        """Return up to ``count`` sessions strictly before ``date``, most recent first."""
+        result = []
+        current = date
+        for _ in range(count):
+            current = self.previous_session(current)
+            if current is None:
+                break
+            result.append(current)
+        return result
+
+    def sessions_between(self, start: str, end: str) -> List[str]:
+        """Return all sessions in the inclusive range [start, end], ascending."""
+        if start > end:
+            return []
+        if self.span_start <= start and end <= self.span_end:
+            return self.sessions[bisect_left(self.sessions, start):bisect_right(self.sessions, end)]
+        result = []
+        current = _parse(start)
+        end_dt = _parse(end)
+        while current <= end_dt:
+            day = _format(current)
+            if self.is_session(day):
+                result.append(day)
+            current += timedelta(days=1)
+        return result
+
+
+_CALENDARS: Dict[Tuple[str, str], Tuple[int, TradingCalendar]] = {}
+_CALENDARS_LOCK = threading.Lock()
+
+
+def get_trading_calendar(exchange: Optional[str] = "NYSE", merged_path: Optional[str] = None) -> TradingCalendar:
+    """
+    Return the shared trading calendar, built from the price store dates for US exchanges
+
+    The calendar is rebuilt only when the underlying price store reloads.
+
+    Args:
+        exchange: Holiday table to apply ("NYSE", "SSE"), or None for weekdays only
+        merged_path: Optional custom merged.jsonl path; defaults to data/merged.jsonl under the project root
+
+    Returns:
+        TradingCalendar instance
+    """
+    holidays = _holiday_table(exchange) if exchange else set()
+    if exchange not in (None, PRICE_STORE_EXCHANGE):
+        key = (exchange, "")
+        with _CALENDARS_LOCK:
+            if key not in _CALENDARS:
+                _CALENDARS[key] = (0, TradingCalendar((), holidays))
+            return _CALENDARS[key][1]
+
+    store = get_price_store(merged_path)
+    key = (exchange or "", os.path.abspath(store.path))
+    snapshot = store.snapshot
+    version = snapshot.version
+    cached = _CALENDARS.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _CALENDARS_LOCK:
+        cached = _CALENDARS.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        calendar = TradingCalendar(snapshot.dates, holidays)
+        _CALENDARS[key] = (version, calendar)
+        return calendar